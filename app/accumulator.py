@@ -0,0 +1,83 @@
+"""
+Home-page statistics maintained incrementally from the listing corpus.
+
+``StatisticsAccumulator`` is a ``ListingStore`` listener: every batch of
+listings the store takes in (ingestion pages, then live-feed publications)
+adds to per-code counters and price sums, so producing the /statistics payload
+costs O(categories) and keeping it current costs O(new listings). The home page
+needs no backend aggregation query and agrees with the store-based analytics.
+"""
+
+import threading
+from collections import Counter
+
+import numpy as np
+
+from .data_processor import code_counts, statistics_payload
+
+_COLUMNS = ('governorate', 'delegation', 'producttype', 'is_shop', 'price')
+
+
+def _add(totals, added):
+    """Element-wise sum of two per-code arrays of possibly different lengths."""
+    if len(added) > len(totals):
+        totals = np.pad(totals, (0, len(added) - len(totals)))
+    totals[:len(added)] += added
+    return totals
+
+
+class StatisticsAccumulator:
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self._total = 0
+        self._shops = 0
+        self._governorates = np.zeros(0, dtype=np.int64)
+        self._types = np.zeros(0, dtype=np.int64)
+        self._pairs = Counter()
+        self._price_sums = np.zeros(0)
+        self._price_counts = np.zeros(0, dtype=np.int64)
+
+    def add(self, rows, annonces):
+        """Count listings the store just added (a ``ListingStore`` listener)."""
+        columns = self.store.take(rows, *_COLUMNS)
+        governorate, delegation, producttype = columns['governorate'], columns['delegation'], columns['producttype']
+        shop_code = self.store.code('is_shop', True)
+        located = (governorate >= 0) & (delegation >= 0)
+        priced = columns['price'] > 0
+        with self._lock:
+            self._total += len(producttype)
+            if shop_code is not None:
+                self._shops += int(np.count_nonzero(columns['is_shop'] == shop_code))
+            self._governorates = _add(self._governorates, code_counts(governorate))
+            self._types = _add(self._types, code_counts(producttype))
+            self._pairs.update(zip(governorate[located].tolist(), delegation[located].tolist()))
+            self._price_sums = _add(self._price_sums, code_counts(producttype[priced], columns['price'][priced]))
+            self._price_counts = _add(self._price_counts, code_counts(producttype[priced]))
+
+    def exclude_prices(self, rows, restore=False):
+        """Leave the prices at ``rows`` out of the averages, e.g. flagged outliers.
+
+        Each row must be excluded at most once; ``restore`` counts excluded rows again.
+        """
+        columns = self.store.take(rows, 'producttype', 'price')
+        priced = columns['price'] > 0
+        producttype = columns['producttype'][priced]
+        sign = 1 if restore else -1
+        with self._lock:
+            self._price_sums = _add(self._price_sums, sign * code_counts(producttype, columns['price'][priced]))
+            self._price_counts = _add(self._price_counts, sign * code_counts(producttype))
+
+    def statistics(self):
+        """The current /statistics payload (see data_processor.store_statistics)."""
+        with self._lock:
+            totals = dict(
+                total=self._total,
+                shops=self._shops,
+                governorate_counts=self._governorates.copy(),
+                type_counts=self._types.copy(),
+                pair_counts=dict(self._pairs),
+                price_sums=self._price_sums.copy(),
+                price_counts=self._price_counts.copy(),
+            )
+        return statistics_payload(self.store, **totals)
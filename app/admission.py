@@ -0,0 +1,245 @@
+"""
+Admission control and load shedding for expensive requests.
+
+Expensive pages and callbacks (``ROUTES``) share ``ADMISSION_SLOTS`` worker
+threads per process, at most ``ADMISSION_ROUTE_SLOTS`` of them per route, so a
+spike on them always leaves threads for cheap page loads. Exports hold their
+slot until the download ends, so they get a pool of their own,
+``ADMISSION_EXPORT_SLOTS``, and a slow download never takes the filter
+callbacks' slots. A request that finds no free slot waits in a queue of at most
+``ADMISSION_QUEUE`` requests, ordered by route priority (page navigation
+first, then filter callbacks, then analytics and exports), for up to
+``ADMISSION_TIMEOUT`` seconds. Each client also gets a token bucket of
+``RATE_LIMIT_BURST`` expensive requests refilled at ``RATE_LIMIT_PER_SECOND``.
+Clients are told apart by their address as seen by the app, taken from
+``X-Forwarded-For`` only when ``TRUSTED_PROXIES`` proxies are configured.
+
+A request that is rate limited, finds the queue full or times out is shed at
+once: callbacks get the last response served for the same inputs when there is
+one, otherwise a "busy" message (or no update); exports get 503 or 429 with
+``Retry-After``. Active and queued requests and shed counts are exported on
+``/metrics``.
+"""
+
+import hashlib
+import heapq
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+from .config import Config
+from .metrics import increment, set_gauge
+from .utils import logger
+
+DASH_UPDATE = "/_dash-update-component"
+
+# Expensive routes (page pathnames, callback output ids, export prefix) and
+# their priority: lower is admitted first.
+ROUTES = {
+    "/all-listings": 0,
+    "/date-filter": 0,
+    "price-filter-results": 1,
+    "date-filter-results": 1,
+    "search-results": 1,
+    "new-listings-older": 1,
+    "analytics-charts": 2,
+    "/export": 2,
+}
+
+CACHED_RESPONSES = 256
+CLIENTS = 10000
+
+
+class _Waiter:
+    def __init__(self, route):
+        self.route = route
+        self.admitted = threading.Event()
+
+
+class AdmissionController:
+    """Shared slots with per-route caps and a bounded priority queue."""
+
+    def __init__(self, slots, route_slots, queue_size, timeout):
+        self.slots = slots
+        self.route_slots = route_slots
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._active = {}
+        self._queue = []  # heap of (priority, seq, waiter)
+        self._seq = itertools.count()
+
+    def _can_run(self, route):
+        return sum(self._active.values()) < self.slots and self._active.get(route, 0) < self.route_slots
+
+    def _start(self, route):
+        self._active[route] = self._active.get(route, 0) + 1
+
+    def acquire(self, route, priority):
+        """Take a slot for ``route``; returns None when admitted, else why it was shed."""
+        with self._lock:
+            # Queued requests go first unless they are all held back by their route cap
+            if self._can_run(route) and not any(self._can_run(entry[2].route) for entry in self._queue):
+                self._start(route)
+                self._report(route)
+                return None
+            if len(self._queue) >= self.queue_size:
+                return "queue_full"
+            waiter = _Waiter(route)
+            heapq.heappush(self._queue, (priority, next(self._seq), waiter))
+            self._report(route)
+
+        if waiter.admitted.wait(self.timeout):
+            return None
+        with self._lock:
+            if waiter.admitted.is_set():
+                # Admitted just as the wait timed out
+                return None
+            self._queue = [entry for entry in self._queue if entry[2] is not waiter]
+            heapq.heapify(self._queue)
+            self._report(route)
+        return "timeout"
+
+    def release(self, route):
+        with self._lock:
+            self._active[route] -= 1
+            # Admit waiters in priority order while slots allow; a waiter whose
+            # route is at its cap does not block the ones behind it.
+            for entry in sorted(self._queue):
+                waiter = entry[2]
+                if self._can_run(waiter.route):
+                    self._queue.remove(entry)
+                    self._start(waiter.route)
+                    waiter.admitted.set()
+            heapq.heapify(self._queue)
+            self._report(route)
+
+    def _report(self, route):
+        set_gauge("dashboard_admission_active", {"route": route}, self._active.get(route, 0))
+        set_gauge("dashboard_admission_queue_depth", {}, len(self._queue))
+
+
+class RateLimiter:
+    """Token bucket per client, for the most recently seen ``max_clients`` clients."""
+
+    def __init__(self, rate, burst, max_clients=CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()  # client -> (tokens, updated_at)
+
+    def allow(self, client):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            allowed = tokens >= 1
+            self._buckets[client] = (tokens - 1 if allowed else tokens, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+            return allowed
+
+
+def classify(path, payload, args):
+    """Route label of an expensive request, or None for cheap ones."""
+    if path.startswith("/export/"):
+        return "/export"
+    # Polls for background callback results ("cacheKey") are cheap
+    if not path.endswith(DASH_UPDATE) or not isinstance(payload, dict) or "cacheKey" in args:
+        return None
+    output = payload.get("output") or ""
+    if output == "page-content.children":
+        inputs = payload.get("inputs") or [{}]
+        pathname = inputs[0].get("value") if isinstance(inputs[0], dict) else None
+        return pathname if pathname in ROUTES else None
+    for target in output.strip(".").split("..."):
+        component = target.rsplit(".", 1)[0]
+        if component in ROUTES:
+            return component
+    return None
+
+
+def _busy_response(payload):
+    """A callback response telling the user to retry, or no update (204)."""
+    from flask import Response
+    import dash_bootstrap_components as dbc
+    from plotly.io.json import to_json_plotly
+
+    output = (payload or {}).get("output") or ""
+    component, _, prop = output.rpartition(".")
+    if "..." in output or prop != "children":
+        return Response(status=204, headers={"X-Admission": "busy"})
+    alert = dbc.Alert("The server is busy. Please try again in a moment.", color="warning",
+                      className="text-center my-4")
+    body = to_json_plotly({"multi": True, "response": {component: {"children": alert}}})
+    return Response(body, mimetype="application/json", headers={"X-Admission": "busy"})
+
+
+def init_admission(server, controller=None, limiter=None, exports=None):
+    """Shed and queue expensive requests on ``server`` (a no-op unless ADMISSION_ENABLED)."""
+    if not Config.ADMISSION_ENABLED:
+        return
+    from flask import Response, g, request
+
+    controller = controller or AdmissionController(Config.ADMISSION_SLOTS, Config.ADMISSION_ROUTE_SLOTS,
+                                                   Config.ADMISSION_QUEUE, Config.ADMISSION_TIMEOUT)
+    exports = exports or AdmissionController(Config.ADMISSION_EXPORT_SLOTS, Config.ADMISSION_EXPORT_SLOTS,
+                                             Config.ADMISSION_QUEUE, Config.ADMISSION_TIMEOUT)
+    limiter = limiter or RateLimiter(Config.RATE_LIMIT_PER_SECOND, Config.RATE_LIMIT_BURST)
+    cache_lock = threading.Lock()
+    cached = OrderedDict()  # request body digest -> last response body
+
+    def shed(route, reason, payload, key):
+        if route == "/export":
+            outcome = "rejected"
+            response = Response("Too many requests\n" if reason == "rate_limited" else "Server busy\n",
+                                status=429 if reason == "rate_limited" else 503,
+                                headers={"Retry-After": str(max(1, round(Config.ADMISSION_TIMEOUT)))})
+        else:
+            with cache_lock:
+                body = cached.get(key)
+            if body is not None:
+                outcome = "cached"
+                response = Response(body, mimetype="application/json", headers={"X-Admission": "cached"})
+            else:
+                outcome = "busy"
+                response = _busy_response(payload)
+        increment("dashboard_admission_shed_total", {"route": route, "reason": reason, "response": outcome})
+        logger.warning("Shed %s request (%s, %s)", route, reason, outcome)
+        return response
+
+    @server.before_request
+    def admit():
+        payload = request.get_json(silent=True) if request.path.endswith(DASH_UPDATE) else None
+        route = classify(request.path, payload, request.args)
+        if route is None:
+            return None
+        key = hashlib.sha1(request.get_data()).hexdigest() if payload is not None else None
+        # The peer address; ProxyFix (TRUSTED_PROXIES) sets it from trusted proxies' headers
+        if not limiter.allow(request.remote_addr):
+            return shed(route, "rate_limited", payload, key)
+        pool = exports if route == "/export" else controller
+        reason = pool.acquire(route, ROUTES[route])
+        if reason is not None:
+            return shed(route, reason, payload, key)
+        g.admission = (route, key, pool)
+        return None
+
+    @server.after_request
+    def remember(response):
+        admission = g.get("admission")
+        if admission and admission[1] and response.status_code == 200 and not response.is_streamed:
+            with cache_lock:
+                cached[admission[1]] = response.get_data()
+                cached.move_to_end(admission[1])
+                while len(cached) > CACHED_RESPONSES:
+                    cached.popitem(last=False)
+        return response
+
+    @server.teardown_request
+    def release(exc):
+        admission = g.pop("admission", None)
+        if admission:
+            admission[2].release(admission[0])
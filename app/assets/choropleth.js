@@ -0,0 +1,66 @@
+/*
+ * Choropleth map (/map). The figure is built in the browser from the regional
+ * aggregates in the "map-aggregates" store; the geometry is referenced by URL
+ * (/geo/<level>-<detail>.geojson, see geo.py), which plotly fetches once and
+ * keeps, so switching metrics only changes the colours. Zooming in past a
+ * threshold switches to more detailed geometry.
+ */
+(function () {
+    var METRICS = {
+        count: {label: "Listings", format: ",.0f"},
+        median_sale: {label: "Median sale price (TND)", format: ",.0f"},
+        median_rent: {label: "Median rent price (TND)", format: ",.0f"}
+    };
+
+    function detailForZoom(zoom) {
+        return zoom < 7 ? "low" : zoom < 9 ? "medium" : "high";
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        choropleth: {
+            detail: function (relayoutData, current) {
+                var zoom = relayoutData && relayoutData["map.zoom"];
+                if (zoom === undefined) {
+                    return window.dash_clientside.no_update;
+                }
+                var detail = detailForZoom(zoom);
+                return detail === current ? window.dash_clientside.no_update : detail;
+            },
+
+            render: function (level, metric, detail, aggregates) {
+                var data = aggregates[level];
+                var spec = METRICS[metric];
+                var locations = [], z = [], names = [];
+                data.ids.forEach(function (id, i) {
+                    if (data[metric][i] !== null) {
+                        locations.push(id);
+                        z.push(data[metric][i]);
+                        names.push(data.names[i]);
+                    }
+                });
+                return {
+                    data: [{
+                        type: "choroplethmap",
+                        geojson: "/geo/" + level + "-" + (detail || "low") + ".geojson",
+                        featureidkey: "id",
+                        locations: locations,
+                        z: z,
+                        text: names,
+                        colorscale: "Greys",
+                        marker: {opacity: 0.8, line: {width: 0.5, color: "white"}},
+                        colorbar: {title: {text: spec.label}},
+                        hovertemplate: "%{text}<br>" + spec.label + ": %{z:" + spec.format + "}<extra></extra>"
+                    }],
+                    layout: {
+                        map: {style: "carto-positron", center: {lat: 34.1, lon: 9.6}, zoom: 5.4},
+                        margin: {l: 0, r: 0, t: 0, b: 0},
+                        height: 650,
+                        paper_bgcolor: "white",
+                        // Keep the user's pan and zoom when the metric or level changes.
+                        uirevision: "map"
+                    }
+                };
+            }
+        }
+    });
+})();
@@ -0,0 +1,187 @@
+/*
+ * Browser-side cross-filtering for the dashboard (/). The page carries a small
+ * pre-aggregated cube (data_processor.home_cube) in the "home-cube" store;
+ * clicking a governorate bar or a Sale/Rent slice updates "home-filter" and the
+ * charts and metrics are recomputed here from the cube, with no callback to
+ * the server. A chart is never filtered by its own selection, so the other
+ * bars or slices stay clickable. The figures mirror graphs.py.
+ */
+(function () {
+    var SALE_RENT_COLORS = {Sale: "black", Rent: "#666666"};
+    var LEGEND = {orientation: "h", yanchor: "bottom", y: 1.02, xanchor: "right", x: 1};
+
+    function baseLayout(title) {
+        return {
+            title: {text: title, font: {color: "black"}},
+            paper_bgcolor: "white",
+            plot_bgcolor: "white",
+            font: {color: "black"},
+            height: 400
+        };
+    }
+
+    function barLayout(title, xTitle, yTitle) {
+        var layout = baseLayout(title);
+        layout.xaxis = {title: {text: xTitle, font: {color: "black"}}};
+        layout.yaxis = {title: {text: yTitle, font: {color: "black"}}};
+        layout.bargap = 0.3;
+        return layout;
+    }
+
+    function topEntries(counts, n) {
+        return Object.keys(counts)
+            .map(function (key) { return [key, counts[key]]; })
+            .sort(function (a, b) { return b[1] - a[1]; })
+            .slice(0, n);
+    }
+
+    function add(counts, key, amount) {
+        counts[key] = (counts[key] || 0) + amount;
+    }
+
+    function formatPrice(sum, count) {
+        var value = count ? sum / count : 0;
+        return value.toLocaleString("en-US", {minimumFractionDigits: 2, maximumFractionDigits: 2}) + " TND";
+    }
+
+    function aggregate(cube, filter) {
+        var result = {
+            governorates: {}, types: {}, publishers: {}, delegations: {},
+            total: 0, shops: 0, priceSum: {}, priceCount: {}
+        };
+        for (var i = 0; i < cube.count.length; i++) {
+            var governorate = cube.governorate[i] >= 0 ? cube.governorates[cube.governorate[i]] : null;
+            var type = cube.type[i] >= 0 ? cube.types[cube.type[i]] : null;
+            var count = cube.count[i];
+            var governorateMatch = !filter.governorate || filter.governorate === governorate;
+            var typeMatch = !filter.producttype || filter.producttype === type;
+
+            if (typeMatch && governorate !== null) {
+                add(result.governorates, governorate, count);
+            }
+            if (governorateMatch && type !== null) {
+                add(result.types, type, count);
+            }
+            if (!governorateMatch || !typeMatch) {
+                continue;
+            }
+            result.total += count;
+            if (cube.shop[i] >= 0) {
+                add(result.publishers, cube.shop[i] ? "Shop" : "Individual", count);
+                result.shops += cube.shop[i] ? count : 0;
+            }
+            if (governorate !== null && cube.delegation[i] >= 0) {
+                add(result.delegations, JSON.stringify([governorate, cube.delegations[cube.delegation[i]]]), count);
+            }
+            if (type !== null) {
+                add(result.priceSum, type, cube.price_sum[i]);
+                add(result.priceCount, type, cube.price_count[i]);
+            }
+        }
+        return result;
+    }
+
+    function governorateFigure(counts, selected) {
+        var top = topEntries(counts, 10);
+        return {
+            data: [{
+                type: "bar",
+                x: top.map(function (e) { return e[0]; }),
+                y: top.map(function (e) { return e[1]; }),
+                marker: {
+                    color: top.map(function (e) { return !selected || e[0] === selected ? "black" : "#cccccc"; }),
+                    cornerradius: 8,
+                    line: {width: 0}
+                }
+            }],
+            layout: Object.assign(barLayout("Listings by Governorate", "Governorate", "Number of Listings"), {showlegend: false})
+        };
+    }
+
+    function typeFigure(counts, selected) {
+        var labels = ["Sale", "Rent"].filter(function (label) { return counts[label]; });
+        return {
+            data: [{
+                type: "pie",
+                labels: labels,
+                values: labels.map(function (label) { return counts[label]; }),
+                hole: 0.6,
+                sort: false,
+                pull: labels.map(function (label) { return label === selected ? 0.08 : 0; }),
+                marker: {colors: labels.map(function (label) { return SALE_RENT_COLORS[label]; })}
+            }],
+            layout: Object.assign(baseLayout("Distribution of Sale vs Rent Listings"), {showlegend: true, legend: LEGEND})
+        };
+    }
+
+    function publisherFigure(counts) {
+        var labels = Object.keys(counts);
+        return {
+            data: [{type: "pie", labels: labels, values: labels.map(function (l) { return counts[l]; }), hole: 0.4}],
+            layout: Object.assign(baseLayout("Listings by Publisher Type"), {showlegend: true, legend: LEGEND})
+        };
+    }
+
+    function delegationFigure(counts) {
+        var traces = {};
+        var order = [];
+        topEntries(counts, 10).forEach(function (entry) {
+            var key = JSON.parse(entry[0]);
+            if (!traces[key[0]]) {
+                traces[key[0]] = {type: "bar", name: key[0], x: [], y: [], marker: {cornerradius: 8, line: {width: 0}}};
+                order.push(key[0]);
+            }
+            traces[key[0]].x.push(key[1]);
+            traces[key[0]].y.push(entry[1]);
+        });
+        var layout = barLayout("Top 10 Delegations by Number of Listings", "Delegation", "Number of Listings");
+        return {
+            data: order.map(function (name) { return traces[name]; }),
+            layout: Object.assign(layout, {barmode: "relative", showlegend: true, legend: LEGEND})
+        };
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        crossfilter: {
+            update_filter: function (governorateClick, typeClick, resetClicks, filter) {
+                var triggered = window.dash_clientside.callback_context.triggered;
+                var trigger = triggered.length ? triggered[0].prop_id : "";
+                var next = Object.assign({}, filter || {});
+                var point;
+                if (trigger.indexOf("home-filter-reset.") === 0) {
+                    return {};
+                } else if (trigger.indexOf("governorate-pie.") === 0 && governorateClick) {
+                    point = governorateClick.points[0].x;
+                    next.governorate = next.governorate === point ? null : point;
+                } else if (trigger.indexOf("type-chart.") === 0 && typeClick) {
+                    point = typeClick.points[0].label;
+                    next.producttype = next.producttype === point ? null : point;
+                } else {
+                    return window.dash_clientside.no_update;
+                }
+                return next;
+            },
+
+            render: function (filter, cube) {
+                filter = filter || {};
+                var result = aggregate(cube, filter);
+                var parts = [filter.governorate, filter.producttype].filter(Boolean);
+                var status = parts.length
+                    ? "Filtered to " + parts.join(" · ") + ". Click the selection again to clear it."
+                    : "Click a governorate bar or a Sale/Rent slice to filter the dashboard.";
+                var shopPercentage = result.total ? Math.round(result.shops / result.total * 1000) / 10 : 0;
+                return [
+                    governorateFigure(result.governorates, filter.governorate),
+                    publisherFigure(result.publishers),
+                    typeFigure(result.types, filter.producttype),
+                    delegationFigure(result.delegations),
+                    result.total.toLocaleString("en-US"),
+                    formatPrice(result.priceSum.Sale, result.priceCount.Sale),
+                    formatPrice(result.priceSum.Rent, result.priceCount.Rent),
+                    shopPercentage + "%",
+                    status
+                ];
+            }
+        }
+    });
+})();
@@ -0,0 +1,55 @@
+/*
+ * Infinite scroll for /new-listings: clicks the "Load more" button when it
+ * scrolls into view, so load_older_new_listings (main.py) appends the next
+ * batch of cards. One batch is requested at a time; if the button is still in
+ * view once a batch arrives, the next one is requested straight away.
+ */
+(function () {
+    var observer = null;
+    var batches = null;
+    var current = null;
+
+    function watch(button) {
+        var older = document.getElementById("new-listings-older");
+        var visible = false;
+        var pending = false;
+
+        function more() {
+            if (visible && !pending && button.style.display !== "none") {
+                pending = true;
+                button.click();
+            }
+        }
+
+        observer = new IntersectionObserver(function (entries) {
+            visible = entries[entries.length - 1].isIntersecting;
+            more();
+        }, {rootMargin: "600px 0px"});
+        observer.observe(button);
+
+        batches = new MutationObserver(function () {
+            pending = false;
+            more();
+        });
+        batches.observe(older, {childList: true});
+        // The last batch hides the button without adding a child.
+        batches.observe(button, {attributes: true, attributeFilter: ["style"]});
+    }
+
+    // Dash renders pages client-side, so watch for the button to appear and go.
+    new MutationObserver(function () {
+        var button = document.getElementById("new-listings-more");
+        if (button === current) {
+            return;
+        }
+        if (observer) {
+            observer.disconnect();
+            batches.disconnect();
+            observer = batches = null;
+        }
+        current = button;
+        if (button) {
+            watch(button);
+        }
+    }).observe(document.documentElement, {childList: true, subtree: true});
+})();
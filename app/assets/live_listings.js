@@ -0,0 +1,114 @@
+/*
+ * Live updates for /new-listings: follows /events/new-listings (see live.py)
+ * and prepends a card for each pushed listing, without re-rendering the page.
+ * When the server refuses the stream (LIVE_MAX_STREAMS), it polls instead.
+ * The markup mirrors create_listing_card() in layouts.py.
+ */
+(function () {
+    var source = null;
+    var timer = null;
+    var current = null;
+
+    function el(tag, className, children) {
+        var node = document.createElement(tag);
+        if (className) {
+            node.className = className;
+        }
+        (children || []).forEach(function (child) {
+            node.appendChild(typeof child === "string" ? document.createTextNode(child) : child);
+        });
+        return node;
+    }
+
+    function buildCard(listing) {
+        var title = el("h5", "card-title text-dark mb-3", [String(listing.title)]);
+        title.style.minHeight = "48px";
+
+        var description = el("p", "card-text text-muted mb-3", [el("span", "", ["📝 ", listing.description + "..."])]);
+        description.style.minHeight = "80px";
+
+        var link = el("a", "w-100 shadow-sm btn btn-primary", [el("span", "", ["View Details ", el("i", "fas fa-arrow-right ms-1")])]);
+        link.href = "/listings/" + encodeURIComponent(listing.id);
+
+        var body = el("div", "d-flex flex-column card-body", [
+            el("div", "d-flex flex-column h-100", [
+                title,
+                el("div", "", [
+                    el("p", "card-text price-highlight mb-3 fs-5", [el("span", "", ["💰 ", listing.price + " TND"])]),
+                    description,
+                    el("p", "card-text text-muted mb-3", [el("span", "", ["📅 ", "Published: " + listing.publishedOn])]),
+                    el("div", "mt-auto", [link])
+                ])
+            ])
+        ]);
+        body.style.height = "350px";
+
+        var card = el("div", "listing-card shadow-sm h-100 card", [
+            el("div", "bg-light card-header", [
+                el("h5", "mb-0 text-primary", [el("span", "", ["📍 ", listing.governorate + ", " + listing.delegation])])
+            ]),
+            body
+        ]);
+        card.style.borderRadius = "15px";
+        return el("div", "mb-4 col-md-6", [card]);
+    }
+
+    function addCard(grid, listing) {
+        grid.insertBefore(buildCard(listing), grid.firstChild);
+        var count = document.getElementById("new-listings-count");
+        if (count) {
+            count.textContent = String(parseInt(count.textContent, 10) + 1);
+        }
+    }
+
+    function connect(container) {
+        var grid = document.getElementById("new-listings-grid");
+        var since = container.getAttribute("data-since") || "0";
+        source = new EventSource("/events/new-listings?since=" + encodeURIComponent(since));
+        source.addEventListener("listing", function (event) {
+            since = event.lastEventId || since;
+            addCard(grid, JSON.parse(event.data));
+        });
+        source.addEventListener("error", function () {
+            // Closed for good, e.g. 503 when the server's streams are all taken: poll instead
+            if (source && source.readyState === EventSource.CLOSED && current === container) {
+                source = null;
+                poll(container, grid, since);
+            }
+        });
+    }
+
+    function poll(container, grid, since) {
+        fetch("/events/new-listings?poll=1&since=" + encodeURIComponent(since))
+            .then(function (response) { return response.json(); })
+            .then(function (data) {
+                if (current !== container) {
+                    return;
+                }
+                data.events.forEach(function (listing) { addCard(grid, listing); });
+                timer = setTimeout(function () { poll(container, grid, data.seq); }, data.retry);
+            })
+            .catch(function () {
+                if (current === container) {
+                    timer = setTimeout(function () { poll(container, grid, since); }, 30000);
+                }
+            });
+    }
+
+    // Dash renders pages client-side, so watch for the grid to appear and go.
+    new MutationObserver(function () {
+        var container = document.getElementById("new-listings-live");
+        if (container === current) {
+            return;
+        }
+        if (source) {
+            source.close();
+            source = null;
+        }
+        clearTimeout(timer);
+        current = container;
+        if (container) {
+            connect(container);
+        }
+    }).observe(document.documentElement, {childList: true, subtree: true});
+})();
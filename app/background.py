@@ -0,0 +1,60 @@
+"""
+Background callbacks for heavy analytics.
+
+Dash runs a background callback in a separate process and the browser polls
+for its progress and result, so the request thread returns at once and
+expensive jobs spread over the machine's cores instead of hitting the worker
+timeout. Job state and results go through a diskcache directory
+(``BACKGROUND_CACHE_DIR``) shared by every gunicorn worker, created when the
+app is built. Results are cached by the callback's inputs plus ``cache_by``,
+for ``BACKGROUND_CACHE_EXPIRE`` seconds.
+
+diskcache (and multiprocess) are optional: without them
+``create_background_manager`` returns None and the callbacks run in the
+request thread as before.
+"""
+
+import os
+
+from dash import callback
+
+from .config import Config
+from .utils import logger
+
+
+def create_background_manager(cache_by=None):
+    """Return a DiskcacheManager, or None when diskcache or multiprocess is not installed.
+
+    ``cache_by`` is a list of zero-argument functions whose values are added to
+    the cache key, e.g. the size of the corpus so new listings invalidate results.
+    """
+    try:
+        import diskcache
+        from dash import DiskcacheManager
+
+        # The directory is shared by every worker; create it up front (it is
+        # git-ignored) rather than on the first job.
+        os.makedirs(Config.BACKGROUND_CACHE_DIR, exist_ok=True)
+        cache = diskcache.Cache(Config.BACKGROUND_CACHE_DIR)
+        # The constructor imports multiprocess, which dash[diskcache] also installs
+        return DiskcacheManager(cache, cache_by=cache_by, expire=Config.BACKGROUND_CACHE_EXPIRE)
+    except ImportError as e:
+        logger.warning("%s; heavy analytics run in the request thread", e)
+        return None
+
+
+def background_callback(manager, *dependencies, progress=None, running=None, cancel=None, **kwargs):
+    """``dash.callback`` that runs in the background when ``manager`` is set.
+
+    The decorated function always takes ``set_progress`` first; without a
+    manager it is called in the request thread with a no-op ``set_progress``.
+    """
+    def decorator(func):
+        if manager is not None:
+            return callback(*dependencies, background=True, manager=manager, progress=progress,
+                            running=running, cancel=cancel, **kwargs)(func)
+
+        def in_request_thread(*args):
+            return func(lambda value: None, *args)
+        return callback(*dependencies, **kwargs)(in_request_thread)
+    return decorator
@@ -0,0 +1,95 @@
+"""
+Request coalescing and stale-while-revalidate caching for backend fetches.
+
+``SingleFlightCache.get(key, loader)``:
+
+* fresh entry (younger than ``ttl``): returned immediately;
+* expired but younger than ``stale_ttl``: the old value is returned immediately
+  and one background thread refreshes it, however many callers ask;
+* missing: the first caller runs ``loader`` and every concurrent caller with the
+  same key waits for that one result instead of hitting the API again.
+
+A loader that raises is never cached. Callers then get the last good value,
+however old, and the exception only when there is none.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from .metrics import increment, record_cache
+from .utils import logger
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlightCache:
+    def __init__(self, name, ttl, stale_ttl, max_entries=512):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, stored_at)
+        self._inflight = {}
+
+    def get(self, key, loader):
+        with self._lock:
+            entry = self._entries.get(key)
+            age = time.monotonic() - entry[1] if entry else None
+            if entry and age < self.ttl:
+                self._entries.move_to_end(key)
+                record_cache(self.name, True)
+                return entry[0]
+
+            call = self._inflight.get(key)
+            if entry and age < self.stale_ttl:
+                if call is None:
+                    self._inflight[key] = _Call()
+                    threading.Thread(target=self._refresh, args=(key, loader), daemon=True).start()
+                record_cache(self.name, True)
+                increment("dashboard_cache_stale_served_total", {"cache": self.name})
+                return entry[0]
+
+            record_cache(self.name, False)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+
+        if leader:
+            self._load(key, loader, call)
+        else:
+            increment("dashboard_cache_coalesced_total", {"cache": self.name})
+            call.done.wait()
+        if call.error is None:
+            return call.value
+        if entry:
+            # The backend is failing: the last good value beats an error page.
+            increment("dashboard_cache_stale_served_total", {"cache": self.name})
+            return entry[0]
+        raise call.error
+
+    def _refresh(self, key, loader):
+        call = self._inflight[key]
+        self._load(key, loader, call)
+        if call.error is not None:
+            logger.warning("Background refresh of %s failed: %s", self.name, call.error)
+
+    def _load(self, key, loader, call):
+        try:
+            call.value = loader()
+        except Exception as e:
+            call.error = e
+        with self._lock:
+            if call.error is None:
+                self._entries[key] = (call.value, time.monotonic())
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            self._inflight.pop(key, None)
+        call.done.set()
@@ -0,0 +1,104 @@
+"""
+Per-endpoint circuit breakers for backend calls.
+
+A breaker trips OPEN when at least ``failure_rate`` of the last ``window``
+calls failed (once ``min_calls`` have been made). While open, calls fail
+immediately with ``CircuitOpenError`` instead of waiting on a struggling
+backend. After ``open_seconds`` one probe call is let through (HALF_OPEN):
+success closes the breaker, failure opens it again.
+"""
+
+import threading
+import time
+from collections import deque
+
+from .config import Config
+from .metrics import increment, set_gauge
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_rate=0.5, window=20, min_calls=5, open_seconds=30):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.last_success = None
+        self._results = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def call(self, func, *args, **kwargs):
+        if not self._allow():
+            increment("dashboard_circuit_rejected_total", {"endpoint": self.name})
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self._record(False)
+            raise
+        self._record(True)
+        return result
+
+    def _allow(self):
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self._set_state(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    return False
+                self._probing = True
+                return True
+            return self.state == CLOSED
+
+    def _record(self, success):
+        with self._lock:
+            if success:
+                self.last_success = time.time()
+            if self.state == HALF_OPEN:
+                self._probing = False
+                self._results.clear()
+                self._set_state(CLOSED if success else OPEN)
+                return
+            self._results.append(success)
+            failures = self._results.count(False)
+            if (self.state == CLOSED and len(self._results) >= self.min_calls
+                    and failures / len(self._results) >= self.failure_rate):
+                self._set_state(OPEN)
+
+    def _set_state(self, state):
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        self.state = state
+        set_gauge("dashboard_circuit_state", {"endpoint": self.name}, _STATE_VALUES[state])
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(
+                name,
+                failure_rate=Config.CIRCUIT_FAILURE_RATE,
+                window=Config.CIRCUIT_WINDOW,
+                min_calls=Config.CIRCUIT_MIN_CALLS,
+                open_seconds=Config.CIRCUIT_OPEN_SECONDS,
+            )
+        return _breakers[name]
+
+
+def degraded_endpoints():
+    """Return {endpoint: time of last success or None} for breakers that are not closed."""
+    with _breakers_lock:
+        return {name: b.last_success for name, b in _breakers.items() if b.state != CLOSED}
@@ -1,4 +1,82 @@
 import os
 
 class Config:
-    FASTAPI_URL = os.getenv("FASTAPI_URL", "http://127.0.0.1:8000")
\ No newline at end of file
+    FASTAPI_URL = os.getenv("FASTAPI_URL", "http://127.0.0.1:8000")
+
+    # "api" reads through FastAPI, "mongo" queries MongoDB directly (see mongo_source.py)
+    DATA_SOURCE = os.getenv("DATA_SOURCE", "api")
+    MONGO_URI = os.getenv("MONGO_URI", "mongodb://127.0.0.1:27017")
+    MONGO_DB = os.getenv("MONGO_DB", "real_estate")
+    MONGO_COLLECTION = os.getenv("MONGO_COLLECTION", "annonces")
+    NEW_LISTINGS_DAYS = int(os.getenv("NEW_LISTINGS_DAYS", "7"))
+    # Listings per page when streaming the corpus into the store
+    INGEST_PAGE_SIZE = int(os.getenv("INGEST_PAGE_SIZE", "100"))
+    # Analytics of stores with at least PARTITION_MIN_ROWS listings are
+    # aggregated by month partition over PARTITION_WORKERS processes (see partitioned.py)
+    PARTITION_WORKERS = int(os.getenv("PARTITION_WORKERS", str(os.cpu_count() or 1)))
+    PARTITION_MIN_ROWS = int(os.getenv("PARTITION_MIN_ROWS", "500000"))
+    # Price outliers (see outliers.py): robust z-score above which a price is
+    # flagged, and whether flagged prices are left out of averages and medians
+    OUTLIER_THRESHOLD = float(os.getenv("OUTLIER_THRESHOLD", "3.5"))
+    EXCLUDE_PRICE_OUTLIERS = os.getenv("EXCLUDE_PRICE_OUTLIERS", "1").lower() in ("1", "true", "yes")
+
+    # Backend response cache (see cache.py): entries are fresh for CACHE_TTL
+    # seconds and then served stale, while one refresh runs, up to CACHE_STALE_TTL.
+    CACHE_TTL = float(os.getenv("CACHE_TTL", "60"))
+    CACHE_STALE_TTL = float(os.getenv("CACHE_STALE_TTL", "600"))
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "512"))
+
+    # Backend timeouts and circuit breakers (see circuit.py)
+    API_TIMEOUT = float(os.getenv("API_TIMEOUT", "10"))
+    CIRCUIT_FAILURE_RATE = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+    CIRCUIT_WINDOW = int(os.getenv("CIRCUIT_WINDOW", "20"))
+    CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "5"))
+    CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+
+    # Admission control for expensive routes (see admission.py): shared and
+    # per-route slots per process, queue bound and wait, and per-client rate limit
+    ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1").lower() in ("1", "true", "yes")
+    ADMISSION_SLOTS = int(os.getenv("ADMISSION_SLOTS", "2"))
+    ADMISSION_ROUTE_SLOTS = int(os.getenv("ADMISSION_ROUTE_SLOTS", "1"))
+    # Exports stream until the download ends, so they have slots of their own
+    ADMISSION_EXPORT_SLOTS = int(os.getenv("ADMISSION_EXPORT_SLOTS", "1"))
+    ADMISSION_QUEUE = int(os.getenv("ADMISSION_QUEUE", "16"))
+    ADMISSION_TIMEOUT = float(os.getenv("ADMISSION_TIMEOUT", "2"))
+    RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "2"))
+    RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "10"))
+    # Reverse proxies in front of the app whose X-Forwarded-For/-Proto headers are
+    # trusted; clients are rate limited by the address they report (0: none)
+    TRUSTED_PROXIES = int(os.getenv("TRUSTED_PROXIES", "0"))
+
+    # Live new-listings updates (see live.py)
+    LIVE_POLL_SECONDS = int(os.getenv("LIVE_POLL_SECONDS", "30"))
+    # Open SSE streams per process, each holding a worker thread; browsers past
+    # the cap poll instead. Raise it with an async worker class.
+    LIVE_MAX_STREAMS = int(os.getenv("LIVE_MAX_STREAMS", "2"))
+    # Cards per batch on /new-listings, and how many built cards are kept for reuse
+    NEW_LISTINGS_BATCH = int(os.getenv("NEW_LISTINGS_BATCH", "24"))
+    LISTING_CARD_CACHE_SIZE = int(os.getenv("LISTING_CARD_CACHE_SIZE", "2000"))
+    # Static bundle of the read-only pages (see snapshot.py)
+    SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshot")
+
+    # Background callbacks for heavy analytics (see background.py): job state and
+    # results are kept in a diskcache directory shared by all workers.
+    BACKGROUND_CACHE_DIR = os.getenv("BACKGROUND_CACHE_DIR", "cache")
+    BACKGROUND_CACHE_EXPIRE = int(os.getenv("BACKGROUND_CACHE_EXPIRE", "3600"))
+
+    # Boundary GeoJSON for the choropleth map (see geo.py) and the feature
+    # properties holding the governorate and delegation names
+    GEO_DIR = os.getenv("GEO_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "geo"))
+    GEO_GOVERNORATE_PROPERTY = os.getenv("GEO_GOVERNORATE_PROPERTY", "governorate")
+    GEO_DELEGATION_PROPERTY = os.getenv("GEO_DELEGATION_PROPERTY", "delegation")
+
+    # Encoder for callback responses: json, or orjson (faster for figures, slower
+    # for component trees; see serialization.py)
+    JSON_ENGINE = os.getenv("JSON_ENGINE", "json")
+
+    # Profiling (see profiling.py)
+    PROFILE_ENABLED = os.getenv("PROFILE_ENABLED", "").lower() in ("1", "true", "yes")
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0.01"))
+    PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+    PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+    PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
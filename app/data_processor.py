@@ -1,38 +1,80 @@
 import requests
 import logging
-import pandas as pd  
-import plotly.express as px  
+import json
+import numpy as np
 from datetime import datetime
 from .config import Config
+from .store import type_label
+from .metrics import timed, observe_payload
+from .cache import SingleFlightCache
+from .circuit import get_breaker
+from .geo import region_id
+from .outliers import segment_outliers
 
 logger = logging.getLogger(__name__)
 
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+class ApiError(Exception):
+    pass
+
+def _get(endpoint, url, params=None):
+    """GET through the endpoint's circuit breaker; timeouts and 5xx count as failures."""
+    def send():
+        response = requests.get(url, params=params, timeout=Config.API_TIMEOUT)
+        observe_payload("api", endpoint, len(response.content))
+        if response.status_code >= 500:
+            raise ApiError(f"{endpoint} returned HTTP {response.status_code}")
+        return response
+    return get_breaker(endpoint).call(send)
+
+def _get_json(endpoint, url, params=None):
+    response = _get(endpoint, url, params=params)
+    if response.status_code != 200:
+        raise ApiError(f"{endpoint} returned HTTP {response.status_code}")
+    return _loads(response.content)
+
+# Concurrent identical requests share one fetch; expired entries are served
+# stale while a single background refresh runs (see cache.py).
+_statistics_cache = SingleFlightCache("statistics", Config.CACHE_TTL, Config.CACHE_STALE_TTL)
+_new_listings_cache = SingleFlightCache("new_listings", Config.CACHE_TTL, Config.CACHE_STALE_TTL)
+_filtered_cache = SingleFlightCache("filtered_listings", Config.CACHE_TTL, Config.CACHE_STALE_TTL, Config.CACHE_MAX_ENTRIES)
+_by_date_cache = SingleFlightCache("listings_by_date", Config.CACHE_TTL, Config.CACHE_STALE_TTL, Config.CACHE_MAX_ENTRIES)
+_details_cache = SingleFlightCache("listing_details", Config.CACHE_TTL, Config.CACHE_STALE_TTL, Config.CACHE_MAX_ENTRIES)
+_locations_cache = SingleFlightCache("governorates_delegations", Config.CACHE_TTL, Config.CACHE_STALE_TTL)
+
+@timed("fetch")
 def load_data(url):
     try:
-        response = requests.get(url)
+        response = _get("data", url)
         if response.status_code == 200:
             return response.json()
         return {}
     except Exception as e:
-        logger.error(f"Error fetching data: {e}")
+        logger.error("Error fetching data: %s", e)
         return {}
 
+@timed("fetch")
 def load_new_listings(url):
     try:
-        response = requests.get(url)
-        return response.json() if response.status_code == 200 else {}
+        return _new_listings_cache.get(url, lambda: _get_json("/annonces/new", url))
     except Exception as e:
-        logger.error(f"Error fetching new listings: {e}")
+        logger.error("Error fetching new listings: %s", e)
         return {}
 
+@timed("fetch")
 def load_statistics(url):
     try:
-        response = requests.get(url)
-        return response.json() if response.status_code == 200 else {}
+        return _statistics_cache.get(url, lambda: _get_json("/statistics", url))
     except Exception as e:
-        logger.error(f"Error fetching statistics: {e}")
+        logger.error("Error fetching statistics: %s", e)
         return {}
 
+@timed("fetch")
 def fetch_filtered_listings(min_price, max_price, producttype):
     url = f"{Config.FASTAPI_URL}/annonces/price"
     params = {
@@ -43,27 +85,28 @@ def fetch_filtered_listings(min_price, max_price, producttype):
         "limit": 100  
     }
     try:
-        response = requests.get(url, params=params)
-        return response.json() if response.status_code == 200 else {}
+        return _filtered_cache.get(
+            (min_price, max_price, producttype),
+            lambda: _get_json("/annonces/price", url, params=params)
+        )
     except Exception as e:
-        logger.error(f"Error fetching filtered listings: {e}")
+        logger.error("Error fetching filtered listings: %s", e)
         return {}
 
+@timed("fetch")
 def fetch_listing_details(listing_id):
     url = f"{Config.FASTAPI_URL}/annonces/{listing_id}"
     try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            data = response.json()
-            return data.get('listing', data) if isinstance(data, dict) else None
-        return None
+        data = _details_cache.get(listing_id, lambda: _get_json("/annonces/{id}", url))
+        return data.get('listing', data) if isinstance(data, dict) else None
     except Exception as e:
-        logger.error(f"Error fetching listing {listing_id}: {e}")
+        logger.error("Error fetching listing %s: %s", listing_id, e)
         return None
 
 def clean_data(data):
     return data
 
+@timed("fetch")
 def fetch_listings_by_date(start_date, end_date, producttype=None, skip=0, limit=100):
     url = f"{Config.FASTAPI_URL}/annonces/date"
     params = {
@@ -76,45 +119,109 @@ def fetch_listings_by_date(start_date, end_date, producttype=None, skip=0, limit
         params["producttype"] = producttype
 
     try:
-        response = requests.get(url, params=params)
-        return response.json() if response.status_code == 200 else {}
+        return _by_date_cache.get(
+            (start_date, end_date, producttype, skip, limit),
+            lambda: _get_json("/annonces/date", url, params=params)
+        )
     except Exception as e:
-        logger.error(f"Error fetching listings by date: {e}")
+        logger.error("Error fetching listings by date: %s", e)
         return {}
 
+@timed("fetch")
 def fetch_governorates_delegations():
     url = f"{Config.FASTAPI_URL}/governorates-with-delegations"
     try:
-        response = requests.get(url)
-        return response.json().get('governorates_with_delegations', []) if response.status_code == 200 else []
+        data = _locations_cache.get(url, lambda: _get_json("/governorates-with-delegations", url))
+        return data.get('governorates_with_delegations', [])
     except Exception as e:
-        logger.error(f"Error fetching governorates and delegations: {e}")
+        logger.error("Error fetching governorates and delegations: %s", e)
         return []
 
-def fetch_all_listings(max_listings=10000):
+def iter_listing_pages(page_size=None):
+    """Yield the corpus one page of listings at a time.
+
+    Only the current page is held in memory. If a page fails, the pages
+    already yielded stand and iteration stops.
+    """
     url = f"{Config.FASTAPI_URL}/annonces"
-    all_annonces = []
+    limit = page_size or Config.INGEST_PAGE_SIZE
     skip = 0
-    limit = 100
 
     while True:
         try:
-            response = requests.get(url, params={"skip": skip, "limit": limit})
-            if response.status_code == 200:
-                data = response.json()
-                annonces = data.get('annonces', [])
-                all_annonces.extend(annonces)
-                if len(all_annonces) >= data.get('total', 0) or not annonces or len(all_annonces) >= max_listings:
-                    break
-                skip += limit
-            else:
-                return []
-        except Exception:
-            return []
-    
+            data = _get_json("/annonces", url, params={"skip": skip, "limit": limit})
+        except Exception as e:
+            logger.error("Error fetching listings at offset %s, stopping ingestion: %s", skip, e)
+            return
+        annonces = data.get('annonces', [])
+        if annonces:
+            yield annonces
+        skip += len(annonces)
+        if not annonces or skip >= data.get('total', 0):
+            return
+
+def _iter_pages(endpoint, url, params, page_size=None):
+    """Yield every listing of a paginated endpoint, one page at a time.
+
+    Pages are fetched only as they are consumed and are not cached; errors are
+    raised, so a consumer can tell a failed export from a finished one.
+    """
+    limit = page_size or Config.INGEST_PAGE_SIZE
+    skip = 0
+    while True:
+        data = _get_json(endpoint, url, params={**params, "skip": skip, "limit": limit})
+        annonces = data.get('annonces', [])
+        if annonces:
+            yield annonces
+        skip += len(annonces)
+        if not annonces or skip >= data.get('total', 0):
+            return
+
+def iter_filtered_pages(min_price, max_price, producttype, page_size=None):
+    """All listings of the price filter, one page at a time (see fetch_filtered_listings)."""
+    params = {"min_price": min_price, "max_price": max_price, "producttype": producttype}
+    return _iter_pages("/annonces/price", f"{Config.FASTAPI_URL}/annonces/price", params, page_size)
+
+def iter_listings_by_date_pages(start_date, end_date, producttype=None, page_size=None):
+    """All listings of the date filter, one page at a time (see fetch_listings_by_date)."""
+    params = {"start_date": start_date.isoformat(), "end_date": end_date.isoformat()}
+    if producttype is not None:
+        params["producttype"] = producttype
+    return _iter_pages("/annonces/date", f"{Config.FASTAPI_URL}/annonces/date", params, page_size)
+
+@timed("fetch")
+def fetch_all_listings(max_listings=None):
+    all_annonces = []
+    for annonces in iter_listing_pages():
+        all_annonces.extend(annonces)
+        if max_listings is not None and len(all_annonces) >= max_listings:
+            return all_annonces[:max_listings]
     return all_annonces
 
-def process_average_prices_over_time(annonces):
+@timed("fetch")
+def ingest_listings(store, page_size=None):
+    """Stream the whole corpus into ``store`` page by page."""
+    for annonces in iter_listing_pages(page_size):
+        store.extend(annonces)
+    logger.info("Ingested %s listings", len(store))
+    return store
+
+def _frame_outliers(df):
+    """outliers.segment_outliers for a frame with price, type_label, year_month and location columns."""
+    import pandas as pd
+    producttype = pd.factorize(df['type_label'])[0]
+    month = pd.factorize(df['year_month'])[0]
+    if 'location' in df.columns:
+        governorate = pd.factorize(df['location'].apply(lambda x: x.get('governorate') if isinstance(x, dict) else None))[0]
+    else:
+        governorate = np.full(len(df), -1)
+    by_type_month = producttype * (month.max() + 1) + month
+    return segment_outliers(df['price'].to_numpy(dtype=float),
+                            by_type_month * (governorate.max() + 2) + governorate + 1, by_type_month, producttype)
+
+@timed("processor")
+def process_average_prices_over_time(annonces, exclude_outliers=None):
+    import pandas as pd
     if not annonces:
         return pd.DataFrame()
 
@@ -135,9 +242,16 @@ def process_average_prices_over_time(annonces):
     except Exception:
         return pd.DataFrame()
 
+    if exclude_outliers is None:
+        exclude_outliers = Config.EXCLUDE_PRICE_OUTLIERS
+    if exclude_outliers and len(df):
+        df = df[~_frame_outliers(df)]
+
     return df.groupby(['year_month', 'type_label'])['price'].mean().reset_index()
 
+@timed("processor")
 def process_monthly_distribution_by_type(annonces):
+    import pandas as pd
     if not annonces:
         return pd.DataFrame()
 
@@ -159,5 +273,220 @@ def process_monthly_distribution_by_type(annonces):
 
     # Pivot to get counts by month and type
     pivot = df.pivot_table(index='year_month', columns='type_label', aggfunc='size', fill_value=0).reset_index()
-    logger.debug(f"Monthly distribution DataFrame:\n{pivot}")
+    logger.debug("Monthly distribution DataFrame:\n%s", pivot)
     return pivot
+
+def _select(columns, keep):
+    """Restrict store columns to the rows where ``keep`` is set (rows past its end are kept)."""
+    if keep is None:
+        return columns
+    count = len(next(iter(columns.values())))
+    mask = np.ones(count, dtype=bool)
+    mask[:min(count, len(keep))] = keep[:count]
+    return {name: values[mask] for name, values in columns.items()}
+
+def masked_columns(store, names, keep=None, outliers=None):
+    """Store columns for the rows in ``keep``, with the prices flagged in ``outliers`` blanked.
+
+    Blanked (NaN) prices fail every ``price > 0`` test, so outliers drop out of
+    averages and medians while the listings still count.
+    """
+    columns = store.columns(*names)
+    if outliers is not None and 'price' in columns:
+        count = len(columns['price'])
+        flags = np.zeros(count, dtype=bool)
+        flags[:min(count, len(outliers))] = outliers[:count]
+        columns['price'] = np.where(flags, np.nan, columns['price'])
+    return _select(columns, keep)
+
+def _typed_monthly_columns(store, *extra, keep=None, outliers=None):
+    """Month and type label per listing, for listings that have both."""
+    import pandas as pd
+    columns = masked_columns(store, ('year_month', 'producttype', *extra), keep, outliers)
+    mask = (columns['year_month'] >= 0) & (columns['producttype'] >= 0)
+    frame = {
+        'year_month': store.decode('year_month', columns['year_month'][mask]),
+        'type_label': store.decode('producttype', columns['producttype'][mask], convert=type_label),
+    }
+    for name in extra:
+        frame[name] = columns[name][mask]
+    return pd.DataFrame(frame)
+
+@timed("processor")
+def average_prices_over_time(store, keep=None, outliers=None):
+    """Same frame as process_average_prices_over_time, computed from a ListingStore.
+
+    ``keep`` is an optional boolean row mask, e.g. Deduplicator.keep_mask().
+    ``outliers`` optionally masks prices to leave out, e.g. outliers.price_outliers().
+    """
+    import pandas as pd
+    df = _typed_monthly_columns(store, 'price', keep=keep, outliers=outliers)
+    df = df[df['price'] > 0]
+    if df.empty:
+        return pd.DataFrame()
+    return df.groupby(['year_month', 'type_label'])['price'].mean().reset_index()
+
+@timed("processor")
+def monthly_distribution_by_type(store, keep=None):
+    """Same frame as process_monthly_distribution_by_type, computed from a ListingStore."""
+    import pandas as pd
+    df = _typed_monthly_columns(store, keep=keep)
+    if df.empty:
+        return pd.DataFrame()
+    return df.groupby(['year_month', 'type_label']).size().unstack(fill_value=0).reset_index()
+
+@timed("processor")
+def home_cube(store, keep=None, outliers=None):
+    """Pre-aggregate the corpus for cross-filtering on the home page.
+
+    One row per (governorate, delegation, product type, publisher kind) with the
+    listing count and the sum and count of valid prices, as parallel lists that
+    index into the dimension value lists. A few hundred rows cover the country.
+    """
+    columns = masked_columns(store, ('governorate', 'delegation', 'producttype', 'is_shop', 'price'), keep, outliers)
+    if not len(columns['price']):
+        return None
+
+    # Shift codes so missing (-1) becomes 0 and combine them into one key.
+    dims = [columns[name] + 1 for name in ('governorate', 'delegation', 'producttype', 'is_shop')]
+    sizes = [int(dim.max()) + 1 for dim in dims]
+    keys, inverse, counts = np.unique(np.ravel_multi_index(dims, sizes), return_inverse=True, return_counts=True)
+    valid = columns['price'] > 0
+    price_sum = np.bincount(inverse, weights=np.where(valid, columns['price'], 0), minlength=len(keys))
+    price_count = np.bincount(inverse, weights=valid, minlength=len(keys))
+    governorate, delegation, producttype, is_shop = (codes - 1 for codes in np.unravel_index(keys, sizes))
+
+    shop_flags = [int(bool(v)) for v in store.categories('is_shop')]
+    return {
+        "governorates": store.categories('governorate'),
+        "delegations": store.categories('delegation'),
+        "types": [type_label(v) for v in store.categories('producttype')],
+        "governorate": governorate.tolist(),
+        "delegation": delegation.tolist(),
+        "type": producttype.tolist(),
+        "shop": [shop_flags[code] if code >= 0 else -1 for code in is_shop.tolist()],
+        "count": counts.tolist(),
+        "price_sum": price_sum.round(2).tolist(),
+        "price_count": price_count.astype(int).tolist(),
+    }
+
+def code_counts(codes, weights=None, minlength=0):
+    """Count (or sum ``weights``) per code, ignoring missing (-1) codes."""
+    valid = codes >= 0
+    return np.bincount(codes[valid], weights=None if weights is None else weights[valid], minlength=minlength)
+
+def statistics_payload(store, total, shops, governorate_counts, type_counts, pair_counts, price_sums, price_counts):
+    """The /statistics payload from per-code totals over a ListingStore's rows.
+
+    ``pair_counts`` maps (governorate code, delegation code) to a listing count;
+    ``price_sums`` and ``price_counts`` are indexed by product type code.
+    """
+    def ranked(name, totals):
+        values = store.categories(name)
+        order = np.argsort(-totals, kind='stable')
+        return [{'_id': values[code], 'count': int(totals[code])} for code in order if totals[code]]
+
+    def average_price(producttype):
+        code = store.code('producttype', producttype)
+        if code is None or code >= len(price_counts) or not price_counts[code]:
+            return 0
+        return float(price_sums[code] / price_counts[code])
+
+    governorates, delegations = store.categories('governorate'), store.categories('delegation')
+    by_governorate = {}
+    for (governorate, delegation), count in sorted(pair_counts.items(), key=lambda item: (-item[1], item[0])):
+        by_governorate.setdefault(governorate, []).append({'delegation': delegations[delegation], 'count': count})
+
+    return {
+        'total_listings': total,
+        'governorate_stats': ranked('governorate', governorate_counts),
+        'type_stats': ranked('producttype', type_counts),
+        'avg_price_sale': average_price(1),
+        'avg_price_rent': average_price(0),
+        'publisher_stats': [item for item in ({'_id': True, 'count': shops}, {'_id': False, 'count': total - shops})
+                            if item['count']],
+        'delegation_by_governorate': [{'_id': governorates[code], 'delegations': items}
+                                      for code, items in by_governorate.items()],
+    }
+
+@timed("processor")
+def store_statistics(store, keep=None, outliers=None):
+    """The /statistics payload computed from a ListingStore, optionally for the rows in ``keep``.
+
+    Listings without a governorate or delegation are left out of those breakdowns;
+    listings without a publisher type count as individuals.
+    """
+    columns = masked_columns(store, ('governorate', 'delegation', 'producttype', 'is_shop', 'price'), keep, outliers)
+    governorate, delegation, producttype = columns['governorate'], columns['delegation'], columns['producttype']
+
+    shop_code = store.code('is_shop', True)
+    shops = int(np.count_nonzero(columns['is_shop'] == shop_code)) if shop_code is not None else 0
+
+    width = len(store.categories('delegation'))
+    located = (governorate >= 0) & (delegation >= 0)
+    pairs, counts = np.unique(governorate[located].astype(np.int64) * width + delegation[located], return_counts=True)
+    pair_counts = {divmod(pair, width): count for pair, count in zip(pairs.tolist(), counts.tolist())}
+
+    priced = columns['price'] > 0
+    return statistics_payload(
+        store,
+        total=len(columns['price']),
+        shops=shops,
+        governorate_counts=code_counts(governorate),
+        type_counts=code_counts(producttype),
+        pair_counts=pair_counts,
+        price_sums=code_counts(producttype[priced], columns['price'][priced]),
+        price_counts=code_counts(producttype[priced]),
+    )
+
+def _group_medians(groups, values):
+    """Median of ``values`` per distinct group, as (groups, medians)."""
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    unique, starts, counts = np.unique(groups, return_index=True, return_counts=True)
+    return unique, (values[starts + (counts - 1) // 2] + values[starts + counts // 2]) / 2
+
+@timed("processor")
+def regional_statistics(store, level, keep=None, outliers=None):
+    """Listing count and median sale and rent price per governorate or delegation.
+
+    Returns parallel lists keyed by geo.region_id, for joining with boundaries.
+    """
+    columns = masked_columns(store, ('governorate', 'delegation', 'producttype', 'price'), keep, outliers)
+    located = columns['governorate'] >= 0
+    groups = columns['governorate'].astype(np.int64)
+    delegations = store.categories('delegation')
+    if level == 'delegation':
+        located &= columns['delegation'] >= 0
+        groups = groups * len(delegations) + columns['delegation']
+
+    unique, counts = np.unique(groups[located], return_counts=True)
+    medians = {}
+    for name, producttype in (('median_sale', 1), ('median_rent', 0)):
+        code = store.code('producttype', producttype)
+        selected = located & (columns['producttype'] == code) & (columns['price'] > 0)
+        priced, values = _group_medians(groups[selected], columns['price'][selected])
+        by_group = dict(zip(priced.tolist(), values.tolist()))
+        medians[name] = [by_group.get(group) for group in unique.tolist()]
+
+    governorates = store.categories('governorate')
+    ids, names = [], []
+    for group in unique.tolist():
+        if level == 'delegation':
+            governorate, delegation = divmod(group, len(delegations))
+            ids.append(region_id(governorates[governorate], delegations[delegation]))
+            names.append(f"{delegations[delegation]}, {governorates[governorate]}")
+        else:
+            ids.append(region_id(governorates[group]))
+            names.append(governorates[group])
+    return {"ids": ids, "names": names, "count": counts.tolist(), **medians}
+
+def load_analytics(store, keep=None, outliers=None):
+    """Return the (average prices, monthly distribution) frames for /all-listings.
+
+    Large stores are aggregated in a process pool (see partitioned.py).
+    """
+    if Config.PARTITION_WORKERS > 1 and len(store) >= Config.PARTITION_MIN_ROWS:
+        from .partitioned import partitioned_analytics
+        return partitioned_analytics(store, Config.PARTITION_WORKERS, keep, outliers)
+    return average_prices_over_time(store, keep, outliers), monthly_distribution_by_type(store, keep)
@@ -0,0 +1,163 @@
+"""
+Near-duplicate detection for the listing corpus with MinHash and LSH.
+
+The same property is often posted several times, by shops and individuals
+alike. Each listing's title and description are reduced to word-bigram
+shingles (normalized like the search index), summarized by a MinHash signature
+of ``NUM_PERM`` values and cut into ``BANDS`` band keys salted with the
+listing's governorate and delegation. Listings that share a band key are
+candidates; candidates whose prices are within ``PRICE_TOLERANCE`` are merged
+with union-find, and the earliest ingested listing of each cluster is its
+canonical one.
+
+``Deduplicator`` is a ``ListingStore`` listener: band keys are computed page by
+page during ingestion and only the keys are kept (``BANDS`` * 8 bytes per
+listing). ``cluster()`` sorts each band column (by key, then price) to find
+collisions, so it runs in O(n log n) instead of comparing every pair.
+"""
+
+import threading
+import zlib
+from array import array
+
+import numpy as np
+
+from .metrics import set_gauge, timed
+from .search import tokenize
+from .utils import logger
+
+NUM_PERM = 32
+BANDS = 8  # 4 rows per band: listings above ~60% shingle similarity collide
+PRICE_TOLERANCE = 0.05
+
+_ROWS = NUM_PERM // BANDS
+_PRIME = np.uint64((1 << 61) - 1)
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+# Fixed seed: band keys must mean the same thing in every process and run.
+_rng = np.random.default_rng(1729)
+_A = _rng.integers(1, 1 << 32, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 32, NUM_PERM, dtype=np.uint64)
+
+
+def _shingles(annonce):
+    tokens = tokenize(f"{annonce.get('title') or ''} {annonce.get('description') or ''}")
+    grams = [f"{a} {b}" for a, b in zip(tokens, tokens[1:])] or tokens
+    if not grams:
+        # No text to compare: a shingle of its own so it only matches itself.
+        grams = [f"#{annonce.get('id')}"]
+    return {zlib.crc32(gram.encode('utf-8')) for gram in grams}
+
+
+def band_keys(annonces):
+    """LSH band keys of ``annonces`` as a (len(annonces), BANDS) uint64 array."""
+    if not annonces:
+        return np.empty((0, BANDS), dtype=np.uint64)
+    shingles = [_shingles(annonce) for annonce in annonces]
+    lengths = np.fromiter((len(s) for s in shingles), dtype=np.int64, count=len(shingles))
+    hashes = np.fromiter((h for s in shingles for h in s), dtype=np.uint64, count=int(lengths.sum()))
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+    # One row per permutation, one column per listing; uint64 arithmetic wraps on purpose.
+    signatures = np.minimum.reduceat((_A[:, None] * hashes + _B[:, None]) % _PRIME, starts, axis=1)
+    bands = signatures.reshape(BANDS, _ROWS, len(annonces))
+    locations = np.fromiter(
+        (zlib.crc32(f"{(a.get('location') or {}).get('governorate')}|"
+                    f"{(a.get('location') or {}).get('delegation')}".encode('utf-8')) for a in annonces),
+        dtype=np.uint64, count=len(annonces))
+    keys = np.broadcast_to(locations, (BANDS, len(annonces))).copy()
+    for row in range(_ROWS):
+        keys = keys * _MIX + bands[:, row, :]
+    return keys.T
+
+
+class Deduplicator:
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self._keys = array('Q')
+        self._canonical = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self._keys) // BANDS
+
+    def add(self, rows, annonces):
+        """Compute band keys for listings the store just added (a ``ListingStore`` listener)."""
+        keys = band_keys(annonces)
+        with self._lock:
+            for row, row_keys in zip(rows, keys.tolist()):
+                if row < len(self):
+                    continue
+                # Rows stored before the deduplicator existed get keys that match nothing.
+                while len(self) < row:
+                    self._keys.extend([(1 << 64) - 1 - len(self)] * BANDS)
+                self._keys.extend(row_keys)
+
+    @timed("processor")
+    def cluster(self):
+        """Group near-duplicates; returns how many listings duplicate an earlier one."""
+        with self._lock:
+            if not self._keys:
+                return 0
+            keys = np.frombuffer(self._keys, dtype=np.uint64).reshape(-1, BANDS).copy()
+        count = len(keys)
+        prices = self.store.columns('price')['price'][:count]
+
+        # Sorted by key, then price: within a run of equal keys, two listings
+        # within PRICE_TOLERANCE of each other are linked by a chain of adjacent
+        # ones that are, so comparing neighbours finds every mergeable pair.
+        left, right = [], []
+        for band in range(BANDS):
+            order = np.lexsort((prices, keys[:, band]))
+            sorted_keys = keys[order, band]
+            same = np.flatnonzero(sorted_keys[1:] == sorted_keys[:-1])
+            left.append(order[same])
+            right.append(order[same + 1])
+        left, right = np.concatenate(left), np.concatenate(right)
+        close = ((np.isnan(prices[left]) & np.isnan(prices[right]))
+                 | (np.abs(prices[left] - prices[right]) <= PRICE_TOLERANCE * np.fmax(prices[left], prices[right])))
+        left, right = left[close], right[close]
+
+        # Union-find with the smaller row as root, so each root is its cluster's first row.
+        parent = list(range(count))
+        for a, b in zip(left.tolist(), right.tolist()):
+            while parent[a] != a:
+                parent[a] = parent[parent[a]]
+                a = parent[a]
+            while parent[b] != b:
+                parent[b] = parent[parent[b]]
+                b = parent[b]
+            if a != b:
+                parent[max(a, b)] = min(a, b)
+        canonical = np.array(parent, dtype=np.int64)
+        while True:
+            jumped = canonical[canonical]
+            if np.array_equal(jumped, canonical):
+                break
+            canonical = jumped
+
+        with self._lock:
+            self._canonical = canonical
+        duplicates = int(np.count_nonzero(canonical != np.arange(count)))
+        set_gauge("dashboard_duplicate_listings", {}, duplicates)
+        logger.info("Found %s near-duplicates among %s listings", duplicates, count)
+        return duplicates
+
+    def keep_mask(self):
+        """Boolean mask over store rows, False for listings that duplicate an earlier one.
+
+        Rows added since the last ``cluster()`` are kept.
+        """
+        with self._lock:
+            canonical = self._canonical
+        keep = np.ones(len(self.store), dtype=bool)
+        clustered = min(len(canonical), len(keep))
+        keep[:clustered] = canonical[:clustered] == np.arange(clustered)
+        return keep
+
+    def canonical_id(self, listing_id):
+        """Id of the listing that represents ``listing_id``'s cluster."""
+        row = self.store.row(listing_id)
+        with self._lock:
+            if row is None or row >= len(self._canonical):
+                return listing_id
+            return self.store.ids[self._canonical[row]]
@@ -0,0 +1,212 @@
+"""
+Streaming CSV and Parquet exports of the price and date filters.
+
+``/export/price.<csv|parquet>`` takes the price filter's parameters
+(``min_price``, ``max_price``, ``producttype``) and ``/export/date.<csv|parquet>``
+the date filter's (``start_date``, ``end_date``, ``producttype``, ``location``).
+Rows are paged from the data source and written to the response as they
+arrive: one CSV chunk per page, or one Parquet row group per ``ROW_GROUP_ROWS``
+listings. Server memory stays bounded by one page (or row group) whatever the
+result size. When the client disconnects, the WSGI server closes the response
+generator, which stops paging.
+
+Parquet needs pyarrow; without it only CSV is offered.
+"""
+
+import csv
+import importlib.util
+import io
+from datetime import datetime
+
+from .metrics import increment
+from .store import type_label
+from .utils import logger
+
+FORMATS = ("csv", "parquet")
+COLUMNS = ("id", "title", "price", "type", "governorate", "delegation", "published_on", "description")
+ROW_GROUP_ROWS = 10000
+
+
+def parquet_available():
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _row(annonce):
+    location = annonce.get('location') or {}
+    metadata = annonce.get('metadata') or {}
+    price = annonce.get('price')
+    producttype = metadata.get('producttype')
+    return (
+        annonce.get('id'),
+        annonce.get('title'),
+        float(price) if isinstance(price, (int, float)) and not isinstance(price, bool) else None,
+        type_label(producttype) if producttype is not None else None,
+        location.get('governorate'),
+        location.get('delegation'),
+        metadata.get('publishedOn'),
+        annonce.get('description'),
+    )
+
+
+def iter_csv(pages):
+    """CSV text chunks for ``pages`` of listings: the header, then one chunk per page."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    yield buffer.getvalue()
+    for annonces in pages:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(_row(annonce) for annonce in annonces)
+        yield buffer.getvalue()
+
+
+class _ChunkSink:
+    """Write-only file that hands out what was written since the last drain."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def iter_parquet(pages, row_group_rows=ROW_GROUP_ROWS):
+    """Parquet file bytes for ``pages`` of listings, one row group at a time."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.string()), ("title", pa.string()), ("price", pa.float64()), ("type", pa.string()),
+        ("governorate", pa.string()), ("delegation", pa.string()), ("published_on", pa.string()),
+        ("description", pa.string()),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    rows = []
+
+    def row_group():
+        columns = list(zip(*rows))
+        writer.write_table(pa.table(
+            {name: [None if v is None else (v if name == "price" else str(v)) for v in values]
+             for name, values in zip(COLUMNS, columns)},
+            schema=schema))
+        rows.clear()
+        return sink.drain()
+
+    try:
+        for annonces in pages:
+            rows.extend(_row(annonce) for annonce in annonces)
+            if len(rows) >= row_group_rows:
+                yield row_group()
+        if rows:
+            yield row_group()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def stream_export(pages, fmt, name):
+    """Wrap an export so completion, failure and client cancellation are logged and counted."""
+    chunks = iter_csv(pages) if fmt == "csv" else iter_parquet(pages)
+    status = "failed"
+    try:
+        yield from chunks
+        status = "completed"
+    except GeneratorExit:
+        status = "cancelled"
+        raise
+    except Exception as e:
+        logger.error("Export %s failed: %s", name, e)
+        raise
+    finally:
+        chunks.close()
+        pages.close()
+        increment("dashboard_exports_total", {"export": name, "format": fmt, "status": status})
+        logger.info("Export %s.%s %s", name, fmt, status)
+
+
+def _number(value, cast=float):
+    return cast(value) if value not in (None, "", "None") else None
+
+
+def _date(value):
+    return datetime.strptime(value.split('T')[0], '%Y-%m-%d')
+
+
+def init_export(server):
+    """Serve ``/export/price.<format>`` and ``/export/date.<format>``."""
+    from flask import Response, abort, request, stream_with_context
+
+    from .sources import iter_filtered_pages, iter_listings_by_date_pages
+
+    def respond(pages, fmt, name):
+        if fmt not in FORMATS or (fmt == "parquet" and not parquet_available()):
+            pages.close()
+            abort(404)
+        mimetype = "text/csv" if fmt == "csv" else "application/vnd.apache.parquet"
+        filename = f"listings-{name}-{datetime.now():%Y%m%d-%H%M%S}.{fmt}"
+        return Response(stream_with_context(stream_export(pages, fmt, name)), mimetype=mimetype,
+                        headers={"Content-Disposition": f'attachment; filename="{filename}"',
+                                 "X-Accel-Buffering": "no"})
+
+    @server.route("/export/price.<fmt>")
+    def export_price(fmt):
+        try:
+            pages = iter_filtered_pages(_number(request.args.get("min_price")),
+                                        _number(request.args.get("max_price")),
+                                        _number(request.args.get("producttype"), int))
+        except ValueError:
+            abort(400)
+        return respond(pages, fmt, "price")
+
+    @server.route("/export/date.<fmt>")
+    def export_date(fmt):
+        try:
+            start_date, end_date = _date(request.args["start_date"]), _date(request.args["end_date"])
+            producttype = _number(request.args.get("producttype"), int)
+            location = _location(request.args.get("location"))
+        except (KeyError, ValueError):
+            abort(400)
+        pages = iter_listings_by_date_pages(start_date, end_date, producttype)
+        if location:
+            pages = _in_location(pages, *location)
+        return respond(pages, fmt, "date")
+
+
+def _location(value):
+    """(governorate, delegation) from a "governorate|delegation" location, or None."""
+    if not value:
+        return None
+    governorate, separator, delegation = value.partition('|')
+    if not separator or not governorate or not delegation:
+        raise ValueError(f"Invalid location: {value!r}")
+    return governorate, delegation
+
+
+def _in_location(pages, governorate, delegation):
+    """Keep the listings of one delegation, as the date filter page does."""
+    for annonces in pages:
+        kept = [a for a in annonces
+                if (a.get('location') or {}).get('governorate') == governorate
+                and (a.get('location') or {}).get('delegation') == delegation]
+        if kept:
+            yield kept
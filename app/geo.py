@@ -0,0 +1,209 @@
+"""
+Boundary geometry for the choropleth map.
+
+Governorate and delegation boundaries are read from GeoJSON files in
+``GEO_DIR`` (``governorates.geojson`` and ``delegations.geojson``; none are
+bundled, any source works once its name properties are configured). Each
+feature gets the normalized region id the aggregates use, so names that differ
+only by case, accents or hyphens still join.
+
+Geometry is simplified once per detail level with Douglas-Peucker, TopoJSON
+style: rings are cut at the vertices where the set of neighbouring regions
+changes and each piece is simplified with its ends fixed, so a border shared by
+two regions is simplified the same way on both sides and no gaps or overlaps
+appear. The result is serialized once and served from ``/geo/<level>-<detail>.geojson``
+with an ETag and a long max-age: the browser downloads each geometry once and
+plotly keeps it while the map switches metrics.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import defaultdict
+
+import numpy as np
+
+from .config import Config
+from .search import normalize
+from .utils import logger
+
+LEVELS = ('governorate', 'delegation')
+# Simplification tolerance in degrees per detail level (1e-3 degrees is ~100 m)
+DETAILS = {'low': 0.02, 'medium': 0.005, 'high': 0.001}
+COORDINATE_DECIMALS = 5
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def region_id(governorate, delegation=None):
+    """Join key of a governorate, or of a delegation within its governorate."""
+    key = _NON_WORD.sub('', normalize(str(governorate or '')))
+    if delegation is not None:
+        key = f"{key}|{_NON_WORD.sub('', normalize(str(delegation)))}"
+    return key
+
+
+def _douglas_peucker(points, tolerance):
+    """Indices of ``points`` (an n x 2 array) kept by Douglas-Peucker; both ends are kept."""
+    count = len(points)
+    keep = np.zeros(count, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, count - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        segment = points[end] - points[start]
+        offsets = points[start + 1:end] - points[start]
+        length = np.hypot(segment[0], segment[1])
+        if length == 0:
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        else:
+            distances = np.abs(segment[0] * offsets[:, 1] - segment[1] * offsets[:, 0]) / length
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            middle = start + 1 + farthest
+            keep[middle] = True
+            stack.extend(((start, middle), (middle, end)))
+    return np.flatnonzero(keep)
+
+
+def _rings(geometry):
+    """Every ring of a Polygon or MultiPolygon, as lists of (x, y) tuples."""
+    polygons = [geometry['coordinates']] if geometry['type'] == 'Polygon' else geometry['coordinates']
+    return [[tuple(round(c, 6) for c in point[:2]) for point in ring] for polygon in polygons for ring in polygon]
+
+
+def _junctions(rings):
+    """Vertices where the set of rings sharing the boundary changes."""
+    owners = defaultdict(set)
+    for number, ring in enumerate(rings):
+        for point in ring:
+            owners[point].add(number)
+    junctions = set()
+    for ring in rings:
+        points = ring[:-1]
+        for k, point in enumerate(points):
+            if owners[point] != owners[points[k - 1]] or owners[point] != owners[points[(k + 1) % len(points)]]:
+                junctions.add(point)
+    return junctions
+
+
+def _simplify_ring(ring, junctions, tolerance):
+    points = ring[:-1] if ring[0] == ring[-1] else ring
+    if len(points) < 4:
+        return ring
+    coordinates = np.array(points)
+    cuts = [k for k, point in enumerate(points) if point in junctions]
+    if len(cuts) < 2:
+        # An unshared ring (coast, island): pin its first vertex and the one farthest from it.
+        first = cuts[0] if cuts else 0
+        farthest = int(np.argmax(np.hypot(*(coordinates - coordinates[first]).T)))
+        cuts = sorted({first, farthest})
+    kept = []
+    for start, end in zip(cuts, cuts[1:] + [cuts[0] + len(points)]):
+        indices = np.arange(start, end + 1) % len(points)
+        kept.extend(indices[_douglas_peucker(coordinates[indices], tolerance)][:-1].tolist())
+    if len(kept) < 3:
+        return None
+    simplified = [[round(float(x), COORDINATE_DECIMALS), round(float(y), COORDINATE_DECIMALS)]
+                  for x, y in coordinates[kept]]
+    return simplified + [simplified[0]]
+
+
+class Boundaries:
+    """Boundary files of ``GEO_DIR`` and their simplified, serialized versions."""
+
+    def __init__(self, geo_dir=None):
+        self.geo_dir = geo_dir or Config.GEO_DIR
+        self._lock = threading.Lock()
+        self._features = {}
+        self._payloads = {}
+
+    def _path(self, level):
+        return os.path.join(self.geo_dir, f"{level}s.geojson")
+
+    def available(self, level):
+        return os.path.exists(self._path(level))
+
+    def _load(self, level):
+        """Features of ``level`` with their region id; [] if the file is missing."""
+        if level not in self._features:
+            features = []
+            if self.available(level):
+                with open(self._path(level), encoding='utf-8') as f:
+                    collection = json.load(f)
+                for feature in collection.get('features', []):
+                    properties = feature.get('properties') or {}
+                    governorate = properties.get(Config.GEO_GOVERNORATE_PROPERTY)
+                    delegation = properties.get(Config.GEO_DELEGATION_PROPERTY) if level == 'delegation' else None
+                    geometry = feature.get('geometry') or {}
+                    if governorate is None or geometry.get('type') not in ('Polygon', 'MultiPolygon'):
+                        continue
+                    if level == 'delegation' and delegation is None:
+                        continue
+                    features.append((region_id(governorate, delegation), delegation or governorate, geometry))
+                logger.info("Loaded %d %s boundaries", len(features), level)
+            self._features[level] = features
+        return self._features[level]
+
+    def payload(self, level, detail):
+        """(serialized FeatureCollection, ETag) for ``level`` at ``detail``, or None."""
+        key = (level, detail)
+        with self._lock:
+            if key not in self._payloads:
+                features = self._load(level)
+                self._payloads[key] = self._serialize(features, DETAILS[detail]) if features else None
+            return self._payloads[key]
+
+    def _serialize(self, features, tolerance):
+        rings_by_feature = [_rings(geometry) for _, _, geometry in features]
+        junctions = _junctions([ring for rings in rings_by_feature for ring in rings])
+        output = []
+        for (feature_id, name, geometry), rings in zip(features, rings_by_feature):
+            polygons = [geometry['coordinates']] if geometry['type'] == 'Polygon' else geometry['coordinates']
+            rings = iter(rings)
+            simplified = []
+            for polygon in polygons:
+                parts = [_simplify_ring(next(rings), junctions, tolerance) for _ in polygon]
+                # A polygon whose outer ring vanished at this detail is dropped with its holes.
+                if parts[0] is not None:
+                    simplified.append([part for part in parts if part is not None])
+            if simplified:
+                output.append({
+                    "type": "Feature",
+                    "id": feature_id,
+                    "properties": {"name": name},
+                    "geometry": {"type": "MultiPolygon", "coordinates": simplified},
+                })
+        payload = json.dumps({"type": "FeatureCollection", "features": output},
+                             separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        return payload, hashlib.sha1(payload).hexdigest()
+
+    def warm(self):
+        """Simplify and serialize every available level and detail (before workers fork)."""
+        for level in LEVELS:
+            if self.available(level):
+                for detail in DETAILS:
+                    self.payload(level, detail)
+
+
+def init_geo(server, boundaries):
+    """Serve simplified boundaries on ``/geo/<level>-<detail>.geojson``."""
+    from flask import Response, abort, request
+
+    @server.route("/geo/<level>-<detail>.geojson")
+    def geojson(level, detail):
+        if level not in LEVELS or detail not in DETAILS:
+            abort(404)
+        result = boundaries.payload(level, detail)
+        if result is None:
+            abort(404)
+        payload, etag = result
+        response = Response(payload, mimetype="application/geo+json")
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = 86400
+        return response.make_conditional(request)
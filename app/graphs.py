@@ -1,9 +1,11 @@
-import plotly.express as px
-import plotly.graph_objects as go
-import pandas as pd
+# plotly and pandas are imported inside the chart functions, on first use, so
+# importing the app stays fast (see benchmarks/bench_startup.py).
 from .utils import logger  # Add this import at the top
+from .metrics import timed
 
+@timed("figure")
 def create_pie_chart(data, title):
+    import plotly.express as px
     sorted_data = dict(sorted(data.items(), key=lambda x: x[1], reverse=True)[:10])
     fig = px.bar(
         x=list(sorted_data.keys()),
@@ -35,8 +37,11 @@ def create_pie_chart(data, title):
     )
     return fig
 
+@timed("figure")
 def create_type_chart(data):
     """Generate a donut chart for listing types."""
+    import plotly.express as px
+    import plotly.graph_objects as go
     # Convert numeric types to labels and handle None values
     labels = {1: 'Sale', 0: 'Rent'}
     type_data = {}
@@ -76,8 +81,10 @@ def create_type_chart(data):
     )
     return fig
 
+@timed("figure")
 def create_bar_chart(data, title, x_label, y_label):
     """Generate a bar chart."""
+    import plotly.express as px
     # Sort data by values in descending order and take top 10
     sorted_data = dict(sorted(data.items(), key=lambda x: x[1], reverse=True)[:10])
     fig = px.bar(
@@ -109,8 +116,11 @@ def create_bar_chart(data, title, x_label, y_label):
     )
     return fig
 
+@timed("figure")
 def create_delegation_chart(delegation_data):
     """Generate a chart showing top delegations by governorate."""
+    import pandas as pd
+    import plotly.express as px
     # Process delegation data
     governorates = []
     delegations = []
@@ -171,8 +181,10 @@ def create_delegation_chart(delegation_data):
     )
     return fig
 
+@timed("figure")
 def create_publisher_chart(publisher_stats):
     """Generate a chart showing publisher type distribution."""
+    import plotly.express as px
     # Convert boolean to string labels
     labels = {True: 'Shop', False: 'Individual'}
     data = {labels[k]: v for k, v in publisher_stats.items()}
@@ -201,8 +213,11 @@ def create_publisher_chart(publisher_stats):
     )
     return fig
 
+@timed("figure")
 def create_avg_price_line_chart(df):
     """Generate a line chart showing average prices over time, split by Rent and Sale."""
+    import plotly.express as px
+    import plotly.graph_objects as go
     if df.empty:
         logger.warning("No data for average price line chart")
         return go.Figure()
@@ -274,8 +289,11 @@ def create_avg_price_line_chart(df):
     )
     return fig
 
+@timed("figure")
 def create_stacked_bar_chart(df):
     """Generate a grouped bar chart showing monthly distribution by property type."""
+    import plotly.express as px
+    import plotly.graph_objects as go
     if df.empty:
         logger.warning("No data for grouped bar chart")
         return go.Figure()
@@ -15,11 +15,12 @@ from .graphs import (
     create_stacked_bar_chart
 )
 from datetime import datetime
+from urllib.parse import urlencode
 from .config import Config
+from .cache import SingleFlightCache
+from .export import parquet_available
 from .utils import logger
-from .data_processor import fetch_listing_details, fetch_governorates_delegations
-import pandas as pd
-import json
+from .sources import fetch_listing_details, fetch_governorates_delegations
 
 def create_navigation_header(active_page='/'):
     return dbc.Navbar(
@@ -37,7 +38,11 @@ def create_navigation_header(active_page='/'):
                         dbc.NavItem(dbc.NavLink(
                             "📅 Date Filter", href="/date-filter", active=active_page == "/date-filter", className="nav-link")),
                         dbc.NavItem(dbc.NavLink(
-                            "📈 All Listings", href="/all-listings", active=active_page == "/all-listings", className="nav-link"))
+                            "📈 All Listings", href="/all-listings", active=active_page == "/all-listings", className="nav-link")),
+                        dbc.NavItem(dbc.NavLink(
+                            "🗺️ Map", href="/map", active=active_page == "/map", className="nav-link")),
+                        dbc.NavItem(dbc.NavLink(
+                            "🔎 Search", href="/search", active=active_page == "/search", className="nav-link"))
                     ], className="ms-auto")
                 ])
             ], align="center")
@@ -47,12 +52,52 @@ def create_navigation_header(active_page='/'):
     )
 
 
-def create_layout(statistics_data, new_listings_data):
-    """Create the main dashboard layout with key metrics and charts."""
+def create_staleness_banner(degraded):
+    """Warn that some data is served from cache while backend endpoints are failing.
+
+    ``degraded`` maps endpoint names to the time of their last successful call.
+    """
+    if not degraded:
+        return None
+    last_success = [t for t in degraded.values() if t]
+    if last_success:
+        minutes = int((datetime.now().timestamp() - min(last_success)) // 60)
+        age = f"from {minutes} minute{'s' if minutes != 1 else ''} ago" if minutes else "from less than a minute ago"
+    else:
+        age = "that may be incomplete"
+    return dbc.Alert(
+        [
+            html.I(className="fas fa-exclamation-triangle me-2"),
+            f"The listings service is not responding. Showing cached data {age}."
+        ],
+        color="warning",
+        className="text-center mb-0 rounded-0 staleness-banner"
+    )
+
+
+def create_layout(statistics_data, new_listings_data, cube=None, dedup_toggle=True):
+    """Create the main dashboard layout with key metrics and charts.
+
+    ``cube`` is the pre-aggregated corpus (data_processor.home_cube). When given,
+    clicking a governorate bar or a Sale/Rent slice filters the other charts and
+    the metrics in the browser (assets/crossfilter.js) without a server round trip.
+    The static snapshot (snapshot.py) leaves out the server-side dedup toggle.
+    """
     if not isinstance(statistics_data, dict) or not isinstance(new_listings_data, dict):
         logger.error("Invalid data format for dashboard layout")
         return html.Div("Error: Data is not in the expected format.")
 
+    return html.Div([
+        create_navigation_header('/'),
+        dbc.Container([
+            html.H1("🏠 Tunisian Real Estate Dashboard", className="emoji-header text-center my-4 p-3"),
+            create_dedup_toggle('dashboard-dedup') if dedup_toggle else None,
+            html.Div(create_dashboard_body(statistics_data, cube), id='dashboard-body')
+        ], fluid=True, className="dashboard-container p-4")
+    ])
+
+def create_dashboard_body(statistics_data, cube=None):
+    """Metric cards and charts of the main dashboard, re-rendered by the dedup toggle."""
     total_listings = statistics_data.get('total_listings', 0)
     governorate_stats = {item['_id']: item['count'] for item in statistics_data.get('governorate_stats', [])}
     type_stats = {item['_id']: item['count'] for item in statistics_data.get('type_stats', [])}
@@ -65,90 +110,149 @@ def create_layout(statistics_data, new_listings_data):
     total_individuals = sum(count for is_shop, count in publisher_stats.items() if not is_shop)
     shop_percentage = round((total_shops / total_listings) * 100, 1) if total_listings > 0 else 0
 
+    return [
+        dbc.Row([
+            dbc.Col(
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H4("📊 Total Listings", className="card-title mb-2"),
+                        html.H2(f"{total_listings:,}", id='metric-total', className="metric-value text-pastel-blue")
+                    ])
+                ], className="metric-card pastel-border-blue hover-scale", color="light"),
+                md=3, className="mb-4"
+            ),
+            dbc.Col(
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H4("💰 Avg Sale Price", className="card-title mb-2"),
+                        html.H2(f"{avg_price_sale:,.2f} TND", id='metric-avg-sale', className="metric-value text-pastel-mint")
+                    ])
+                ], className="metric-card pastel-border-mint hover-scale", color="light"),
+                md=3, className="mb-4"
+            ),
+            dbc.Col(
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H4("🏘️ Avg Rent Price", className="card-title mb-2"),
+                        html.H2(f"{avg_price_rent:,.2f} TND", id='metric-avg-rent', className="metric-value text-pastel-peach")
+                    ])
+                ], className="metric-card pastel-border-peach hover-scale", color="light"),
+                md=3, className="mb-4"
+            ),
+            dbc.Col(
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H4("🏪 Shop Listings", className="card-title mb-2"),
+                        html.H2(f"{shop_percentage}%", id='metric-shop', className="metric-value text-pastel-pink")
+                    ])
+                ], className="metric-card pastel-border-pink hover-scale", color="light"),
+                md=3, className="mb-4"
+            )
+        ], className="mb-5 g-3"),
+        *(create_crossfilter_controls(cube) if cube else []),
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader("📍 Listings by Governorate", className="chart-header"),
+                    dbc.CardBody([
+                        dcc.Graph(
+                            id='governorate-pie',
+                            figure=create_pie_chart(governorate_stats, "Listings by Governorate")
+                        )
+                    ])
+                ], className="chart-card mb-4"),
+                dbc.Card([
+                    dbc.CardHeader("🏢 Publisher Types", className="chart-header"),
+                    dbc.CardBody([
+                        dcc.Graph(id='publisher-chart', figure=create_publisher_chart(publisher_stats))
+                    ])
+                ], className="chart-card")
+            ], md=6),
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader("🏛️ Property Types", className="chart-header"),
+                    dbc.CardBody([
+                        dcc.Graph(id='type-chart', figure=create_type_chart(type_stats))
+                    ])
+                ], className="chart-card mb-4"),
+                dbc.Card([
+                    dbc.CardHeader("🗺️ Top Delegations", className="chart-header"),
+                    dbc.CardBody([
+                        dcc.Graph(id='delegation-chart', figure=create_delegation_chart(delegation_data))
+                    ])
+                ], className="chart-card")
+            ], md=6)
+        ], className="g-4")
+    ]
+
+def create_dedup_toggle(toggle_id):
+    """Switch between all listings and one listing per cluster of near-duplicates."""
+    return dbc.Row(
+        dbc.Col(
+            dbc.Switch(
+                id=toggle_id,
+                label="Deduplicated",
+                value=False,
+                className="text-muted"
+            ),
+            width="auto"
+        ),
+        justify="end",
+        className="mb-2 px-2"
+    )
+
+def create_export_links(export, params):
+    """Download buttons streaming every listing of a filter from ``/export/<export>.<format>``.
+
+    ``params`` are the filter's query parameters; None values are left out.
+    """
+    query = urlencode({key: value for key, value in params.items() if value is not None})
+    formats = ["csv", "parquet"] if parquet_available() else ["csv"]
     return html.Div([
-        create_navigation_header('/'),
-        dbc.Container([
-            html.H1("🏠 Tunisian Real Estate Dashboard", className="emoji-header text-center my-4 p-3"),
-            dbc.Row([
-                dbc.Col(
-                    dbc.Card([
-                        dbc.CardBody([
-                            html.H4("📊 Total Listings", className="card-title mb-2"),
-                            html.H2(f"{total_listings:,}", className="metric-value text-pastel-blue")
-                        ])
-                    ], className="metric-card pastel-border-blue hover-scale", color="light"),
-                    md=3, className="mb-4"
-                ),
-                dbc.Col(
-                    dbc.Card([
-                        dbc.CardBody([
-                            html.H4("💰 Avg Sale Price", className="card-title mb-2"),
-                            html.H2(f"{avg_price_sale:,.2f} TND", className="metric-value text-pastel-mint")
-                        ])
-                    ], className="metric-card pastel-border-mint hover-scale", color="light"),
-                    md=3, className="mb-4"
-                ),
-                dbc.Col(
-                    dbc.Card([
-                        dbc.CardBody([
-                            html.H4("🏘️ Avg Rent Price", className="card-title mb-2"),
-                            html.H2(f"{avg_price_rent:,.2f} TND", className="metric-value text-pastel-peach")
-                        ])
-                    ], className="metric-card pastel-border-peach hover-scale", color="light"),
-                    md=3, className="mb-4"
+        dbc.Button(
+            f"⬇️ {fmt.upper()}",
+            href=f"/export/{export}.{fmt}?{query}",
+            external_link=True,
+            color="secondary",
+            outline=True,
+            size="sm",
+            className="ms-2"
+        )
+        for fmt in formats
+    ], className="d-flex justify-content-end mb-2")
+
+def create_crossfilter_controls(cube):
+    """Stores and status line for browser-side cross-filtering of the dashboard."""
+    return [
+        dcc.Store(id='home-cube', data=cube),
+        dcc.Store(id='home-filter', data={}),
+        dbc.Row([
+            dbc.Col(
+                html.Span(
+                    "Click a governorate bar or a Sale/Rent slice to filter the dashboard.",
+                    id='home-filter-status',
+                    className="text-muted"
                 ),
-                dbc.Col(
-                    dbc.Card([
-                        dbc.CardBody([
-                            html.H4("🏪 Shop Listings", className="card-title mb-2"),
-                            html.H2(f"{shop_percentage}%", className="metric-value text-pastel-pink")
-                        ])
-                    ], className="metric-card pastel-border-pink hover-scale", color="light"),
-                    md=3, className="mb-4"
-                )
-            ], className="mb-5 g-3"),
-            dbc.Row([
-                dbc.Col([
-                    dbc.Card([
-                        dbc.CardHeader("📍 Listings by Governorate", className="chart-header"),
-                        dbc.CardBody([
-                            dcc.Graph(
-                                id='governorate-pie',
-                                figure=create_pie_chart(governorate_stats, "Listings by Governorate")
-                            )
-                        ])
-                    ], className="chart-card mb-4"),
-                    dbc.Card([
-                        dbc.CardHeader("🏢 Publisher Types", className="chart-header"),
-                        dbc.CardBody([
-                            dcc.Graph(id='publisher-chart', figure=create_publisher_chart(publisher_stats))
-                        ])
-                    ], className="chart-card")
-                ], md=6),
-                dbc.Col([
-                    dbc.Card([
-                        dbc.CardHeader("🏛️ Property Types", className="chart-header"),
-                        dbc.CardBody([
-                            dcc.Graph(id='type-chart', figure=create_type_chart(type_stats))
-                        ])
-                    ], className="chart-card mb-4"),
-                    dbc.Card([
-                        dbc.CardHeader("🗺️ Top Delegations", className="chart-header"),
-                        dbc.CardBody([
-                            dcc.Graph(id='delegation-chart', figure=create_delegation_chart(delegation_data))
-                        ])
-                    ], className="chart-card")
-                ], md=6)
-            ], className="g-4")
-        ], fluid=True, className="dashboard-container p-4")
-    ])
+                className="d-flex align-items-center"
+            ),
+            dbc.Col(
+                dbc.Button("Clear filters", id='home-filter-reset', color="light", size="sm",
+                           n_clicks=0, className="shadow-sm"),
+                width="auto"
+            )
+        ], className="mb-3 px-2")
+    ]
 
-def create_all_listings_layout(avg_prices_df, distribution_df):
-    """Create the layout for the all listings page with average price and distribution charts."""
-    if avg_prices_df.empty and distribution_df.empty:
-        logger.error("No data available for all listings charts")
-        return html.Div("Error: No listing data available.", className="text-center text-danger my-4")
+def create_all_listings_layout(charts=None):
+    """Create the layout for the all listings page.
 
+    The charts are computed by a background callback (see background.py), which
+    fills 'analytics-charts' and reports its progress meanwhile. Pre-computed
+    ``charts`` (the static snapshot, see snapshot.py) are rendered in place,
+    without the dedup toggle or progress bar.
+    """
+    progress = dbc.Progress(id='analytics-progress', value=0, striped=True, animated=True,
+                            className="mb-4", style={"height": "24px"})
     return html.Div([
         create_navigation_header('/all-listings'),
         dbc.Container([
@@ -166,57 +270,16 @@ def create_all_listings_layout(avg_prices_df, distribution_df):
                     html.H1("📈 All Listings Analytics", className="emoji-header mb-0 text-center"),
                     md=8, className="pt-3"
                 ),
-                dbc.Col(md=2)
+                dbc.Col(create_dedup_toggle('analytics-dedup') if charts is None else None, md=2, className="pt-3")
             ], className="align-items-center mb-4"),
 
             # Charts Row with enhanced styling
-            dbc.Row([
-                # Average Prices Chart
-                dbc.Col([
-                    dbc.Card([
-                        dbc.CardHeader(
-                            html.H4(
-                                html.Span([
-                                    html.I(className="fas fa-chart-line me-2"),
-                                    "💰 Average Prices Over Time"
-                                ]),
-                                className="text-primary mb-0"
-                            ),
-                            className="bg-light"
-                        ),
-                        dbc.CardBody([
-                            dcc.Graph(
-                                id='avg-price-line-chart',
-                                figure=create_avg_price_line_chart(avg_prices_df),
-                                className="shadow-sm"
-                            )
-                        ], className="p-4")
-                    ], className="chart-card shadow-sm mb-4", style={"borderRadius": "15px"})
-                ], md=6),
-
-                # Distribution Chart
-                dbc.Col([
-                    dbc.Card([
-                        dbc.CardHeader(
-                            html.H4(
-                                html.Span([
-                                    html.I(className="fas fa-chart-bar me-2"),
-                                    "🏛️ Monthly Distribution by Property Type"
-                                ]),
-                                className="text-primary mb-0"
-                            ),
-                            className="bg-light"
-                        ),
-                        dbc.CardBody([
-                            dcc.Graph(
-                                id='stacked-bar-chart',
-                                figure=create_stacked_bar_chart(distribution_df),
-                                className="shadow-sm"
-                            )
-                        ], className="p-4")
-                    ], className="chart-card shadow-sm mb-4", style={"borderRadius": "15px"})
-                ], md=6)
-            ], className="g-4 px-lg-5"),
+            html.Div(
+                progress if charts is None else None,
+                id='analytics-progress-container',
+                className="px-lg-5"
+            ),
+            html.Div(charts, id='analytics-charts'),
 
             # Additional Information Section
             dbc.Row([
@@ -264,78 +327,182 @@ def create_all_listings_layout(avg_prices_df, distribution_df):
         ], fluid=True, className="dashboard-container p-4")
     ])
 
-# --------------------------- New Listings Layout ---------------------------
-def create_new_listings_layout(new_listings_data):
-    """Create the layout for the new listings page."""
-    if not isinstance(new_listings_data, dict):
-        logger.error("Invalid data format for new listings layout")
-        return html.Div("Error: Data is not in the expected format.")
+def create_analytics_charts(avg_prices_df, distribution_df):
+    """Average price and monthly distribution charts of the all listings page."""
+    if avg_prices_df.empty and distribution_df.empty:
+        logger.error("No data available for all listings charts")
+        return html.Div("Error: No listing data available.", className="text-center text-danger my-4")
 
-    new_count = new_listings_data.get('count', 0)
-    new_annonces = new_listings_data.get('new_annonces', [])
+    return dbc.Row([
+        # Average Prices Chart
+        dbc.Col([
+            dbc.Card([
+                dbc.CardHeader(
+                    html.H4(
+                        html.Span([
+                            html.I(className="fas fa-chart-line me-2"),
+                            "💰 Average Prices Over Time"
+                        ]),
+                        className="text-primary mb-0"
+                    ),
+                    className="bg-light"
+                ),
+                dbc.CardBody([
+                    dcc.Graph(
+                        id='avg-price-line-chart',
+                        figure=create_avg_price_line_chart(avg_prices_df),
+                        className="shadow-sm"
+                    )
+                ], className="p-4")
+            ], className="chart-card shadow-sm mb-4", style={"borderRadius": "15px"})
+        ], md=6),
 
-    listings_cards = [
+        # Distribution Chart
         dbc.Col([
             dbc.Card([
                 dbc.CardHeader(
-                    html.H5(
+                    html.H4(
                         html.Span([
-                            "📍 ",
-                            f"{annonce.get('location', {}).get('governorate', 'N/A')}, "
-                            f"{annonce.get('location', {}).get('delegation', 'N/A')}"
+                            html.I(className="fas fa-chart-bar me-2"),
+                            "🏛️ Monthly Distribution by Property Type"
                         ]),
-                        className="mb-0 text-primary"
+                        className="text-primary mb-0"
                     ),
                     className="bg-light"
                 ),
                 dbc.CardBody([
+                    dcc.Graph(
+                        id='stacked-bar-chart',
+                        figure=create_stacked_bar_chart(distribution_df),
+                        className="shadow-sm"
+                    )
+                ], className="p-4")
+            ], className="chart-card shadow-sm mb-4", style={"borderRadius": "15px"})
+        ], md=6)
+    ], className="g-4 px-lg-5")
+
+# --------------------------- New Listings Layout ---------------------------
+def create_listing_card(annonce):
+    """Create the card for one entry of the new listings grid.
+
+    assets/live_listings.js builds the same markup for listings pushed live.
+    """
+    return dbc.Col([
+        dbc.Card([
+            dbc.CardHeader(
+                html.H5(
+                    html.Span([
+                        "📍 ",
+                        f"{annonce.get('location', {}).get('governorate', 'N/A')}, "
+                        f"{annonce.get('location', {}).get('delegation', 'N/A')}"
+                    ]),
+                    className="mb-0 text-primary"
+                ),
+                className="bg-light"
+            ),
+            dbc.CardBody([
+                html.Div([
+                    html.H5(
+                        annonce.get('title', 'N/A'),
+                        className="card-title text-dark mb-3",
+                        style={"minHeight": "48px"}
+                    ),
                     html.Div([
-                        html.H5(
-                            annonce.get('title', 'N/A'),
-                            className="card-title text-dark mb-3",
-                            style={"minHeight": "48px"}
+                        html.P(
+                            html.Span([
+                                "💰 ",
+                                f"{annonce.get('price', 'N/A')} TND"
+                            ]),
+                            className="card-text price-highlight mb-3 fs-5"
+                        ),
+                        html.P(
+                            html.Span([
+                                "📝 ",
+                                f"{annonce.get('description', 'N/A')[:150]}..."
+                            ]),
+                            className="card-text text-muted mb-3",
+                            style={"minHeight": "80px"}
+                        ),
+                        html.P(
+                            html.Span([
+                                "📅 ",
+                                f"Published: {annonce.get('metadata', {}).get('publishedOn', 'N/A')}"
+                            ]),
+                            className="card-text text-muted mb-3"
                         ),
                         html.Div([
-                            html.P(
-                                html.Span([
-                                    "💰 ",
-                                    f"{annonce.get('price', 'N/A')} TND"
-                                ]),
-                                className="card-text price-highlight mb-3 fs-5"
-                            ),
-                            html.P(
+                            dbc.Button(
                                 html.Span([
-                                    "📝 ",
-                                    f"{annonce.get('description', 'N/A')[:150]}..."
+                                    "View Details ",
+                                    html.I(className="fas fa-arrow-right ms-1")
                                 ]),
-                                className="card-text text-muted mb-3",
-                                style={"minHeight": "80px"}
-                            ),
-                            html.P(
-                                html.Span([
-                                    "📅 ",
-                                    f"Published: {annonce.get('metadata', {}).get('publishedOn', 'N/A')}"
-                                ]),
-                                className="card-text text-muted mb-3"
-                            ),
-                            html.Div([
-                                dbc.Button(
-                                    html.Span([
-                                        "View Details ",
-                                        html.I(className="fas fa-arrow-right ms-1")
-                                    ]),
-                                    href=f"/listings/{annonce.get('id', 'N/A')}",
-                                    color="primary",
-                                    className="w-100 shadow-sm"
-                                )
-                            ], className="mt-auto")
-                        ])
-                    ], className="d-flex flex-column h-100")
-                ], className="d-flex flex-column", style={"height": "350px"})
-            ], className="listing-card shadow-sm h-100", style={"borderRadius": "15px"})
-        ], md=6, className="mb-4") for annonce in new_annonces
+                                href=f"/listings/{annonce.get('id', 'N/A')}",
+                                color="primary",
+                                className="w-100 shadow-sm"
+                            )
+                        ], className="mt-auto")
+                    ])
+                ], className="d-flex flex-column h-100")
+            ], className="d-flex flex-column", style={"height": "350px"})
+        ], className="listing-card shadow-sm h-100", style={"borderRadius": "15px"})
+    ], md=6, className="mb-4")
+
+# Built cards are immutable, so they are kept per listing id (least recently used evicted)
+_card_cache = SingleFlightCache("listing_cards", ttl=float("inf"), stale_ttl=float("inf"),
+                                max_entries=Config.LISTING_CARD_CACHE_SIZE)
+
+def create_listing_cards(annonces):
+    """Cards for ``annonces``, reusing the ones already built for the same listing."""
+    return [
+        _card_cache.get(annonce['id'], lambda annonce=annonce: create_listing_card(annonce))
+        if annonce.get('id') is not None else create_listing_card(annonce)
+        for annonce in annonces
     ]
 
+def create_new_listings_layout(new_listings_data, since=0, cursor=None, live=True):
+    """Create the layout for the new listings page.
+
+    ``new_listings_data`` holds the first batch of cards and the total count.
+    ``cursor`` is where the next batch starts (None when there is none); older
+    batches are appended to "new-listings-older" as the user scrolls
+    (assets/infinite_scroll.js). ``since`` is the live feed position the page
+    was rendered at; the browser subscribes from there and prepends newer cards
+    as they arrive. With ``live`` off (the static snapshot, see snapshot.py) the
+    page holds just the given cards.
+    """
+    if not isinstance(new_listings_data, dict):
+        logger.error("Invalid data format for new listings layout")
+        return html.Div("Error: Data is not in the expected format.")
+
+    new_count = new_listings_data.get('count', 0)
+    new_annonces = new_listings_data.get('new_annonces', [])
+
+    listings_cards = create_listing_cards(new_annonces)
+
+    if live:
+        listings = [
+            html.Div(
+                dbc.Row(listings_cards, id='new-listings-grid', className="g-4 px-4"),
+                id='new-listings-live',
+                **{"data-since": since}
+            ),
+            dbc.Row([], id='new-listings-older', className="g-4 px-4 mt-0"),
+            dcc.Store(id='new-listings-cursor', data=cursor),
+            html.Div(
+                dbc.Button(
+                    "Load more",
+                    id='new-listings-more',
+                    n_clicks=0,
+                    color="light",
+                    className="shadow-sm",
+                    style={} if cursor is not None else {"display": "none"}
+                ),
+                className="text-center my-4"
+            )
+        ]
+    else:
+        listings = [dbc.Row(listings_cards, id='new-listings-grid', className="g-4 px-4")]
+
     return html.Div([
         create_navigation_header('/new-listings'),
         dbc.Container([
@@ -355,8 +522,11 @@ def create_new_listings_layout(new_listings_data):
                 ),
                 dbc.Col(md=2)  # Empty column for spacing
             ], className="align-items-center mb-4"),
-            html.H4(f"📌 Total New Listings: {new_count}", className="text-center my-2"),
-            dbc.Row(listings_cards, className="g-4 px-4")
+            html.H4([
+                "📌 Total New Listings: ",
+                html.Span(new_count, id='new-listings-count')
+            ], className="text-center my-2"),
+            *listings
         ], fluid=True, className="dashboard-container p-4")
     ])
 
@@ -366,8 +536,7 @@ def create_listing_details_layout(listing_id):
     # Fetch listing details
     listing = fetch_listing_details(listing_id)
     
-    # Debug logging
-    print(f"Fetched listing data: {listing}")  # Add this line for debugging
+    logger.debug("Fetched listing %s: %s", listing_id, listing)
     
     if not listing:
         return html.Div([
@@ -550,6 +719,7 @@ def create_price_filter_layout():
                                     dbc.Input(
                                         id='min-price-input',
                                         type='number',
+                                        debounce=True,
                                         value=100,
                                         min=0,
                                         className="form-control shadow-sm"
@@ -566,6 +736,7 @@ def create_price_filter_layout():
                                     dbc.Input(
                                         id='max-price-input',
                                         type='number',
+                                        debounce=True,
                                         value=1_000_000,
                                         min=0,
                                         className="form-control shadow-sm"
@@ -621,20 +792,28 @@ def create_price_filter_layout():
     ])
 
 
-def create_date_filter_layout():
-    """Create layout for date-based filtering with location dropdown."""
-    governorates_data = fetch_governorates_delegations()
-    
-    # Create dropdown options
+def create_location_options(include_governorates=False):
+    """Dropdown options for every "governorate|delegation" pair.
+
+    With ``include_governorates`` each governorate also gets an entry of its
+    own, with an empty delegation ("governorate|").
+    """
     location_options = []
-    for gov in governorates_data:
+    for gov in fetch_governorates_delegations():
         governorate = gov.get('governorate')
         delegations = gov.get('delegations', [])
+        if include_governorates:
+            location_options.append({'label': governorate, 'value': f"{governorate}|"})
         location_options.extend([
             {'label': f"{governorate} - {delegation}", 
              'value': f"{governorate}|{delegation}"} 
             for delegation in delegations
         ])
+    return location_options
+
+def create_date_filter_layout():
+    """Create layout for date-based filtering with location dropdown."""
+    location_options = create_location_options()
 
     return html.Div([
         create_navigation_header('/date-filter'),
@@ -741,4 +920,189 @@ def create_date_filter_layout():
                 id="date-filter-results",
                 className="mt-4 results-container"
             )
-        ], fluid=True, className="dashboard-container p-4") ])
\ No newline at end of file
+        ], fluid=True, className="dashboard-container p-4") ])
+
+# --------------------------- Search Layout ---------------------------
+def create_search_layout(indexed_listings=0, index_bytes=0):
+    """Create the layout for keyword search over titles and descriptions."""
+    return html.Div([
+        create_navigation_header('/search'),
+        dbc.Container([
+            dbc.Row([
+                dbc.Col(
+                    dbc.Button(
+                        "← Dashboard",
+                        href="/",
+                        color="light",
+                        className="back-btn py-2 shadow-sm"
+                    ), md=2, className="ps-4 pt-3"
+                ),
+                dbc.Col(
+                    html.H1("🔎 Search Listings", className="emoji-header mb-0 text-center"),
+                    md=8, className="pt-3"
+                ),
+                dbc.Col(md=2)
+            ], className="align-items-center mb-4"),
+
+            dbc.Card([
+                dbc.CardBody([
+                    dbc.Input(
+                        id='search-query',
+                        type='search',
+                        placeholder="Keywords in French, Arabic or arabizi (e.g. villa piscine, شقة, 7ammamet)...",
+                        debounce=True,
+                        className="form-control-lg shadow-sm mb-4"
+                    ),
+                    dbc.Row([
+                        dbc.Col([
+                            dbc.Label(
+                                html.Span([html.I(className="fas fa-coins me-2"), "Minimum Price (TND)"]),
+                                className="mb-2 text-muted"
+                            ),
+                            dbc.Input(id='search-min-price', type='number', min=0, debounce=True,
+                                      className="form-control shadow-sm")
+                        ], md=3),
+                        dbc.Col([
+                            dbc.Label(
+                                html.Span([html.I(className="fas fa-money-bill-wave me-2"), "Maximum Price (TND)"]),
+                                className="mb-2 text-muted"
+                            ),
+                            dbc.Input(id='search-max-price', type='number', min=0, debounce=True,
+                                      className="form-control shadow-sm")
+                        ], md=3),
+                        dbc.Col([
+                            dbc.Label(
+                                html.Span([html.I(className="fas fa-calendar-alt me-2"), "Published"]),
+                                className="mb-2 text-muted"
+                            ),
+                            dcc.DatePickerRange(
+                                id='search-date-range',
+                                start_date_placeholder_text="Start Date",
+                                end_date_placeholder_text="End Date",
+                                clearable=True,
+                                className="shadow-sm date-picker-custom"
+                            )
+                        ], md=6)
+                    ], className="mb-4"),
+                    dbc.Row([
+                        dbc.Col([
+                            dbc.Label(
+                                html.Span([html.I(className="fas fa-map-marker-alt me-2"), "Location"]),
+                                className="mb-2 text-muted"
+                            ),
+                            dcc.Dropdown(
+                                id='search-location',
+                                options=create_location_options(include_governorates=True),
+                                placeholder="Anywhere",
+                                className="shadow-sm"
+                            )
+                        ], md=6),
+                        dbc.Col([
+                            dbc.Label(
+                                html.Span([html.I(className="fas fa-home me-2"), "Property Type"]),
+                                className="mb-2 text-muted"
+                            ),
+                            dbc.RadioItems(
+                                id='search-product-type',
+                                options=[
+                                    {"label": "🏠 Sale", "value": 1},
+                                    {"label": "🏡 Rent", "value": 0},
+                                    {"label": "🤝 Both", "value": None}
+                                ],
+                                value=None,
+                                inline=True,
+                                className="filter-radio custom-radio-group"
+                            )
+                        ], md=6)
+                    ])
+                ], className="p-4")
+            ], className="filter-card shadow-sm mb-2", style={"borderRadius": "15px"}),
+            html.P(
+                f"{indexed_listings:,} listings indexed ({index_bytes / 1e6:.1f} MB)",
+                id='search-index-stats',
+                className="text-muted text-end small mb-4"
+            ),
+
+            dcc.Loading(
+                html.Div(id='search-results', className="mt-2 results-container"),
+                type="circle"
+            )
+        ], fluid=True, className="dashboard-container p-4")
+    ])
+
+# --------------------------- Map Layout ---------------------------
+def create_map_layout(regional_data, levels):
+    """Create the choropleth page.
+
+    ``regional_data`` maps each level to data_processor.regional_statistics;
+    ``levels`` are the levels whose boundary files are available. The figure
+    itself is drawn in the browser (assets/choropleth.js).
+    """
+    header = dbc.Row([
+        dbc.Col(
+            dbc.Button(
+                "← Dashboard",
+                href="/",
+                color="light",
+                className="back-btn py-2 shadow-sm"
+            ), md=2, className="ps-4 pt-3"
+        ),
+        dbc.Col(
+            html.H1("🗺️ Listings Map", className="emoji-header mb-0 text-center"),
+            md=8, className="pt-3"
+        ),
+        dbc.Col(md=2)
+    ], className="align-items-center mb-4")
+
+    if not levels:
+        return html.Div([
+            create_navigation_header('/map'),
+            dbc.Container([
+                header,
+                dbc.Alert(
+                    f"No boundary files found. Add governorates.geojson and delegations.geojson to {Config.GEO_DIR}.",
+                    color="warning",
+                    className="text-center"
+                )
+            ], fluid=True, className="dashboard-container p-4")
+        ])
+
+    return html.Div([
+        create_navigation_header('/map'),
+        dbc.Container([
+            header,
+            dcc.Store(id='map-aggregates', data=regional_data),
+            dcc.Store(id='map-detail', data='low'),
+            dbc.Card([
+                dbc.CardBody([
+                    dbc.Row([
+                        dbc.Col(
+                            dbc.RadioItems(
+                                id='map-level',
+                                options=[{"label": level.capitalize() + "s", "value": level} for level in levels],
+                                value=levels[0],
+                                inline=True,
+                                className="custom-radio-group"
+                            ),
+                            md=5
+                        ),
+                        dbc.Col(
+                            dbc.RadioItems(
+                                id='map-metric',
+                                options=[
+                                    {"label": "📊 Listings", "value": "count"},
+                                    {"label": "🏠 Median sale price", "value": "median_sale"},
+                                    {"label": "🏡 Median rent price", "value": "median_rent"}
+                                ],
+                                value="count",
+                                inline=True,
+                                className="custom-radio-group"
+                            ),
+                            md=7, className="text-end"
+                        )
+                    ], className="mb-3"),
+                    dcc.Graph(id='choropleth-map', config={"scrollZoom": True})
+                ], className="p-4")
+            ], className="chart-card shadow-sm", style={"borderRadius": "15px"})
+        ], fluid=True, className="dashboard-container p-4")
+    ])
@@ -0,0 +1,259 @@
+"""
+Live updates for the new-listings page.
+
+One watcher thread per process (a MongoDB change stream with
+``DATA_SOURCE=mongo``, otherwise a poller on ``/annonces/new``) publishes
+listings it has not seen before into a bounded event log. Browsers follow the
+log over Server-Sent Events at ``/events/new-listings`` and insert the cards
+themselves (assets/live_listings.js), so each new listing is fetched once and
+serialized once no matter how many clients are connected.
+
+The feed also holds the current new listings ordered by (publishedOn, id).
+The page renders only the newest batch and loads older ones with ``page()``
+as the user scrolls, using the last listing's key as the cursor. Each poll
+returns the backend's whole window, so listings it no longer returns are
+dropped; with the change stream, listings older than ``NEW_LISTINGS_DAYS``
+are.
+
+Every open SSE connection holds a server thread, so each process serves at
+most ``LIVE_MAX_STREAMS`` of them and answers further ones with 503. Those
+browsers poll ``/events/new-listings?poll=1`` every ``LIVE_POLL_SECONDS``
+instead, which holds no thread between polls. Raise the cap with an async
+worker class (e.g. ``WORKER_CLASS=gevent``).
+
+The watcher runs in every process that serves the page, so with N gunicorn
+workers the API is polled N times per ``LIVE_POLL_SECONDS``.
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+from .config import Config
+from .metrics import increment
+from .utils import logger
+
+EVENT_LOG_SIZE = 500
+KEEPALIVE_SECONDS = 15
+
+
+def card_payload(annonce):
+    """The fields a new-listing card shows, nothing more."""
+    location = annonce.get('location', {})
+    return {
+        "id": annonce.get('id', 'N/A'),
+        "title": annonce.get('title', 'N/A'),
+        "price": annonce.get('price', 'N/A'),
+        "description": (annonce.get('description') or 'N/A')[:150],
+        "governorate": location.get('governorate', 'N/A'),
+        "delegation": location.get('delegation', 'N/A'),
+        "publishedOn": annonce.get('metadata', {}).get('publishedOn', 'N/A'),
+    }
+
+
+def listing_key(annonce):
+    """Order and cursor key of a listing: (publishedOn, id), compared as strings."""
+    published = (annonce.get('metadata') or {}).get('publishedOn')
+    if isinstance(published, datetime):
+        published = published.isoformat()
+    return (str(published or ''), str(annonce.get('id') or ''))
+
+
+def _valid_cursor(cursor):
+    return (isinstance(cursor, (list, tuple)) and len(cursor) == 2
+            and all(isinstance(item, str) for item in cursor))
+
+
+class NewListingsFeed:
+    """Event log of new listings, fed by a single watcher and read by SSE clients."""
+
+    def __init__(self, maxlen=EVENT_LOG_SIZE):
+        self._cond = threading.Condition()
+        self._events = deque(maxlen=maxlen)
+        self._seen = set()
+        # Oldest first, with their listing_key() in _keys, so pages are bisected
+        self._keys = []
+        self._listings = []
+        self._watcher = None
+        self._watcher_pid = None
+        self._listeners = []
+        self.seq = 0
+
+    def add_listener(self, listener):
+        """Call ``listener(annonces)`` with the listings each publish() adds."""
+        self._listeners.append(listener)
+
+    def seed(self, new_listings_data):
+        """Start from the listings already rendered at startup."""
+        annonces = new_listings_data.get('new_annonces', []) if isinstance(new_listings_data, dict) else []
+        ordered = sorted(annonces, key=listing_key)
+        with self._cond:
+            self._keys = [listing_key(a) for a in ordered]
+            self._listings = ordered
+            self._seen.update(a.get('id') for a in annonces)
+
+    def publish(self, annonces, window=False):
+        """Append unseen listings (given newest first) to the log; returns the new ones.
+
+        With ``window``, ``annonces`` is the backend's whole new-listings window
+        and the listings missing from it are dropped.
+        """
+        fresh = []
+        with self._cond:
+            if window:
+                current = {a.get('id') for a in annonces}
+                self._retain([a.get('id') in current for a in self._listings])
+            for annonce in reversed(annonces):
+                listing_id = annonce.get('id')
+                if listing_id in self._seen:
+                    continue
+                self._seen.add(listing_id)
+                self.seq += 1
+                self._events.append((self.seq, json.dumps(card_payload(annonce), ensure_ascii=False, default=str)))
+                fresh.append(annonce)
+            for annonce in fresh:
+                key = listing_key(annonce)
+                position = bisect.bisect(self._keys, key)
+                self._keys.insert(position, key)
+                self._listings.insert(position, annonce)
+            if fresh:
+                self._cond.notify_all()
+        if fresh:
+            for listener in self._listeners:
+                try:
+                    listener(fresh)
+                except Exception as e:
+                    logger.error("New listings listener failed: %s", e)
+        return fresh
+
+    def expire(self, before):
+        """Drop the listings published before ``before`` (a naive UTC datetime)."""
+        cutoff = (before.strftime("%Y-%m-%dT%H:%M:%S"),)
+        with self._cond:
+            end = bisect.bisect_left(self._keys, cutoff)
+            self._retain([row >= end for row in range(len(self._listings))])
+
+    def _retain(self, keep):
+        # Called with the condition held; ids dropped here may be published again
+        if all(keep):
+            return
+        self._seen.difference_update(a.get('id') for a, kept in zip(self._listings, keep) if not kept)
+        self._keys = [key for key, kept in zip(self._keys, keep) if kept]
+        self._listings = [a for a, kept in zip(self._listings, keep) if kept]
+
+    def snapshot(self):
+        """Return the current data (shaped like /annonces/new) and its feed position."""
+        with self._cond:
+            return {"count": len(self._listings), "new_annonces": self._listings[::-1]}, self.seq
+
+    def page(self, cursor=None, limit=24):
+        """Return up to ``limit`` listings older than ``cursor``, newest first.
+
+        ``cursor`` is the ``listing_key()`` (as a list) of the last listing of the
+        previous page, or None (or a malformed cursor) for the first page.
+        Returns (data shaped like /annonces/new with the full count, cursor of
+        the next page or None, feed position). Listings published meanwhile do
+        not shift later pages.
+        """
+        if not _valid_cursor(cursor):
+            cursor = None
+        with self._cond:
+            end = len(self._keys) if cursor is None else bisect.bisect_left(self._keys, tuple(cursor))
+            start = max(0, end - limit)
+            data = {"count": len(self._listings), "new_annonces": self._listings[start:end][::-1]}
+            return data, (list(self._keys[start]) if start > 0 else None), self.seq
+
+    def events_since(self, seq, timeout=KEEPALIVE_SECONDS):
+        """Block until there are events after ``seq`` (or timeout) and return them."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.seq > seq, timeout=timeout)
+            return [(s, payload) for s, payload in self._events if s > seq]
+
+    def ensure_watching(self):
+        """Start the watcher in this process if it is not running (e.g. after fork)."""
+        with self._cond:
+            if self._watcher is not None and self._watcher_pid == os.getpid() and self._watcher.is_alive():
+                return
+            target = _watch_change_stream if Config.DATA_SOURCE == "mongo" else _poll_api
+            self._watcher = threading.Thread(target=target, args=(self,), name="new-listings-watcher", daemon=True)
+            self._watcher_pid = os.getpid()
+            self._watcher.start()
+
+
+def _poll_api(feed):
+    from .sources import load_new_listings
+    url = f"{Config.FASTAPI_URL}/annonces/new"
+    while True:
+        time.sleep(Config.LIVE_POLL_SECONDS)
+        data = load_new_listings(url)
+        # An empty dict is a failed request, not an empty window
+        if not isinstance(data, dict) or 'new_annonces' not in data:
+            continue
+        fresh = feed.publish(data['new_annonces'], window=True)
+        if fresh:
+            logger.info("Published %d new listings", len(fresh))
+
+
+def _watch_change_stream(feed):
+    from .mongo_source import LISTING_PROJECTION, get_collection
+    projection = {f"fullDocument.{k}": v for k, v in LISTING_PROJECTION.items() if k != "_id"}
+    pipeline = [{"$match": {"operationType": "insert"}}, {"$project": projection}]
+    while True:
+        try:
+            with get_collection().watch(pipeline) as stream:
+                for change in stream:
+                    feed.publish([change["fullDocument"]])
+                    now = datetime.now(timezone.utc).replace(tzinfo=None)
+                    feed.expire(now - timedelta(days=Config.NEW_LISTINGS_DAYS))
+        except Exception as e:
+            # Change streams need a replica set; fall back to polling.
+            logger.error("Change stream unavailable, polling instead: %s", e)
+            _poll_api(feed)
+
+
+def init_live(server, feed):
+    """Serve ``feed`` as Server-Sent Events on ``/events/new-listings``."""
+    from flask import Response, request
+
+    streams = threading.BoundedSemaphore(Config.LIVE_MAX_STREAMS)
+
+    @server.route("/events/new-listings")
+    def new_listings_events():
+        feed.ensure_watching()
+        since = request.headers.get("Last-Event-ID") or request.args.get("since") or feed.seq
+        try:
+            since = int(since)
+        except ValueError:
+            since = feed.seq
+
+        if request.args.get("poll"):
+            events = feed.events_since(since, timeout=0)
+            seq = events[-1][0] if events else max(since, 0)
+            body = '{"seq": %d, "retry": %d, "events": [%s]}' % (
+                seq, Config.LIVE_POLL_SECONDS * 1000, ",".join(payload for _, payload in events))
+            return Response(body, mimetype="application/json", headers={"Cache-Control": "no-cache"})
+
+        if not streams.acquire(blocking=False):
+            increment("dashboard_live_streams_rejected_total", {})
+            return Response("Too many live connections, poll instead\n", status=503,
+                            headers={"Retry-After": str(Config.LIVE_POLL_SECONDS)})
+
+        def stream(seq):
+            yield f"retry: {Config.LIVE_POLL_SECONDS * 1000}\n\n"
+            while True:
+                events = feed.events_since(seq)
+                if not events:
+                    yield ": keep-alive\n\n"
+                    continue
+                for seq, payload in events:
+                    yield f"id: {seq}\nevent: listing\ndata: {payload}\n\n"
+
+        response = Response(stream(since), mimetype="text/event-stream",
+                            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+        # Released when the server closes the response, even if it never started streaming
+        response.call_on_close(streams.release)
+        return response
@@ -1,15 +1,21 @@
-from dash import Dash, dcc, html, Input, Output, callback, State
+from dash import Dash, dcc, html, Input, Output, callback, clientside_callback, ClientsideFunction, State, Patch, no_update
 import dash_bootstrap_components as dbc
 from .config import Config
-from .data_processor import (
-    load_statistics, 
+from .sources import (
     load_new_listings, 
     fetch_filtered_listings, 
-    clean_data, 
     fetch_listings_by_date,
-    fetch_all_listings,
-    process_average_prices_over_time,
-    process_monthly_distribution_by_type
+    ingest_listings,
+    load_analytics
+)
+# Store aggregates (of an arbitrary subset, e.g. deduplicated) are computed
+# in-process whatever the source.
+from .data_processor import (
+    clean_data,
+    home_cube,
+    store_statistics,
+    regional_statistics,
+    load_analytics as store_analytics
 )
 from .layouts import (
     create_layout, 
@@ -18,10 +24,35 @@ from .layouts import (
     create_price_filter_layout,
     create_listing_details_layout,
     create_date_filter_layout,
-    create_all_listings_layout
+    create_all_listings_layout,
+    create_staleness_banner,
+    create_search_layout,
+    create_dashboard_body,
+    create_analytics_charts,
+    create_map_layout,
+    create_export_links,
+    create_listing_cards
 )
+import importlib
+import threading
+import time
+import numpy as np
 from datetime import datetime
 from .utils import logger
+from .metrics import init_metrics, set_gauge, timed, timer
+from .profiling import init_profiling, profiled
+from .live import NewListingsFeed, init_live
+from .circuit import degraded_endpoints
+from .store import ListingStore
+from .search import SearchIndex
+from .dedup import Deduplicator
+from .outliers import price_outliers
+from .accumulator import StatisticsAccumulator
+from .background import create_background_manager, background_callback
+from .geo import LEVELS, Boundaries, init_geo
+from .export import init_export
+from .admission import init_admission
+from .serialization import configure_json_engine
 
 # Initialize the app
 app = Dash(__name__, external_stylesheets=[
@@ -30,21 +61,127 @@ app = Dash(__name__, external_stylesheets=[
     'https://use.fontawesome.com/releases/v5.15.4/css/all.css'
 ])
 
-# Load and process data
-url_statistics = f"{Config.FASTAPI_URL}/statistics"
+configure_json_engine()
+
+# Flask instance for WSGI servers (see gunicorn.conf.py)
+server = app.server
+if Config.TRUSTED_PROXIES:
+    # Client addresses from the X-Forwarded-* headers set by the trusted proxies only
+    from werkzeug.middleware.proxy_fix import ProxyFix
+    server.wsgi_app = ProxyFix(server.wsgi_app, x_for=Config.TRUSTED_PROXIES, x_proto=Config.TRUSTED_PROXIES)
+init_metrics(server)
+init_admission(server)
+init_export(server)
+init_profiling(server)
+
+# Data endpoints
 url_new_listings = f"{Config.FASTAPI_URL}/annonces/new"
 url_all_listings = f"{Config.FASTAPI_URL}/annonces"
 
-raw_statistics_data = load_statistics(url_statistics)
-statistics_data = clean_data(raw_statistics_data)
+# New listings are pushed to open /new-listings pages as they appear
+new_listings_feed = NewListingsFeed()
+init_live(server, new_listings_feed)
+
+# The corpus is streamed into the columnar store, indexed for search and hashed
+# for near-duplicate detection on the way. Listings published to the live feed
+# join the store too.
+listing_store = ListingStore()
+search_index = SearchIndex(listing_store)
+listing_store.add_listener(search_index.add)
+deduplicator = Deduplicator(listing_store)
+listing_store.add_listener(deduplicator.add)
+# Home-page statistics are counted as listings arrive instead of asking /statistics
+statistics_accumulator = StatisticsAccumulator(listing_store)
+listing_store.add_listener(statistics_accumulator.add)
+new_listings_feed.add_listener(listing_store.extend)
+
+# Choropleth boundaries, simplified once per detail level
+boundaries = Boundaries()
+init_geo(server, boundaries)
+
+# Filled by init_data(); importing this module does no I/O.
+new_listings_data = home_cube_data = None
+dedup_statistics_data = dedup_home_cube_data = None
+price_outlier_mask = excluded_outliers = None
+map_levels, regional_data = [], {}
+_data_lock = threading.Lock()
+_data_loaded = False
+
+def init_data():
+    """Load the statistics, new listings and corpus, and compute the aggregates.
+
+    Runs once per process: wsgi.py calls it so gunicorn's preloading master
+    loads everything before forking, and otherwise the first request does.
+    """
+    global new_listings_data, map_levels, _data_loaded
+    with _data_lock:
+        if _data_loaded:
+            return
+        started = time.perf_counter()
+
+        # Import pandas and plotly here, only to have them loaded before any
+        # request thread (or forked worker) needs them: concurrent first
+        # imports on request threads see a partially initialized module.
+        for module in ("pandas", "plotly.express", "plotly.graph_objects"):
+            importlib.import_module(module)
+
+        new_listings_data = clean_data(load_new_listings(url_new_listings))
+        new_listings_feed.seed(new_listings_data)
+
+        ingest_listings(listing_store)
+        logger.info("Search index: %s listings, %.1f MB", len(search_index), search_index.memory_bytes() / 1e6)
+
+        boundaries.warm()
+        map_levels = [level for level in LEVELS if boundaries.available(level)]
+        _compute_aggregates()
+
+        _data_loaded = True
+        elapsed = time.perf_counter() - started
+        set_gauge("dashboard_startup_seconds", {"phase": "data"}, elapsed)
+        logger.info("Loaded data in %.2fs", elapsed)
+
+def refresh_aggregates():
+    """Recompute the aggregates of init_data() from the store as it is now.
+
+    The live feed keeps adding listings to the store, but the aggregates are
+    computed once; snapshot.py calls this before each regeneration.
+    """
+    global new_listings_data
+    init_data()
+    with _data_lock:
+        new_listings_data, _ = new_listings_feed.snapshot()
+        _compute_aggregates()
+
+def _compute_aggregates():
+    """Outlier flags, home cubes, deduplicated statistics and map data (with _data_lock held)."""
+    global home_cube_data, dedup_statistics_data, dedup_home_cube_data, regional_data
+    global price_outlier_mask, excluded_outliers
+    # Prices implausible for their segment are flagged, and left out of every
+    # average and median unless EXCLUDE_PRICE_OUTLIERS is off.
+    price_outlier_mask = price_outliers(listing_store)
+    if Config.EXCLUDE_PRICE_OUTLIERS:
+        previous = excluded_outliers if excluded_outliers is not None else np.zeros(0, dtype=bool)
+        previous = np.pad(previous, (0, len(price_outlier_mask) - len(previous)))
+        statistics_accumulator.exclude_prices(np.flatnonzero(price_outlier_mask & ~previous))
+        statistics_accumulator.exclude_prices(np.flatnonzero(previous & ~price_outlier_mask), restore=True)
+        excluded_outliers = price_outlier_mask
+    home_cube_data = home_cube(listing_store, outliers=excluded_outliers)
 
-raw_new_listings_data = load_new_listings(url_new_listings)
-new_listings_data = clean_data(raw_new_listings_data)
+    # The same aggregates with one listing per cluster of near-duplicates
+    deduplicator.cluster()
+    dedup_keep = deduplicator.keep_mask()
+    dedup_statistics_data = store_statistics(listing_store, dedup_keep, excluded_outliers)
+    dedup_home_cube_data = home_cube(listing_store, dedup_keep, excluded_outliers)
 
-# After processing the data
-all_listings_data = fetch_all_listings()
-avg_prices_df = process_average_prices_over_time(all_listings_data)
-distribution_df = process_monthly_distribution_by_type(all_listings_data)
+    regional_data = {level: regional_statistics(listing_store, level, outliers=excluded_outliers) for level in map_levels}
+
+@server.before_request
+def ensure_data_loaded():
+    if not _data_loaded:
+        init_data()
+
+# Analytics for /all-listings run as background jobs, cached until the corpus grows
+background_manager = create_background_manager(cache_by=[lambda: len(listing_store)])
 
 # Define layout
 app.layout = dcc.Location(id='url', refresh=False), html.Div(id='page-content')
@@ -52,11 +189,32 @@ app.layout = dcc.Location(id='url', refresh=False), html.Div(id='page-content')
 # Callback to display the correct page
 @callback(Output('page-content', 'children'),
           [Input('url', 'pathname')])
+@timed("callback")
+@profiled
 def display_page(pathname):
+    with timer("page", route_label(pathname)):
+        return with_staleness_banner(render_page(pathname))
+
+def with_staleness_banner(content):
+    """Prefix ``content`` with a warning while any backend circuit is open."""
+    banner = create_staleness_banner(degraded_endpoints())
+    return html.Div([banner, content]) if banner else content
+
+def route_label(pathname):
+    """Bounded metric label for a pathname (listing ids and 404s are collapsed)."""
+    if pathname in ('/', '/new-listings', '/price-filter', '/date-filter', '/all-listings', '/map', '/search'):
+        return pathname
+    if pathname and pathname.startswith('/listings/'):
+        return '/listings/:id'
+    return '404'
+
+def render_page(pathname):
     if pathname == '/':
-        return create_layout(statistics_data, new_listings_data)
+        return create_layout(statistics_accumulator.statistics(), new_listings_data, cube=home_cube_data)
     elif pathname == '/new-listings':
-        return create_new_listings_layout(new_listings_data)
+        new_listings_feed.ensure_watching()
+        data, cursor, since = new_listings_feed.page(limit=Config.NEW_LISTINGS_BATCH)
+        return create_new_listings_layout(data, since=since, cursor=cursor)
     elif pathname == '/price-filter':
         return create_price_filter_layout()
     elif pathname.startswith('/listings/'):
@@ -65,10 +223,149 @@ def display_page(pathname):
     elif pathname == '/date-filter':
         return create_date_filter_layout()
     elif pathname == '/all-listings':
-        return create_all_listings_layout(avg_prices_df, distribution_df)
+        return create_all_listings_layout()
+    elif pathname == '/map':
+        return create_map_layout(regional_data, map_levels)
+    elif pathname == '/search':
+        return create_search_layout(len(search_index), search_index.memory_bytes())
     else:
         return html.Div("404: Page Not Found")
 
+# Cross-filtering on the dashboard runs in the browser (assets/crossfilter.js)
+clientside_callback(
+    ClientsideFunction(namespace='crossfilter', function_name='update_filter'),
+    Output('home-filter', 'data'),
+    [Input('governorate-pie', 'clickData'),
+     Input('type-chart', 'clickData'),
+     Input('home-filter-reset', 'n_clicks')],
+    State('home-filter', 'data'),
+    prevent_initial_call=True
+)
+
+clientside_callback(
+    ClientsideFunction(namespace='crossfilter', function_name='render'),
+    [Output('governorate-pie', 'figure'),
+     Output('publisher-chart', 'figure'),
+     Output('type-chart', 'figure'),
+     Output('delegation-chart', 'figure'),
+     Output('metric-total', 'children'),
+     Output('metric-avg-sale', 'children'),
+     Output('metric-avg-rent', 'children'),
+     Output('metric-shop', 'children'),
+     Output('home-filter-status', 'children')],
+    Input('home-filter', 'data'),
+    State('home-cube', 'data'),
+    prevent_initial_call=True
+)
+
+# The map is drawn in the browser (assets/choropleth.js); geometry is fetched by URL once
+clientside_callback(
+    ClientsideFunction(namespace='choropleth', function_name='detail'),
+    Output('map-detail', 'data'),
+    Input('choropleth-map', 'relayoutData'),
+    State('map-detail', 'data'),
+    prevent_initial_call=True
+)
+
+clientside_callback(
+    ClientsideFunction(namespace='choropleth', function_name='render'),
+    Output('choropleth-map', 'figure'),
+    [Input('map-level', 'value'),
+     Input('map-metric', 'value'),
+     Input('map-detail', 'data')],
+    State('map-aggregates', 'data')
+)
+
+@callback(
+    [Output('new-listings-older', 'children'),
+     Output('new-listings-cursor', 'data'),
+     Output('new-listings-more', 'style')],
+    Input('new-listings-more', 'n_clicks'),
+    State('new-listings-cursor', 'data'),
+    prevent_initial_call=True
+)
+@timed("callback")
+@profiled
+def load_older_new_listings(n_clicks, cursor):
+    """Append the next batch of cards (assets/infinite_scroll.js clicks "Load more" on scroll)."""
+    if cursor is None:
+        return no_update, None, {"display": "none"}
+    data, cursor, _ = new_listings_feed.page(cursor, limit=Config.NEW_LISTINGS_BATCH)
+    cards = Patch()
+    cards.extend(create_listing_cards(data['new_annonces']))
+    return cards, cursor, {} if cursor is not None else {"display": "none"}
+
+@callback(Output('dashboard-body', 'children'),
+          [Input('dashboard-dedup', 'value')],
+          prevent_initial_call=True)
+@timed("callback")
+@profiled
+def toggle_dashboard_dedup(deduplicated):
+    if deduplicated:
+        return create_dashboard_body(dedup_statistics_data, cube=dedup_home_cube_data)
+    return create_dashboard_body(statistics_accumulator.statistics(), cube=home_cube_data)
+
+@background_callback(
+    background_manager,
+    Output('analytics-charts', 'children'),
+    [Input('analytics-dedup', 'value')],
+    progress=[Output('analytics-progress', 'value'),
+              Output('analytics-progress', 'label')],
+    running=[(Output('analytics-dedup', 'disabled'), True, False),
+             (Output('analytics-progress-container', 'style'), {"display": "block"}, {"display": "none"})],
+    cancel=[Input('url', 'pathname')]
+)
+def compute_analytics(set_progress, deduplicated):
+    set_progress((10, "Aggregating listings..."))
+    frames = analytics_frames(deduplicated)
+    set_progress((70, "Drawing charts..."))
+    return create_analytics_charts(*frames)
+
+def analytics_frames(deduplicated=False):
+    """The (average prices, monthly distribution) frames behind the /all-listings charts.
+
+    Subsets of the store (one listing per cluster, or without the flagged price
+    outliers) are aggregated in-process; only the full corpus goes to the data
+    source's load_analytics, which runs in MongoDB with DATA_SOURCE=mongo.
+    """
+    if deduplicated:
+        return store_analytics(listing_store, deduplicator.keep_mask(), excluded_outliers)
+    elif excluded_outliers is not None:
+        return store_analytics(listing_store, outliers=excluded_outliers)
+    return load_analytics(listing_store)
+
+def render_static_page(pathname):
+    """Read-only page for the static snapshot (see snapshot.py).
+
+    Everything is rendered up front: all current new listings and the analytics
+    charts, without the controls that need server callbacks. The refreshing
+    Location turns navigation to any other route into a full page load, served
+    by the app.
+    """
+    if pathname == '/':
+        page = create_layout(statistics_accumulator.statistics(), new_listings_data, cube=home_cube_data,
+                             dedup_toggle=False)
+    elif pathname == '/new-listings':
+        data, _ = new_listings_feed.snapshot()
+        page = create_new_listings_layout(data, live=False)
+    elif pathname == '/all-listings':
+        page = create_all_listings_layout(charts=create_analytics_charts(*analytics_frames()))
+    else:
+        raise ValueError(f"{pathname} is not a static page")
+    return html.Div([dcc.Location(id='url', refresh=True), page])
+
+def is_price_outlier(listing_id):
+    """Whether the listing's price was flagged as an outlier for its segment."""
+    row = listing_store.row(listing_id)
+    return price_outlier_mask is not None and row is not None and row < len(price_outlier_mask) \
+        and bool(price_outlier_mask[row])
+
+def create_price_cell(annonce):
+    price = f"{annonce.get('price', 'N/A')} TND"
+    if not is_price_outlier(annonce.get('id')):
+        return html.Td(price)
+    return html.Td([price, html.Span(" ⚠️", title="Unusual price for this type, governorate and month")])
+
 def create_listings_table(annonces, include_description=True):
     table_header = [
         html.Thead(
@@ -99,7 +396,7 @@ def create_listings_table(annonces, include_description=True):
         
         row_data = [
             html.Td(annonce.get('title', 'N/A')),
-            html.Td(f"{annonce.get('price', 'N/A')} TND"),
+            create_price_cell(annonce),
             html.Td(location_str)
         ]
         
@@ -143,21 +440,25 @@ def create_listings_table(annonces, include_description=True):
      Input('max-price-input', 'value'),
      Input('product-type-selector', 'value')]
 )
+@timed("callback")
+@profiled
 def update_filtered_listings(min_price, max_price, producttype):
     data = fetch_filtered_listings(min_price, max_price, producttype)
     annonces = data.get('annonces', [])
     total = data.get('total', 0)
     
     if not annonces:
-        return html.Div([
+        return with_staleness_banner(html.Div([
             html.H4(f"Total Listings: {total}", className="text-center my-2"),
             html.P("No listings found.", className="text-center my-2")
-        ])
+        ]))
     
-    return html.Div([
+    return with_staleness_banner(html.Div([
         html.H4(f"Total Listings: {total}", className="text-center my-2"),
+        create_export_links('price', {'min_price': min_price, 'max_price': max_price,
+                                      'producttype': producttype}),
         create_listings_table(annonces, include_description=True)
-    ])
+    ]))
 
 @callback(
     Output('date-filter-results', 'children'),
@@ -168,8 +469,10 @@ def update_filtered_listings(min_price, max_price, producttype):
      State('date-product-type-selector', 'value')],
     prevent_initial_call=True
 )
+@timed("callback")
+@profiled
 def update_date_filtered_listings(n_clicks, start_date, end_date, location, producttype):
-    logger.debug(f"Callback triggered with dates: {start_date} to {end_date}")
+    logger.debug("Callback triggered with dates: %s to %s", start_date, end_date)
     if not n_clicks or not start_date or not end_date:
         return html.Div("Select dates and click search to view listings.", className="text-center my-4")
     
@@ -181,10 +484,10 @@ def update_date_filtered_listings(n_clicks, start_date, end_date, location, prod
         total = data.get('total', 0)
         
         if not annonces:
-            return html.Div([
+            return with_staleness_banner(html.Div([
                 html.H4(f"Total Listings: {total}", className="text-center my-2"),
                 html.P("No listings found for the selected criteria.", className="text-center my-2")
-            ])
+            ]))
         
         if location:
             governorate, delegation = location.split('|')
@@ -239,14 +542,63 @@ def update_date_filtered_listings(n_clicks, start_date, end_date, location, prod
                 )
             )
         
-        return html.Div([
+        return with_staleness_banner(html.Div([
             html.H4(f"Total Listings: {len(annonces)}", className="text-center my-2"),
+            create_export_links('date', {'start_date': start_date.date().isoformat(),
+                                         'end_date': end_date.date().isoformat(),
+                                         'producttype': producttype, 'location': location}),
             create_listings_table(annonces, include_description=False)
-        ])
+        ]))
         
     except Exception as e:
-        logger.error(f"Error in date filter: {str(e)}")
+        logger.error("Error in date filter: %s", e)
         return html.Div("An error occurred while filtering listings.", className="text-center text-danger my-4")
 
+@callback(
+    Output('search-results', 'children'),
+    [Input('search-query', 'value'),
+     Input('search-min-price', 'value'),
+     Input('search-max-price', 'value'),
+     Input('search-date-range', 'start_date'),
+     Input('search-date-range', 'end_date'),
+     Input('search-location', 'value'),
+     Input('search-product-type', 'value')]
+)
+@timed("callback")
+@profiled
+def update_search_results(query, min_price, max_price, start_date, end_date, location, producttype):
+    if not query or not query.strip():
+        return html.Div("Type keywords to search listing titles and descriptions.", className="text-center my-4")
+
+    governorate, delegation = location.split('|') if location else (None, None)
+    start = datetime.strptime(start_date.split('T')[0], '%Y-%m-%d') if start_date else None
+    end = datetime.strptime(end_date.split('T')[0], '%Y-%m-%d') if end_date else None
+
+    started = time.perf_counter()
+    rows, _, matches = search_index.search(
+        query,
+        min_price=min_price,
+        max_price=max_price,
+        start=start,
+        end=end,
+        governorate=governorate or None,
+        delegation=delegation or None,
+        producttype=producttype
+    )
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    if not matches:
+        return html.Div([
+            html.H4("Total Listings: 0", className="text-center my-2"),
+            html.P("No listings match these keywords.", className="text-center my-2")
+        ])
+
+    return html.Div([
+        html.H4(f"Total Listings: {matches:,}", className="text-center my-2"),
+        html.P(f"Top {len(rows)} by relevance, found in {elapsed_ms:.1f} ms", className="text-center text-muted small"),
+        create_listings_table(search_index.listings(rows), include_description=False)
+    ])
+
 if __name__ == "__main__":
+    init_data()
     app.run(debug=False)
\ No newline at end of file
@@ -0,0 +1,199 @@
+"""
+In-process latency and payload metrics, exposed in the Prometheus text format
+on ``/metrics``.
+
+Every data fetch, pandas processor, figure builder and Dash callback is timed
+under a ``kind`` label (fetch, processor, figure, callback, page) so a slow page
+can be attributed to the API, pandas or plotly. Metrics are per process: with
+several gunicorn workers each scrape reports the worker that answered it.
+"""
+
+import bisect
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from functools import wraps
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUANTILES = (0.5, 0.95, 0.99)
+RESERVOIR_SIZE = 1024
+
+
+class Histogram:
+    """Cumulative bucket histogram plus a window of recent samples for quantiles."""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.recent.append(value)
+
+    def quantiles(self):
+        samples = sorted(self.recent)
+        if not samples:
+            return {}
+        return {q: samples[min(int(q * len(samples)), len(samples) - 1)] for q in QUANTILES}
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.durations = defaultdict(Histogram)
+        self.errors = defaultdict(int)
+        self.payload_bytes = defaultdict(int)
+        self.payload_count = defaultdict(int)
+        self.cache = defaultdict(int)
+        self.counters = defaultdict(int)
+        self.gauges = {}
+
+    def observe(self, kind, name, seconds, failed=False):
+        with self._lock:
+            self.durations[(kind, name)].observe(seconds)
+            if failed:
+                self.errors[(kind, name)] += 1
+
+    def observe_payload(self, source, name, nbytes):
+        with self._lock:
+            self.payload_bytes[(source, name)] += nbytes
+            self.payload_count[(source, name)] += 1
+
+    def record_cache(self, cache, hit):
+        with self._lock:
+            self.cache[(cache, "hit" if hit else "miss")] += 1
+
+    def increment(self, metric, labels, amount=1):
+        with self._lock:
+            self.counters[(metric, tuple(sorted(labels.items())))] += amount
+
+    def set_gauge(self, metric, labels, value):
+        with self._lock:
+            self.gauges[(metric, tuple(sorted(labels.items())))] = value
+
+    def render(self):
+        with self._lock:
+            lines = []
+            _render_durations(lines, self.durations, self.errors)
+            _render_payloads(lines, self.payload_bytes, self.payload_count)
+            _render_cache(lines, self.cache)
+            _render_generic(lines, "counter", self.counters)
+            _render_generic(lines, "gauge", self.gauges)
+        return "\n".join(lines) + "\n"
+
+
+def _labels(**labels):
+    return ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _render_durations(lines, durations, errors):
+    lines.append("# HELP dashboard_duration_seconds Time spent per fetch, processor, figure and callback.")
+    lines.append("# TYPE dashboard_duration_seconds histogram")
+    for (kind, name), hist in sorted(durations.items()):
+        cumulative = 0
+        for bound, count in zip(hist.buckets + (float("inf"),), hist.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'dashboard_duration_seconds_bucket{{{_labels(kind=kind, name=name, le=le)}}} {cumulative}')
+        lines.append(f"dashboard_duration_seconds_sum{{{_labels(kind=kind, name=name)}}} {hist.sum}")
+        lines.append(f"dashboard_duration_seconds_count{{{_labels(kind=kind, name=name)}}} {hist.count}")
+
+    lines.append("# HELP dashboard_duration_quantile_seconds Quantiles over the most recent samples.")
+    lines.append("# TYPE dashboard_duration_quantile_seconds gauge")
+    for (kind, name), hist in sorted(durations.items()):
+        for q, value in hist.quantiles().items():
+            lines.append(f"dashboard_duration_quantile_seconds{{{_labels(kind=kind, name=name, quantile=q)}}} {value}")
+
+    lines.append("# HELP dashboard_errors_total Calls that raised an exception.")
+    lines.append("# TYPE dashboard_errors_total counter")
+    for (kind, name), count in sorted(errors.items()):
+        lines.append(f"dashboard_errors_total{{{_labels(kind=kind, name=name)}}} {count}")
+
+
+def _render_payloads(lines, payload_bytes, payload_count):
+    lines.append("# HELP dashboard_payload_bytes_total Bytes received from the API and sent to browsers.")
+    lines.append("# TYPE dashboard_payload_bytes_total counter")
+    for (source, name), nbytes in sorted(payload_bytes.items()):
+        lines.append(f"dashboard_payload_bytes_total{{{_labels(source=source, name=name)}}} {nbytes}")
+    lines.append("# TYPE dashboard_payloads_total counter")
+    for (source, name), count in sorted(payload_count.items()):
+        lines.append(f"dashboard_payloads_total{{{_labels(source=source, name=name)}}} {count}")
+
+
+def _render_cache(lines, cache):
+    lines.append("# HELP dashboard_cache_requests_total Cache lookups by result.")
+    lines.append("# TYPE dashboard_cache_requests_total counter")
+    for (name, result), count in sorted(cache.items()):
+        lines.append(f"dashboard_cache_requests_total{{{_labels(cache=name, result=result)}}} {count}")
+    lines.append("# TYPE dashboard_cache_hit_ratio gauge")
+    for name in sorted({name for name, _ in cache}):
+        hits, misses = cache.get((name, "hit"), 0), cache.get((name, "miss"), 0)
+        if hits + misses:
+            lines.append(f"dashboard_cache_hit_ratio{{{_labels(cache=name)}}} {hits / (hits + misses):.4f}")
+
+
+def _render_generic(lines, metric_type, values):
+    seen = set()
+    for (metric, labels), value in sorted(values.items()):
+        if metric not in seen:
+            lines.append(f"# TYPE {metric} {metric_type}")
+            seen.add(metric)
+        lines.append(f"{metric}{{{_labels(**dict(labels))}}} {value}")
+
+
+registry = Registry()
+observe_payload = registry.observe_payload
+record_cache = registry.record_cache
+increment = registry.increment
+set_gauge = registry.set_gauge
+
+
+@contextmanager
+def timer(kind, name):
+    """Time the enclosed block under ``kind``/``name``."""
+    start = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        registry.observe(kind, name, time.perf_counter() - start, failed)
+
+
+def timed(kind):
+    """Decorator timing every call of the wrapped function under its name."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(kind, func.__name__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def init_metrics(server):
+    """Add the ``/metrics`` route and response-size tracking to the Flask server."""
+    from flask import Response, request
+
+    @server.route("/metrics")
+    def metrics():
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+    @server.after_request
+    def record_response_size(response):
+        if request.path.endswith("/_dash-update-component") and response.content_length:
+            output = (request.get_json(silent=True) or {}).get("output", "unknown")
+            observe_payload("callback", output, response.content_length)
+        return response
@@ -0,0 +1,358 @@
+"""
+MongoDB data source with the same interface as the API fetchers in
+data_processor.py. Enabled with ``DATA_SOURCE=mongo``.
+
+Statistics and the /all-listings analytics can run as ``$group`` aggregation
+pipelines on the server, and listing queries project only the fields the
+dashboard shows. The corpus is still streamed into the app once at startup
+(``ingest_listings``) for the columnar store, search index and deduplication.
+
+The price outlier flags (outliers.py) are computed in the app from that store,
+so the server-side analytics only serve /all-listings with
+``EXCLUDE_PRICE_OUTLIERS=0``. With the default exclusion, the analytics are
+aggregated from the store instead, like the deduplicated ones.
+
+``set_collection`` accepts any pymongo-compatible collection (e.g. a mongomock
+one) for testing.
+
+Recommended indexes are listed in ``INDEXES``; create them with
+``python -m app.mongo_source``.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from .config import Config
+from .metrics import timed
+from .store import type_label
+from .utils import logger
+
+# Fields shown in the listings tables and cards.
+LISTING_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "title": 1,
+    "price": 1,
+    "description": 1,
+    "location.governorate": 1,
+    "location.delegation": 1,
+    "metadata.publishedOn": 1,
+    "metadata.producttype": 1,
+}
+
+# Fields the columnar store and the search index keep (see store.py, search.py).
+STORE_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "title": 1,
+    "description": 1,
+    "price": 1,
+    "location.governorate": 1,
+    "location.delegation": 1,
+    "metadata.publishedOn": 1,
+    "metadata.producttype": 1,
+    "metadata.publisher.type": 1,
+}
+
+INDEXES = [
+    # Date filter, new listings and the monthly analytics.
+    [("metadata.publishedOn", -1)],
+    # Price filter, optionally narrowed to sale or rent.
+    [("metadata.producttype", 1), ("price", 1)],
+    # Date filter narrowed to sale or rent.
+    [("metadata.producttype", 1), ("metadata.publishedOn", -1)],
+    # Governorate and delegation statistics and the location dropdown.
+    [("location.governorate", 1), ("location.delegation", 1)],
+    # Listing details.
+    [("id", 1)],
+]
+
+_collection = None
+
+
+def get_collection():
+    global _collection
+    if _collection is None:
+        from pymongo import MongoClient
+        client = MongoClient(Config.MONGO_URI, serverSelectionTimeoutMS=5000)
+        _collection = client[Config.MONGO_DB][Config.MONGO_COLLECTION]
+    return _collection
+
+
+def set_collection(collection):
+    """Use ``collection`` instead of connecting to ``Config.MONGO_URI``."""
+    global _collection
+    _collection = collection
+
+
+def ensure_indexes(collection=None):
+    collection = collection if collection is not None else get_collection()
+    return [collection.create_index(keys) for keys in INDEXES]
+
+
+def _published_between(start, end):
+    """Match publishedOn in [start, end), whether stored as a date or an ISO string."""
+    return {"$or": [
+        {"metadata.publishedOn": {"$gte": start, "$lt": end}},
+        {"metadata.publishedOn": {"$gte": start.strftime("%Y-%m-%dT%H:%M:%S"),
+                                  "$lt": end.strftime("%Y-%m-%dT%H:%M:%S")}},
+    ]}
+
+
+def _year_month():
+    # "YYYY-MM" of an ISO string or a date ($toString gives ISO for dates)
+    return {"$substr": [{"$toString": "$metadata.publishedOn"}, 0, 7]}
+
+
+def _price_query(min_price, max_price, producttype):
+    price = {}
+    if min_price is not None:
+        price["$gte"] = min_price
+    if max_price is not None:
+        price["$lte"] = max_price
+    query = {"price": price} if price else {}
+    if producttype is not None:
+        query["metadata.producttype"] = producttype
+    return query
+
+
+def _date_query(start_date, end_date, producttype):
+    query = _published_between(start_date, end_date + timedelta(days=1))
+    if producttype is not None:
+        query["metadata.producttype"] = producttype
+    return query
+
+
+def _page(query, skip, limit):
+    collection = get_collection()
+    cursor = (collection.find(query, LISTING_PROJECTION)
+              .sort("metadata.publishedOn", -1).skip(skip).limit(limit))
+    return {"annonces": list(cursor), "total": collection.count_documents(query)}
+
+
+@timed("fetch")
+def load_statistics(url=None):
+    pipeline = [
+        {"$project": {
+            "_id": 0,
+            "price": 1,
+            "governorate": "$location.governorate",
+            "delegation": "$location.delegation",
+            "producttype": "$metadata.producttype",
+            "is_shop": {"$eq": ["$metadata.publisher.type", "Shop"]},
+        }},
+        {"$facet": {
+            "total": [{"$count": "count"}],
+            "governorate_stats": [
+                {"$group": {"_id": "$governorate", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1}},
+            ],
+            "type_stats": [{"$group": {"_id": "$producttype", "count": {"$sum": 1}}}],
+            "avg_prices": [
+                {"$match": {"price": {"$gt": 0}}},
+                {"$group": {"_id": "$producttype", "avg": {"$avg": "$price"}}},
+            ],
+            "publisher_stats": [{"$group": {"_id": "$is_shop", "count": {"$sum": 1}}}],
+            "delegation_by_governorate": [
+                {"$group": {"_id": {"governorate": "$governorate", "delegation": "$delegation"},
+                            "count": {"$sum": 1}}},
+                {"$sort": {"count": -1}},
+                {"$group": {"_id": "$_id.governorate",
+                            "delegations": {"$push": {"delegation": "$_id.delegation", "count": "$count"}}}},
+            ],
+        }},
+    ]
+    try:
+        result = next(get_collection().aggregate(pipeline), {})
+    except Exception as e:
+        logger.error("Error aggregating statistics: %s", e)
+        return {}
+
+    avg_prices = {item['_id']: item['avg'] for item in result.get('avg_prices', [])}
+    total = result.get('total', [])
+    return {
+        "total_listings": total[0]['count'] if total else 0,
+        "governorate_stats": result.get('governorate_stats', []),
+        "type_stats": result.get('type_stats', []),
+        "avg_price_sale": avg_prices.get(1, 0),
+        "avg_price_rent": avg_prices.get(0, 0),
+        "publisher_stats": result.get('publisher_stats', []),
+        "delegation_by_governorate": result.get('delegation_by_governorate', []),
+    }
+
+
+@timed("fetch")
+def load_new_listings(url=None):
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    query = _published_between(now - timedelta(days=Config.NEW_LISTINGS_DAYS), now + timedelta(days=1))
+    try:
+        annonces = list(get_collection().find(query, LISTING_PROJECTION).sort("metadata.publishedOn", -1))
+    except Exception as e:
+        logger.error("Error fetching new listings: %s", e)
+        return {}
+    return {"count": len(annonces), "new_annonces": annonces}
+
+
+@timed("fetch")
+def fetch_filtered_listings(min_price, max_price, producttype):
+    try:
+        return _page(_price_query(min_price, max_price, producttype), 0, 100)
+    except Exception as e:
+        logger.error("Error fetching filtered listings: %s", e)
+        return {}
+
+
+@timed("fetch")
+def fetch_listing_details(listing_id):
+    try:
+        return get_collection().find_one({"id": listing_id}, {"_id": 0})
+    except Exception as e:
+        logger.error("Error fetching listing %s: %s", listing_id, e)
+        return None
+
+
+@timed("fetch")
+def fetch_listings_by_date(start_date, end_date, producttype=None, skip=0, limit=100):
+    try:
+        return _page(_date_query(start_date, end_date, producttype), skip, limit)
+    except Exception as e:
+        logger.error("Error fetching listings by date: %s", e)
+        return {}
+
+
+@timed("fetch")
+def fetch_governorates_delegations():
+    pipeline = [
+        {"$match": {"location.governorate": {"$ne": None}}},
+        {"$group": {"_id": "$location.governorate", "delegations": {"$addToSet": "$location.delegation"}}},
+        {"$sort": {"_id": 1}},
+    ]
+    try:
+        return [{"governorate": item['_id'], "delegations": sorted(d for d in item['delegations'] if d)}
+                for item in get_collection().aggregate(pipeline)]
+    except Exception as e:
+        logger.error("Error fetching governorates and delegations: %s", e)
+        return []
+
+
+def iter_listing_pages(page_size=None):
+    """Yield the corpus one page at a time from a single batched cursor."""
+    page_size = page_size or Config.INGEST_PAGE_SIZE
+    page = []
+    try:
+        for annonce in get_collection().find({}, STORE_PROJECTION).batch_size(page_size):
+            page.append(annonce)
+            if len(page) >= page_size:
+                yield page
+                page = []
+    except Exception as e:
+        logger.error("Error reading listings, stopping ingestion: %s", e)
+    if page:
+        yield page
+
+
+def _iter_query_pages(query, page_size):
+    """Yield every listing matching ``query``, newest first, one page at a time.
+
+    Errors are raised. Closing the generator closes the cursor.
+    """
+    page_size = page_size or Config.INGEST_PAGE_SIZE
+    page = []
+    with get_collection().find(query, LISTING_PROJECTION).sort("metadata.publishedOn", -1).batch_size(page_size) as cursor:
+        for annonce in cursor:
+            page.append(annonce)
+            if len(page) >= page_size:
+                yield page
+                page = []
+    if page:
+        yield page
+
+
+def iter_filtered_pages(min_price, max_price, producttype, page_size=None):
+    """All listings of the price filter, one page at a time (see fetch_filtered_listings)."""
+    return _iter_query_pages(_price_query(min_price, max_price, producttype), page_size)
+
+
+def iter_listings_by_date_pages(start_date, end_date, producttype=None, page_size=None):
+    """All listings of the date filter, one page at a time (see fetch_listings_by_date)."""
+    return _iter_query_pages(_date_query(start_date, end_date, producttype), page_size)
+
+
+@timed("fetch")
+def fetch_all_listings(max_listings=None):
+    try:
+        cursor = get_collection().find({}, LISTING_PROJECTION)
+        return list(cursor.limit(max_listings) if max_listings else cursor)
+    except Exception as e:
+        logger.error("Error fetching listings: %s", e)
+        return []
+
+
+@timed("fetch")
+def ingest_listings(store, page_size=None):
+    """Stream the whole collection into ``store`` page by page."""
+    for annonces in iter_listing_pages(page_size):
+        store.extend(annonces)
+    logger.info("Ingested %s listings", len(store))
+    return store
+
+
+@timed("processor")
+def average_prices_over_time():
+    """Same frame as data_processor.process_average_prices_over_time, grouped in MongoDB."""
+    import pandas as pd
+    pipeline = [
+        {"$match": {"price": {"$gt": 0},
+                    "metadata.publishedOn": {"$ne": None},
+                    "metadata.producttype": {"$ne": None}}},
+        {"$project": {"_id": 0, "price": 1, "producttype": "$metadata.producttype", "year_month": _year_month()}},
+        {"$group": {"_id": {"year_month": "$year_month", "producttype": "$producttype"},
+                    "price": {"$avg": "$price"}}},
+    ]
+    rows = [{"year_month": item['_id']['year_month'],
+             "type_label": type_label(item['_id']['producttype']),
+             "price": item['price']}
+            for item in get_collection().aggregate(pipeline)]
+    if not rows:
+        return pd.DataFrame()
+    return pd.DataFrame(rows).sort_values(['year_month', 'type_label']).reset_index(drop=True)
+
+
+@timed("processor")
+def monthly_distribution_by_type():
+    """Same frame as data_processor.process_monthly_distribution_by_type, grouped in MongoDB."""
+    import pandas as pd
+    pipeline = [
+        {"$match": {"metadata.publishedOn": {"$ne": None}, "metadata.producttype": {"$ne": None}}},
+        {"$project": {"_id": 0, "producttype": "$metadata.producttype", "year_month": _year_month()}},
+        {"$group": {"_id": {"year_month": "$year_month", "producttype": "$producttype"},
+                    "count": {"$sum": 1}}},
+    ]
+    rows = [{"year_month": item['_id']['year_month'],
+             "type_label": type_label(item['_id']['producttype']),
+             "count": item['count']}
+            for item in get_collection().aggregate(pipeline)]
+    if not rows:
+        return pd.DataFrame()
+    pivot = (pd.DataFrame(rows)
+             .pivot_table(index='year_month', columns='type_label', values='count', aggfunc='sum', fill_value=0)
+             .reset_index())
+    return pivot
+
+
+def load_analytics(store=None):
+    """Return the (average prices, monthly distribution) frames for /all-listings.
+
+    Aggregated in MongoDB over every listing, price outliers included;
+    ``store`` is accepted for interface parity and unused.
+    """
+    import pandas as pd
+    try:
+        return average_prices_over_time(), monthly_distribution_by_type()
+    except Exception as e:
+        logger.error("Error aggregating analytics: %s", e)
+        return pd.DataFrame(), pd.DataFrame()
+
+
+if __name__ == "__main__":
+    for name in ensure_indexes():
+        print(f"Index ready: {name}")
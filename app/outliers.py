@@ -0,0 +1,110 @@
+"""
+Robust price outlier detection per market segment.
+
+Mistyped prices (1 TND, a sale price entered as a rent) skew every mean and
+median. A price is an outlier when its robust z-score,
+
+    |log(price) - median| / (1.4826 * MAD)
+
+within its segment of (product type, governorate, month) exceeds
+``OUTLIER_THRESHOLD``. Logs are used because prices are spread
+multiplicatively; the median and the median absolute deviation are barely
+moved by the outliers themselves. Segments with fewer than ``MIN_SEGMENT``
+priced listings are judged against their (product type, month) segment, then
+against their product type.
+
+Everything runs as grouped numpy operations (two sorts per segment level), so
+millions of listings take well under a second. Non-positive prices are never
+flagged: the aggregates already leave them out.
+"""
+
+import numpy as np
+
+from .config import Config
+from .metrics import set_gauge, timed
+from .utils import logger
+
+MIN_SEGMENT = 8
+_MAD_SCALE = 1.4826  # MAD to standard deviation for normal data
+_MEAN_AD_SCALE = 1.2533  # mean absolute deviation to standard deviation
+
+
+def _group_medians(values, starts, counts):
+    """Median per group of ``values``, sorted within groups that start at ``starts``."""
+    return (values[starts + (counts - 1) // 2] + values[starts + counts // 2]) / 2
+
+
+def _segment_scores(groups, values):
+    """Robust z-score of each value within its group, and the size of that group."""
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    _, starts, inverse, counts = np.unique(groups, return_index=True, return_inverse=True, return_counts=True)
+    deviations = np.abs(values - _group_medians(values, starts, counts)[inverse])
+
+    by_deviation = np.lexsort((deviations, groups))
+    scale = _MAD_SCALE * _group_medians(deviations[by_deviation], starts, counts)
+    # More than half the segment at one price: fall back to the mean absolute deviation.
+    mean_deviation = np.bincount(inverse, weights=deviations) / counts
+    scale = np.where(scale > 0, scale, _MEAN_AD_SCALE * mean_deviation)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = np.where(scale[inverse] > 0, deviations / scale[inverse], 0.0)
+
+    unsorted = np.empty_like(order)
+    unsorted[order] = np.arange(len(order))
+    return scores[unsorted], counts[inverse][unsorted]
+
+
+def segment_outliers(prices, *segments, threshold=None, min_segment=MIN_SEGMENT):
+    """Boolean mask of ``prices`` that are outliers within their segment.
+
+    ``segments`` are integer code arrays from the finest level to the coarsest;
+    each price is judged at the finest level whose segment has at least
+    ``min_segment`` positive prices (the coarsest level is always used as a
+    last resort).
+    """
+    threshold = Config.OUTLIER_THRESHOLD if threshold is None else threshold
+    prices = np.asarray(prices, dtype=np.float64)
+    flags = np.zeros(len(prices), dtype=bool)
+    with np.errstate(invalid='ignore'):
+        priced = np.flatnonzero(prices > 0)
+    if not len(priced):
+        return flags
+
+    values = np.log(prices[priced])
+    scores = np.zeros(len(priced))
+    judged = np.zeros(len(priced), dtype=bool)
+    for level, codes in enumerate(segments):
+        level_scores, sizes = _segment_scores(np.asarray(codes, dtype=np.int64)[priced], values)
+        use = ~judged & ((sizes >= min_segment) | (level == len(segments) - 1))
+        scores[use] = level_scores[use]
+        judged |= use
+    flags[priced[scores > threshold]] = True
+    return flags
+
+
+def _combine(*codes):
+    """One int64 code per row for the combination of ``codes`` (missing values are -1)."""
+    dims = [np.asarray(c, dtype=np.int64) + 1 for c in codes]
+    return np.ravel_multi_index(dims, [int(d.max()) + 1 if len(d) else 1 for d in dims])
+
+
+@timed("processor")
+def price_outliers(store, threshold=None):
+    """Mask over the rows of a ListingStore, True where the price is an outlier.
+
+    Rows added to the store afterwards are not covered; callers treat rows past
+    the end of the mask as regular.
+    """
+    columns = store.columns('producttype', 'governorate', 'year_month', 'price')
+    producttype, governorate, month = columns['producttype'], columns['governorate'], columns['year_month']
+    flags = segment_outliers(
+        columns['price'],
+        _combine(producttype, governorate, month),
+        _combine(producttype, month),
+        producttype,
+        threshold=threshold,
+    )
+    outliers = int(np.count_nonzero(flags))
+    set_gauge("dashboard_price_outliers", {}, outliers)
+    logger.info("Flagged %s price outliers among %s listings", outliers, len(flags))
+    return flags
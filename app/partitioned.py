@@ -0,0 +1,161 @@
+"""
+Partitioned aggregation of the listing store over a process pool.
+
+The monthly analytics (average price and listing count per month and product
+type) are computed by splitting the store's rows into partitions of whole
+months, aggregating each partition in a worker process and merging the partial
+results. Partials are mergeable by addition: a listing count, a price sum and a
+price count per month and type, so merging costs O(months x types) whatever
+the corpus size.
+
+Workers are forked with the columns already in memory, so only partition
+bounds and partial results cross process boundaries. Months are assigned to
+partitions greedily by listing count, so each worker gets a similar share.
+
+``load_analytics`` switches to this engine once the store holds at least
+``PARTITION_MIN_ROWS`` listings and ``PARTITION_WORKERS`` is above 1.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .metrics import timed
+from .store import type_label
+from .utils import logger
+
+_worker_columns = None
+
+
+def _init_worker(columns):
+    global _worker_columns
+    _worker_columns = columns
+
+
+def _partial(months, shape, columns=None):
+    """Count, price sum and price count of the rows whose month is in ``months``.
+
+    Each array is indexed by (month code, product type code).
+    Workers read the columns set by ``_init_worker``.
+    """
+    columns = _worker_columns if columns is None else columns
+    month, producttype, price = columns['year_month'], columns['producttype'], columns['price']
+    member = np.zeros(shape[0] + 1, dtype=bool)
+    member[months] = True
+    # month -1 (unknown) indexes the last, always False, entry
+    selected = member[month] & (producttype >= 0)
+    month, producttype, price = month[selected], producttype[selected], price[selected]
+    cells = shape[0] * shape[1]
+    cell = month.astype(np.int64) * shape[1] + producttype
+
+    counts = np.bincount(cell, minlength=cells)
+    with np.errstate(invalid='ignore'):
+        priced = price > 0
+    cell, price = cell[priced], price[priced]
+    sums = np.bincount(cell, weights=price, minlength=cells)
+    return counts.reshape(shape), sums.reshape(shape), np.bincount(cell, minlength=cells).reshape(shape)
+
+
+def _partitions(month, partitions):
+    """Month codes split into up to ``partitions`` groups of similar listing counts."""
+    totals = np.bincount(month[month >= 0])
+    groups = [[] for _ in range(partitions)]
+    loads = np.zeros(partitions)
+    for code in np.argsort(-totals, kind='stable'):
+        if not totals[code]:
+            break
+        target = int(np.argmin(loads))
+        groups[target].append(int(code))
+        loads[target] += totals[code]
+    return [np.array(group, dtype=np.int32) for group in groups if group]
+
+
+def _pool_context():
+    # Forked workers inherit the columns instead of unpickling a copy each.
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('fork' if 'fork' in methods else None)
+
+
+class MonthlyAggregate:
+    """Merged per-(month, product type) aggregates of a ListingStore."""
+
+    def __init__(self, store, counts, price_sums, price_counts):
+        self.store = store
+        self.counts = counts
+        self.price_sums = price_sums
+        self.price_counts = price_counts
+
+    def _cells(self, values):
+        """Frame of the non-empty cells of ``values`` with month and type labels."""
+        import pandas as pd
+        month, producttype = np.nonzero(values)
+        return pd.DataFrame({
+            'year_month': self.store.decode('year_month', month),
+            'type_label': self.store.decode('producttype', producttype, convert=type_label),
+            'month': month,
+            'producttype': producttype,
+        })
+
+    def average_prices(self):
+        """Same frame as data_processor.average_prices_over_time."""
+        import pandas as pd
+        cells = self._cells(self.price_counts)
+        if cells.empty:
+            return pd.DataFrame()
+        cells['sum'] = self.price_sums[cells['month'], cells['producttype']]
+        cells['count'] = self.price_counts[cells['month'], cells['producttype']]
+        grouped = cells.groupby(['year_month', 'type_label'])[['sum', 'count']].sum()
+        return (grouped['sum'] / grouped['count']).rename('price').reset_index()
+
+    def distribution(self):
+        """Same frame as data_processor.monthly_distribution_by_type."""
+        import pandas as pd
+        cells = self._cells(self.counts)
+        if cells.empty:
+            return pd.DataFrame()
+        cells['count'] = self.counts[cells['month'], cells['producttype']]
+        return (cells.groupby(['year_month', 'type_label'])['count'].sum()
+                .unstack(fill_value=0).reset_index())
+
+
+@timed("processor")
+def monthly_aggregate(store, workers=None, keep=None, outliers=None):
+    """Aggregate ``store`` by month and product type over ``workers`` processes.
+
+    ``keep`` and ``outliers`` are row masks as in data_processor. With one
+    worker everything runs in this process.
+    """
+    from .data_processor import masked_columns
+
+    workers = workers or os.cpu_count() or 1
+    columns = masked_columns(store, ('year_month', 'producttype', 'price'), keep, outliers)
+    shape = (max(len(store.categories('year_month')), 1), max(len(store.categories('producttype')), 1))
+    partitions = _partitions(columns['year_month'], workers)
+
+    if workers == 1 or len(partitions) < 2:
+        partials = [_partial(months, shape, columns) for months in partitions]
+    else:
+        with ProcessPoolExecutor(len(partitions), mp_context=_pool_context(),
+                                 initializer=_init_worker, initargs=(columns,)) as pool:
+            partials = list(pool.map(_partial, partitions, [shape] * len(partitions)))
+
+    if not partials:
+        empty = np.zeros(shape)
+        return MonthlyAggregate(store, empty, empty, empty)
+    return MonthlyAggregate(store, *(sum(parts) for parts in zip(*partials)))
+
+
+def partitioned_analytics(store, workers=None, keep=None, outliers=None):
+    """The (average prices, monthly distribution) frames of data_processor.load_analytics.
+
+    Falls back to one process when a pool cannot be started (e.g. inside a
+    daemonic process).
+    """
+    try:
+        aggregate = monthly_aggregate(store, workers, keep, outliers)
+    except (AssertionError, OSError) as e:
+        logger.warning("Partitioned aggregation unavailable, running in process: %s", e)
+        aggregate = monthly_aggregate(store, 1, keep, outliers)
+    return aggregate.average_prices(), aggregate.distribution()
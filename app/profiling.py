@@ -0,0 +1,102 @@
+"""
+Opt-in cProfile sampling of Dash callbacks.
+
+Enable with ``PROFILE_ENABLED=1``: a fraction ``PROFILE_SAMPLE_RATE`` of calls
+is profiled and written as ``.pstats`` files to ``PROFILE_DIR``, which keeps at
+most ``PROFILE_MAX_FILES`` files. When ``PROFILE_TOKEN`` is set, opening any
+page with ``?profile=<token>`` profiles every call from that browser (until
+``?profile=off``), whether or not sampling is enabled.
+
+View a profile with ``python -m pstats profiles/<file>`` or snakeviz.
+"""
+
+import cProfile
+import os
+import random
+import threading
+import time
+from functools import wraps
+
+from .config import Config
+from .utils import logger
+
+COOKIE_NAME = "dashboard_profile"
+
+# cProfile hooks are per thread but only one profile runs at a time per process,
+# so profiling never stacks up under load.
+_active = threading.Lock()
+
+
+def _admin_requested():
+    if not Config.PROFILE_TOKEN:
+        return False
+    try:
+        from flask import has_request_context, request
+    except ImportError:
+        return False
+    return has_request_context() and request.cookies.get(COOKIE_NAME) == Config.PROFILE_TOKEN
+
+
+def _should_profile():
+    if _admin_requested():
+        return True
+    return Config.PROFILE_ENABLED and random.random() < Config.PROFILE_SAMPLE_RATE
+
+
+def _write_profile(profile, name):
+    os.makedirs(Config.PROFILE_DIR, exist_ok=True)
+    path = os.path.join(Config.PROFILE_DIR, f"{time.time_ns() // 1000}-{name}-{os.getpid()}.pstats")
+    profile.dump_stats(path)
+    _prune(Config.PROFILE_DIR, Config.PROFILE_MAX_FILES)
+    logger.info("Wrote profile %s", path)
+
+
+def _prune(directory, keep):
+    entries = sorted(
+        (entry for entry in os.scandir(directory) if entry.name.endswith(".pstats")),
+        key=lambda entry: entry.stat().st_mtime,
+    )
+    for entry in entries[:max(len(entries) - keep, 0)]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def profiled(func):
+    """Profile sampled calls of ``func`` and write them to ``PROFILE_DIR``."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _should_profile() or not _active.acquire(blocking=False):
+            return func(*args, **kwargs)
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile.disable()
+                try:
+                    _write_profile(profile, func.__name__)
+                except OSError as e:
+                    logger.error("Could not write profile: %s", e)
+        finally:
+            _active.release()
+    return wrapper
+
+
+def init_profiling(server):
+    """Let admins switch profiling on for their browser with ``?profile=<token>``."""
+    if not Config.PROFILE_TOKEN:
+        return
+
+    from flask import request
+
+    @server.after_request
+    def set_profile_cookie(response):
+        flag = request.args.get("profile")
+        if flag == Config.PROFILE_TOKEN:
+            response.set_cookie(COOKIE_NAME, flag, httponly=True, samesite="Strict")
+        elif flag == "off":
+            response.delete_cookie(COOKIE_NAME)
+        return response
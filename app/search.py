@@ -0,0 +1,242 @@
+"""
+Full-text search over listing titles and descriptions.
+
+``SearchIndex`` is an in-memory inverted index over the rows of a
+``ListingStore``. It is registered as a store listener, so it is built while the
+corpus is ingested and extended as new listings arrive. Each term maps to two
+typed arrays (store rows and term frequencies); queries are ranked with BM25
+in numpy and price, date, location and type filters read the store columns of
+the matching rows only. Titles are kept as UTF-8 in one buffer to render
+results; descriptions are tokenized and dropped.
+
+Text is normalized before indexing and querying: case and French accents are
+folded, Arabic diacritics and tatweel are removed and hamza/alef, alef maqsura
+and ta marbuta variants unified, and the Latin transliteration of Tunisian
+Arabic (arabizi) has its digit letters spelled out (``3ala`` -> ``aala``,
+``7ammam`` -> ``hammam``). A light stemmer strips the Arabic article and
+French plural ``s``.
+"""
+
+import re
+import sys
+import threading
+import unicodedata
+from array import array
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from .metrics import set_gauge, timed
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+TITLE_CHARS = 200
+
+_COMBINING = re.compile('[\u0300-\u036f\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed]')
+_ARABIC = str.maketrans({
+    '\u0649': '\u064a', '\u0629': '\u0647', '\u0640': None,  # alef maqsura, ta marbuta, tatweel
+    **{chr(0x0660 + i): str(i) for i in range(10)},
+})
+_ARABIZI = str.maketrans({'2': 'a', '3': 'a', '5': 'kh', '7': 'h', '8': 'gh', '9': 'k'})
+_ARABIZI_TOKEN = re.compile(r'^(?=(?:[0-9]*[a-z]){2})(?=[a-z]*[235789])[a-z0-9]+$')
+_TOKEN = re.compile(r'\w+')
+
+STOPWORDS = frozenset({
+    'de', 'la', 'le', 'les', 'des', 'du', 'et', 'au', 'aux', 'en', 'un', 'une',
+    'pour', 'avec', 'dans', 'sur', 'par', 'ou', 'est', 'tres', 'plus', 'el',
+    'في', 'من', 'علي', 'الي', 'عن', 'مع', 'او',
+})
+
+_ARRAY_BYTES = sys.getsizeof(array('i'))
+
+
+def normalize(text):
+    """Lowercase ``text`` and fold accents, Arabic letter variants and digits."""
+    text = text.lower()
+    if text.isascii():
+        return text
+    return _COMBINING.sub('', unicodedata.normalize('NFKD', text)).translate(_ARABIC)
+
+
+def tokenize(text):
+    """Normalized, stemmed terms of ``text`` without stopwords."""
+    terms = []
+    for token in _TOKEN.findall(normalize(text)):
+        if token in STOPWORDS:
+            continue
+        if _ARABIZI_TOKEN.match(token):
+            token = token.translate(_ARABIZI)
+        if token.startswith('ال') and len(token) > 4:
+            token = token[2:]
+        elif token.endswith('s') and len(token) > 3 and token.isascii():
+            token = token[:-1]
+        if len(token) > 1:
+            terms.append(token)
+    return terms
+
+
+def _term_counts(annonce):
+    # Title terms count twice: a match in the title says more than one in the description.
+    title = tokenize(str(annonce.get('title') or ''))
+    return Counter(title + title + tokenize(str(annonce.get('description') or '')))
+
+
+def _utc_timestamp(value):
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class SearchIndex:
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self._postings = {}  # term -> (store rows, term frequencies)
+        self._lengths = array('i')
+        self._total_length = 0
+        self._titles = bytearray()
+        self._title_offsets = array('q', [0])
+        self._bytes = 0
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def add(self, rows, annonces):
+        """Index listings the store just added (a ``ListingStore`` listener)."""
+        documents = [
+            (row, str(annonce.get('title') or '')[:TITLE_CHARS].encode('utf-8'), _term_counts(annonce))
+            for row, annonce in zip(rows, annonces)
+        ]
+        with self._lock:
+            for row, title, counts in documents:
+                if row < len(self._lengths):
+                    continue
+                # Rows stored before the index existed stay unsearchable but keep the alignment.
+                while len(self._lengths) < row:
+                    self._append(len(self._lengths), b'', {})
+                self._append(row, title, counts)
+        set_gauge("dashboard_search_documents", {}, len(self))
+        set_gauge("dashboard_search_index_bytes", {}, self.memory_bytes())
+
+    def _append(self, row, title, counts):
+        for term, frequency in counts.items():
+            posting = self._postings.get(term)
+            if posting is None:
+                posting = self._postings[term] = (array('i'), array('B'))
+                self._bytes += sys.getsizeof(term) + 2 * _ARRAY_BYTES
+            posting[0].append(row)
+            posting[1].append(min(frequency, 255))
+        length = sum(counts.values())
+        self._lengths.append(length)
+        self._total_length += length
+        self._titles += title
+        self._title_offsets.append(len(self._titles))
+        self._bytes += 5 * len(counts) + len(title) + 12
+
+    def memory_bytes(self):
+        """Approximate size of the index (postings, lengths, titles and term dictionary)."""
+        with self._lock:
+            return self._bytes + sys.getsizeof(self._postings)
+
+    @timed("search")
+    def search(self, query, limit=50, min_price=None, max_price=None, start=None, end=None,
+               governorate=None, delegation=None, producttype=None):
+        """Rank listings matching any term of ``query`` with BM25.
+
+        Returns ``(rows, scores, matches)``: the best ``limit`` store rows and
+        their scores, best first, out of ``matches`` listings that contain a
+        query term and pass the filters. ``start``/``end`` are datetimes; the
+        end day is included.
+        """
+        empty = (np.empty(0, dtype=np.int64), np.empty(0), 0)
+        terms = set(tokenize(query or ''))
+        with self._lock:
+            if not terms or not self._lengths:
+                return empty
+            parts = [self._score_term(term) for term in terms if term in self._postings]
+        if not parts:
+            return empty
+
+        scores = np.bincount(np.concatenate([rows for rows, _ in parts]),
+                             weights=np.concatenate([weights for _, weights in parts]))
+        rows = np.flatnonzero(scores)
+        scores = scores[rows]
+        keep = self._filter(rows, min_price, max_price, start, end, governorate, delegation, producttype)
+        rows, scores = rows[keep], scores[keep]
+
+        matches = len(rows)
+        if matches > limit:
+            top = np.argpartition(-scores, limit)[:limit]
+            rows, scores = rows[top], scores[top]
+        order = np.argsort(-scores, kind='stable')
+        return rows[order], scores[order], matches
+
+    def _score_term(self, term):
+        # Called with the lock held; the buffer views must not outlive it.
+        count = len(self._lengths)
+        posting_rows, frequencies = self._postings[term]
+        rows = np.frombuffer(posting_rows, dtype=np.int32)
+        tf = np.frombuffer(frequencies, dtype=np.uint8).astype(np.float64)
+        lengths = np.frombuffer(self._lengths, dtype=np.int32)[rows]
+        idf = np.log(1 + (count - len(rows) + 0.5) / (len(rows) + 0.5))
+        norm = K1 * (1 - B + B * lengths / max(self._total_length / count, 1))
+        return rows.astype(np.int64), idf * tf * (K1 + 1) / (tf + norm)
+
+    def _filter(self, rows, min_price, max_price, start, end, governorate, delegation, producttype):
+        keep = np.ones(len(rows), dtype=bool)
+        codes = {}
+        for name, value in (('governorate', governorate), ('delegation', delegation), ('producttype', producttype)):
+            if value is None:
+                continue
+            codes[name] = self.store.code(name, value)
+            if codes[name] is None:
+                return np.zeros(len(rows), dtype=bool)
+        names = list(codes)
+        if min_price is not None or max_price is not None:
+            names.append('price')
+        if start is not None or end is not None:
+            names.append('published')
+        if not names or not len(rows):
+            return keep
+
+        values = self.store.take(rows, *names)
+        for name, code in codes.items():
+            keep &= values[name] == code
+        if min_price is not None:
+            keep &= values['price'] >= min_price
+        if max_price is not None:
+            keep &= values['price'] <= max_price
+        if start is not None:
+            keep &= values['published'] >= _utc_timestamp(start)
+        if end is not None:
+            keep &= values['published'] < _utc_timestamp(end + timedelta(days=1))
+        return keep
+
+    def listings(self, rows):
+        """Search results shaped like API listings, for create_listings_table."""
+        if not len(rows):
+            return []
+        values = self.store.take(rows, 'price', 'published', 'governorate', 'delegation')
+        governorates = self.store.decode('governorate', values['governorate'])
+        delegations = self.store.decode('delegation', values['delegation'])
+        with self._lock:
+            offsets = self._title_offsets
+            titles = [bytes(self._titles[offsets[row]:offsets[row + 1]]).decode('utf-8', 'replace')
+                      for row in rows.tolist()]
+
+        results = []
+        for i, row in enumerate(rows.tolist()):
+            price = values['price'][i]
+            published = values['published'][i]
+            results.append({
+                'id': self.store.ids[row],
+                'title': titles[i] or 'N/A',
+                'price': 'N/A' if np.isnan(price) else (int(price) if price.is_integer() else float(price)),
+                'location': {'governorate': governorates[i] or 'N/A', 'delegation': delegations[i] or 'N/A'},
+                'metadata': {'publishedOn': 'N/A' if np.isnan(published)
+                             else datetime.fromtimestamp(published, timezone.utc).isoformat()},
+            })
+        return results
@@ -0,0 +1,177 @@
+"""
+Static snapshot of the read-only pages.
+
+    python -m app.snapshot --output snapshot [--watch]
+
+``/``, ``/new-listings`` and ``/all-listings`` only change when the data does,
+so they can be rendered once per data snapshot and served by any static file
+server, leaving the Dash app to the interactive pages. The bundle holds:
+
+    index.html, new-listings/index.html, all-listings/index.html
+        the app's index page, with a small script pointing the Dash renderer's
+        layout and dependencies requests at the files below
+    snapshot/<page>/layout.json
+        the rendered component tree, figures included (main.render_static_page)
+    snapshot/<page>/dependencies.json
+        the clientside callbacks whose components are all on the page, so the
+        dashboard's cross-filtering keeps working
+    assets/
+        a copy of app/assets
+
+The Dash and component scripts are referenced from their CDN instead of
+``/_dash-component-suites``. Links to other routes load them from the app, so
+the static server (or the proxy in front of both) serves the paths above and
+forwards everything else to the app.
+
+Each file is replaced atomically, so the bundle can be regenerated in place
+while it is served. With ``--watch`` the command keeps following the new
+listings feed and regenerates the bundle whenever listings are published, at
+most every ``--interval`` seconds, with the aggregates recomputed first.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from .config import Config
+from .utils import logger
+
+PAGES = {
+    "/": "home",
+    "/new-listings": "new-listings",
+    "/all-listings": "all-listings",
+}
+
+_FETCH_SHIM = """<script>
+(function () {
+    var files = {"_dash-layout": "%(base)slayout.json", "_dash-dependencies": "%(base)sdependencies.json"};
+    var fetch = window.fetch;
+    window.fetch = function (url, options) {
+        var name = typeof url === "string" ? url.split("?")[0].split("/").pop() : null;
+        return fetch(files[name] || url, options);
+    };
+})();
+</script>
+"""
+
+
+def _write(path, data):
+    """Write ``data`` to ``path`` through a temporary file, replacing it atomically."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".snapshot-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data.encode() if isinstance(data, str) else data)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _copy_assets(source, target):
+    for root, _, files in os.walk(source):
+        for name in files:
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                _write(os.path.join(target, os.path.relpath(path, source)), f.read())
+
+
+def _component_ids(layout):
+    components = [layout, *layout._traverse()]
+    return {c.id for c in components if isinstance(getattr(c, "id", None), str)}
+
+
+def _targets(dependency):
+    """Component ids of a dependency's outputs, inputs and states."""
+    outputs = dependency["output"].strip(".").split("...")
+    ids = [target.rsplit(".", 1)[0] for target in outputs]
+    ids += [item["id"] for item in dependency.get("inputs", []) + dependency.get("state", [])]
+    return ids
+
+
+def page_dependencies(dependencies, ids):
+    """The clientside callbacks among ``dependencies`` whose components are all in ``ids``.
+
+    Server callbacks are left out: nothing answers them in the static bundle.
+    """
+    return [dependency for dependency in dependencies
+            if dependency.get("clientside_function") and all(target in ids for target in _targets(dependency))]
+
+
+@contextmanager
+def _scripts_from_cdn(app):
+    scripts, css = app.scripts.config.serve_locally, app.css.config.serve_locally
+    app.scripts.config.serve_locally = app.css.config.serve_locally = False
+    try:
+        yield
+    finally:
+        app.scripts.config.serve_locally, app.css.config.serve_locally = scripts, css
+
+
+def write_snapshot(output):
+    """Render the static pages for the current data into ``output``."""
+    from plotly.io.json import to_json_plotly
+    from . import main
+
+    started = time.perf_counter()
+    main.init_data()
+    client = main.server.test_client()
+    with _scripts_from_cdn(main.app):
+        index = client.get("/").get_data(as_text=True)
+    dependencies = client.get("/_dash-dependencies").get_json()
+
+    _copy_assets(main.app.config.assets_folder, os.path.join(output, "assets"))
+    pages = []
+    for pathname, name in PAGES.items():
+        layout = main.render_static_page(pathname)
+        base = f"/snapshot/{name}/"
+        _write(os.path.join(output, "snapshot", name, "layout.json"), to_json_plotly(layout))
+        _write(os.path.join(output, "snapshot", name, "dependencies.json"),
+               json.dumps(page_dependencies(dependencies, _component_ids(layout))))
+        pages.append((pathname, index.replace("</head>", _FETCH_SHIM % {"base": base} + "</head>", 1)))
+    # Pages last, so none points at data that is not written yet
+    for pathname, html in pages:
+        _write(os.path.join(output, pathname.strip("/"), "index.html"), html)
+
+    logger.info("Wrote static snapshot to %s in %.2fs", output, time.perf_counter() - started)
+
+
+def watch(output, interval):
+    """Regenerate the snapshot whenever the new listings feed publishes listings."""
+    from . import main
+
+    published = threading.Event()
+    main.new_listings_feed.add_listener(lambda annonces: published.set())
+    main.new_listings_feed.ensure_watching()
+    while True:
+        published.wait()
+        published.clear()
+        try:
+            # The feed has added the listings to the store; recompute what depends on it
+            main.refresh_aggregates()
+            write_snapshot(output)
+        except Exception as e:
+            logger.error("Snapshot refresh failed: %s", e)
+        time.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the read-only dashboard pages to static files.")
+    parser.add_argument("--output", default=Config.SNAPSHOT_DIR, help="bundle directory")
+    parser.add_argument("--watch", action="store_true", help="regenerate when new listings are published")
+    parser.add_argument("--interval", type=float, default=Config.LIVE_POLL_SECONDS,
+                        help="minimum seconds between regenerations with --watch")
+    args = parser.parse_args()
+
+    write_snapshot(args.output)
+    if args.watch:
+        watch(args.output, args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Selects the data source named by ``Config.DATA_SOURCE``: the FastAPI backend
+(data_processor.py, the default) or MongoDB directly (mongo_source.py). Both
+expose the functions in ``__all__``; everything else (store aggregates,
+cleaning) is imported from data_processor directly.
+"""
+
+from .config import Config
+
+__all__ = [
+    "load_statistics",
+    "load_new_listings",
+    "fetch_filtered_listings",
+    "fetch_listing_details",
+    "fetch_listings_by_date",
+    "fetch_governorates_delegations",
+    "fetch_all_listings",
+    "iter_listing_pages",
+    "iter_filtered_pages",
+    "iter_listings_by_date_pages",
+    "ingest_listings",
+    "load_analytics",
+]
+
+if Config.DATA_SOURCE == "mongo":
+    from .mongo_source import (
+        load_statistics,
+        load_new_listings,
+        fetch_filtered_listings,
+        fetch_listing_details,
+        fetch_listings_by_date,
+        fetch_governorates_delegations,
+        fetch_all_listings,
+        iter_listing_pages,
+        iter_filtered_pages,
+        iter_listings_by_date_pages,
+        ingest_listings,
+        load_analytics,
+    )
+else:
+    from .data_processor import (
+        load_statistics,
+        load_new_listings,
+        fetch_filtered_listings,
+        fetch_listing_details,
+        fetch_listings_by_date,
+        fetch_governorates_delegations,
+        fetch_all_listings,
+        iter_listing_pages,
+        iter_filtered_pages,
+        iter_listings_by_date_pages,
+        ingest_listings,
+        load_analytics,
+    )
@@ -0,0 +1,178 @@
+"""
+Compact columnar store of the listing corpus.
+
+Pages from the ingestion generator are folded into typed arrays as they arrive
+and then dropped, so memory grows by a few dozen bytes per listing instead of
+holding every page's JSON. Text columns (governorate, delegation, month,
+product type) are dictionary-encoded: the arrays hold integer codes into a
+small list of distinct values, with -1 for missing.
+"""
+
+import sys
+import threading
+from array import array
+from datetime import datetime
+
+import numpy as np
+
+TYPE_LABELS = {1: 'Sale', 0: 'Rent'}
+
+NUMERIC_COLUMNS = ('price', 'published')
+CODED_COLUMNS = ('producttype', 'governorate', 'delegation', 'year_month', 'is_shop')
+
+
+def type_label(producttype):
+    """'Sale'/'Rent' for 1/0, like the pandas processors; anything else capitalized."""
+    label = TYPE_LABELS.get(producttype)
+    return label if label is not None else str(producttype).capitalize()
+
+
+def _timestamp(published_on):
+    if not isinstance(published_on, str):
+        return float('nan')
+    try:
+        return datetime.fromisoformat(published_on.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return float('nan')
+
+
+class _Dictionary:
+    """Distinct values of a column and their codes."""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def encode(self, value):
+        if value is None:
+            return -1
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class ListingStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._extend_lock = threading.Lock()
+        self._listeners = []
+        self.ids = []
+        self._rows = {}
+        self.price = array('d')
+        self.published = array('d')
+        self._codes = {name: array('i') for name in CODED_COLUMNS}
+        self._dictionaries = {name: _Dictionary() for name in CODED_COLUMNS}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add_listener(self, listener):
+        """Call ``listener(rows, annonces)`` with the listings each extend() adds."""
+        self._listeners.append(listener)
+
+    def extend(self, annonces):
+        """Append one page of listings (as returned by the API); returns the rows added.
+
+        Listings whose id is already stored are skipped, so re-ingesting a page
+        is harmless. Listeners see the new rows in order, after the columns are
+        updated and without the read lock held.
+        """
+        added = []
+        fresh = []
+        with self._extend_lock:
+            with self._lock:
+                for annonce in annonces:
+                    listing_id = annonce.get('id')
+                    if listing_id is not None and listing_id in self._rows:
+                        continue
+                    added.append(len(self.ids))
+                    fresh.append(annonce)
+                    self._append(annonce)
+            if added:
+                for listener in self._listeners:
+                    listener(added, fresh)
+        return added
+
+    def row(self, listing_id):
+        """Row number of a listing id, or None."""
+        return self._rows.get(listing_id)
+
+    def _append(self, annonce):
+        metadata = annonce.get('metadata') or {}
+        location = annonce.get('location') or {}
+        publisher = metadata.get('publisher') or {}
+        published_on = metadata.get('publishedOn')
+        price = annonce.get('price')
+        is_shop = publisher.get('type') == 'Shop' if publisher.get('type') is not None else None
+
+        if annonce.get('id') is not None:
+            self._rows[annonce['id']] = len(self.ids)
+        self.ids.append(annonce.get('id'))
+        self.price.append(float(price) if isinstance(price, (int, float)) and not isinstance(price, bool) else float('nan'))
+        self.published.append(_timestamp(published_on))
+        row = {
+            'producttype': metadata.get('producttype'),
+            'governorate': location.get('governorate'),
+            'delegation': location.get('delegation'),
+            'year_month': published_on[:7] if isinstance(published_on, str) and len(published_on) >= 7 else None,
+            'is_shop': is_shop,
+        }
+        for name, value in row.items():
+            self._codes[name].append(self._dictionaries[name].encode(value))
+
+    def code(self, name, value):
+        """Code of ``value`` in a coded column, or None if it never occurs."""
+        with self._lock:
+            return self._dictionaries[name].codes.get(value)
+
+    def categories(self, name):
+        """Distinct values of a coded column, indexed by code."""
+        with self._lock:
+            return list(self._dictionaries[name].values)
+
+    def columns(self, *names):
+        """Copy the named columns into numpy arrays (codes for coded columns)."""
+        with self._lock:
+            result = {}
+            for name in names:
+                if name == 'id':
+                    result[name] = np.array(self.ids, dtype=object)
+                elif name in NUMERIC_COLUMNS:
+                    result[name] = np.array(getattr(self, name), dtype=np.float64)
+                else:
+                    result[name] = np.array(self._codes[name], dtype=np.int32)
+            return result
+
+    def take(self, rows, *names):
+        """Values of the named columns at ``rows`` only, without copying whole columns."""
+        with self._lock:
+            result = {}
+            for name in names:
+                if name in NUMERIC_COLUMNS:
+                    view = np.frombuffer(getattr(self, name), dtype=np.float64)
+                else:
+                    view = np.frombuffer(self._codes[name], dtype=np.int32)
+                result[name] = view[rows]
+                # A live buffer view would stop the array from growing.
+                del view
+            return result
+
+    def decode(self, name, codes, convert=None):
+        """Map codes of a coded column back to values (None for -1).
+
+        ``convert`` is applied once per distinct value, not once per row.
+        """
+        categories = self.categories(name)
+        if convert is not None:
+            categories = [convert(value) for value in categories]
+        values = np.empty(len(categories) + 1, dtype=object)
+        values[:-1] = categories
+        return values[np.where(codes >= 0, codes, len(categories))]
+
+    def memory_bytes(self):
+        with self._lock:
+            arrays = [self.price, self.published, *self._codes.values()]
+            ids = sys.getsizeof(self.ids) + sys.getsizeof(self._rows) + sum(sys.getsizeof(i) for i in self.ids)
+            return sum(a.itemsize * len(a) for a in arrays) + ids
@@ -1,18 +1,115 @@
+import atexit
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import sys
 
-def configure_logging():
+from .metrics import increment
+
+_handler = None
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue records without formatting them and drop them if the queue is full."""
+
+    def prepare(self, record):
+        # The listener runs in this process, so the record does not need to be
+        # pickled: leave msg % args for the background thread to format.
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            increment("dashboard_log_records_dropped_total", {"level": record.levelname})
+
+
+def _file_handler(pid=None):
+    """Rotating LOG_FILE handler, or stderr when LOG_FILE is "-".
+
+    With a ``pid`` (a forked worker) the file name gets the pid, e.g.
+    ``app.1234.log``: processes rotating one file would truncate each other.
+    """
     log_file = os.getenv("LOG_FILE", "app.log")
+    if log_file == "-":
+        handler = logging.StreamHandler(sys.stderr)
+    else:
+        if pid is not None:
+            root, ext = os.path.splitext(log_file)
+            log_file = f"{root}.{pid}{ext}"
+        handler = logging.handlers.RotatingFileHandler(
+            log_file,
+            maxBytes=int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024)),
+            backupCount=int(os.getenv("LOG_BACKUP_COUNT", 5)),
+            encoding="utf-8",
+            delay=True,
+        )
+    if os.getenv("LOG_JSON", "").lower() in ("1", "true", "yes"):
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s'))
+    return handler
+
+
+def _start_listener(forked=False):
+    """(Re)start the background thread writing queued records to the file."""
+    global _listener
+    # A fresh queue: after a fork the old one may have been locked by a thread
+    # that no longer exists.
+    _handler.queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", 10000)))
+    if forked:
+        # The parent keeps its file; this process gets its own (see _file_handler)
+        _listener.handlers[0].close()
+        file_handler = _file_handler(os.getpid())
+    else:
+        file_handler = _file_handler()
+    _listener = logging.handlers.QueueListener(_handler.queue, file_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def _stop_listener():
+    if _listener:
+        _listener.stop()
+
+
+def configure_logging():
+    """Send root logging through a queue drained by a background thread.
+
+    The level comes from ``LOG_LEVEL`` (default INFO), records go to a rotating
+    ``LOG_FILE`` (one per forked process; "-" logs to stderr instead), and
+    ``LOG_JSON=1`` switches to JSON lines. Safe to call more than once; only
+    the first call installs handlers.
+    """
+    global _handler
     logger = logging.getLogger()
-    logger.setLevel(logging.DEBUG)
-    
-    file_handler = logging.FileHandler(log_file)
-    file_handler.setLevel(logging.DEBUG)
-    
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-    file_handler.setFormatter(formatter)
-    
-    logger.addHandler(file_handler)
+    logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    if _handler is not None:
+        return logger
+
+    _handler = _NonBlockingQueueHandler(None)
+    _start_listener()
+    logger.addHandler(_handler)
+
+    os.register_at_fork(after_in_child=lambda: _start_listener(forked=True))
+    atexit.register(_stop_listener)
     return logger
 
-logger = configure_logging()
\ No newline at end of file
+logger = configure_logging()
@@ -0,0 +1,18 @@
+"""
+WSGI entry point for production servers.
+
+Importing this module loads the listing corpus (``main.init_data``), so running
+gunicorn with ``preload_app = True`` loads it once in the master process and
+the forked workers share it copy-on-write:
+
+    gunicorn -c gunicorn.conf.py app.wsgi:server
+
+``app.main`` itself does no I/O on import; without this module the first
+request loads the data.
+"""
+
+from .main import app, init_data, server
+
+init_data()
+
+__all__ = ["app", "server"]
@@ -0,0 +1,91 @@
+"""
+Scaling of the partitioned monthly aggregation with worker processes.
+
+    python -m benchmarks.bench_partitioned --listings 2000000 --workers 1 2 4 8 --output scaling.json
+
+Builds a ListingStore of synthetic listings (a generated base corpus repeated
+with fresh ids), then times partitioned.monthly_aggregate at each worker
+count, next to the single-process store aggregates it replaces
+(data_processor.load_analytics below PARTITION_MIN_ROWS). Pool start-up is
+included in every timing.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+from datetime import datetime, timezone
+
+from .bench_pipeline import git_commit, measure
+from .stub_api import generate_listings
+
+BASE_LISTINGS = 50000
+
+
+def build_store(count, seed):
+    from app.store import ListingStore
+
+    base = generate_listings(min(count, BASE_LISTINGS), seed=seed)
+    store = ListingStore()
+    copy = 0
+    while len(store) < count:
+        page = base[:count - len(store)]
+        store.extend(page if copy == 0 else [dict(a, id=f"{a['id']}-{copy}") for a in page])
+        copy += 1
+    return store
+
+
+def run(args):
+    from app import data_processor
+    from app.partitioned import monthly_aggregate
+
+    store = build_store(args.listings, args.seed)
+    print(f"store: {len(store)} listings, {store.memory_bytes() / 1e6:.1f} MB", file=sys.stderr)
+
+    def serial():
+        data_processor.average_prices_over_time(store)
+        data_processor.monthly_distribution_by_type(store)
+
+    def partitioned(workers):
+        aggregate = monthly_aggregate(store, workers)
+        aggregate.average_prices()
+        aggregate.distribution()
+
+    results = {"store (single process)": measure(serial, args.repeat)}
+    for workers in args.workers:
+        results[f"partitioned x{workers}"] = measure(lambda workers=workers: partitioned(workers), args.repeat)
+    base = results[f"partitioned x{args.workers[0]}"]["median_ms"]
+    for workers in args.workers:
+        result = results[f"partitioned x{workers}"]
+        result["speedup"] = round(base / result["median_ms"], 2) if result["median_ms"] else None
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "params": {"listings": args.listings, "workers": args.workers},
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark partitioned aggregation scaling.")
+    parser.add_argument("--listings", type=int, default=1000000, help="size of the synthetic store")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Time the ingestion-to-render pipeline against the stub backend.
+
+    python -m benchmarks.bench_pipeline --listings 10000 --latency 5 --output bench.json
+    python -m benchmarks.bench_pipeline --compare bench.json
+
+Covers fetch_all_listings and streaming ingestion, the pandas and store-based
+processors, search indexing and queries, near-duplicate and price outlier detection, every graphs.py builder,
+create_listings_table and each display_page route. Results are written as JSON (with the git commit) so runs
+can be compared between commits.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from .stub_api import start_stub
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "repeat": repeat,
+        "min_ms": round(samples[0] * 1000, 3),
+        "median_ms": round(statistics.median(samples) * 1000, 3),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "p95_ms": round(samples[min(int(0.95 * repeat), repeat - 1)] * 1000, 3),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_cases(listings_count):
+    """Return {name: (callable, repeat)} for every stage of the pipeline."""
+    # Imported late: the app reads FASTAPI_URL when it is first imported.
+    from app import data_processor, graphs, main
+    from app.config import Config
+    from app.dedup import Deduplicator, band_keys
+    from app.outliers import price_outliers
+    from app.accumulator import StatisticsAccumulator
+    from app.search import SearchIndex
+    from app.store import ListingStore
+
+    main.init_data()
+    annonces = data_processor.fetch_all_listings()
+    stats = data_processor.load_statistics(f"{Config.FASTAPI_URL}/statistics")
+    governorate_stats = {item['_id']: item['count'] for item in stats.get('governorate_stats', [])}
+    type_stats = {item['_id']: item['count'] for item in stats.get('type_stats', [])}
+    publisher_stats = {item['_id']: item['count'] for item in stats.get('publisher_stats', [])}
+    delegation_data = stats.get('delegation_by_governorate', [])
+    store = data_processor.ingest_listings(ListingStore())
+    avg_prices_df = data_processor.process_average_prices_over_time(annonces)
+    distribution_df = data_processor.process_monthly_distribution_by_type(annonces)
+    index = SearchIndex(ListingStore())
+    index.store.add_listener(index.add)
+    index.store.extend(annonces)
+    print(f"search index: {len(index)} listings, {index.memory_bytes() / 1e6:.1f} MB", file=sys.stderr)
+    accumulator = StatisticsAccumulator(store)
+    accumulator.add(range(len(store)), annonces)
+    deduplicator = Deduplicator(store)
+    deduplicator.add(range(len(annonces)), annonces)
+    page = annonces[:100]
+    listing_id = annonces[0]['id'] if annonces else 'missing'
+
+    slow = 5 if listings_count > 50000 else 20
+    return {
+        "fetch_all_listings": (data_processor.fetch_all_listings, slow // 4),
+        "process_average_prices_over_time": (lambda: data_processor.process_average_prices_over_time(annonces), slow),
+        "process_monthly_distribution_by_type": (lambda: data_processor.process_monthly_distribution_by_type(annonces), slow),
+        "ingest_listings": (lambda: data_processor.ingest_listings(ListingStore()), slow // 4),
+        "average_prices_over_time(store)": (lambda: data_processor.average_prices_over_time(store), slow),
+        "monthly_distribution_by_type(store)": (lambda: data_processor.monthly_distribution_by_type(store), slow),
+        "search_index.add": (lambda: SearchIndex(store).add(range(len(annonces)), annonces), slow // 4),
+        "search_index.search": (lambda: index.search("appartement piscine"), 50),
+        "search_index.search.filtered": (lambda: index.search("villa", min_price=100000, producttype=1), 50),
+        "dedup.band_keys": (lambda: band_keys(annonces), slow // 4),
+        "dedup.cluster": (deduplicator.cluster, slow // 4),
+        "outliers.price_outliers": (lambda: price_outliers(store), slow),
+        "store_statistics": (lambda: data_processor.store_statistics(store), slow),
+        "accumulator.add": (lambda: StatisticsAccumulator(store).add(range(len(store)), annonces), slow),
+        "accumulator.statistics": (accumulator.statistics, 50),
+        "graphs.create_pie_chart": (lambda: graphs.create_pie_chart(governorate_stats, "Listings by Governorate"), 20),
+        "graphs.create_type_chart": (lambda: graphs.create_type_chart(type_stats), 20),
+        "graphs.create_bar_chart": (lambda: graphs.create_bar_chart(governorate_stats, "Listings", "Governorate", "Count"), 20),
+        "graphs.create_delegation_chart": (lambda: graphs.create_delegation_chart(delegation_data), 20),
+        "graphs.create_publisher_chart": (lambda: graphs.create_publisher_chart(publisher_stats), 20),
+        "graphs.create_avg_price_line_chart": (lambda: graphs.create_avg_price_line_chart(avg_prices_df), 20),
+        "graphs.create_stacked_bar_chart": (lambda: graphs.create_stacked_bar_chart(distribution_df), 20),
+        "create_listings_table": (lambda: main.create_listings_table(page, include_description=True), 20),
+        "create_listings_table.compact": (lambda: main.create_listings_table(page, include_description=False), 20),
+        **{
+            f"display_page {route}": ((lambda route=route: main.display_page(route)), 20)
+            for route in ("/", "/new-listings", "/price-filter", "/date-filter", "/all-listings",
+                          f"/listings/{listing_id}", "/missing")
+        },
+    }
+
+
+def run(args):
+    server, base_url = start_stub(args.listings, args.latency)
+    os.environ["FASTAPI_URL"] = base_url
+    try:
+        import_start = time.perf_counter()
+        cases = build_cases(args.listings)
+        import_seconds = time.perf_counter() - import_start
+        results = {name: measure(func, repeat) for name, (func, repeat) in cases.items()
+                   if not args.only or any(o in name for o in args.only)}
+    finally:
+        server.shutdown()
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "params": {"listings": args.listings, "latency_ms": args.latency},
+        "startup_seconds": round(import_seconds, 3),
+        "results": results,
+    }
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    print(f"{'case':55} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for name, result in current["results"].items():
+        if name in baseline:
+            before, after = baseline[name]["median_ms"], result["median_ms"]
+            ratio = after / before if before else float("inf")
+            print(f"{name:55} {before:10.2f} {after:10.2f} {ratio:7.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ingestion-to-render pipeline.")
+    parser.add_argument("--listings", type=int, default=10000, help="size of the synthetic corpus")
+    parser.add_argument("--latency", type=float, default=0, help="stub latency per request, in ms")
+    parser.add_argument("--only", nargs="*", help="run only cases whose name contains one of these")
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--compare", help="print median ratios against a previous results file")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Serialization time per route with the json and orjson engines.
+
+    python -m benchmarks.bench_serialization --listings 20000
+
+Renders each display_page route and the filter callbacks against the stub
+backend, then times plotly's ``to_json_plotly`` (which Dash uses for every
+callback response) on the result with each engine (see JSON_ENGINE).
+"""
+
+import argparse
+import json
+import os
+import time
+
+from .stub_api import start_stub
+
+ENGINES = ("json", "orjson")
+
+
+def outputs():
+    """Return {name: callback output} for realistic responses."""
+    from app import main
+
+    main.init_data()
+    results = {
+        f"display_page {route}": main.display_page(route)
+        for route in ("/", "/new-listings", "/price-filter", "/date-filter", "/all-listings")
+    }
+    results["update_filtered_listings"] = main.update_filtered_listings(100, 1_000_000, None)
+    results["update_date_filtered_listings"] = main.update_date_filtered_listings(
+        1, "2024-01-01", "2024-12-31", None, None)
+    return results
+
+
+def time_engine(obj, engine, repeat):
+    from plotly.io.json import to_json_plotly
+
+    payload = to_json_plotly(obj, engine=engine)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        to_json_plotly(obj, engine=engine)
+    return (time.perf_counter() - start) / repeat, len(payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark callback response serialization.")
+    parser.add_argument("--listings", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    server, base_url = start_stub(args.listings)
+    os.environ["FASTAPI_URL"] = base_url
+    try:
+        responses = outputs()
+    finally:
+        server.shutdown()
+
+    results = {}
+    print(f"{'output':45} {'bytes':>10} " + " ".join(f"{e + ' ms':>11}" for e in ENGINES) + f" {'speedup':>8}")
+    for name, obj in responses.items():
+        timings = {engine: time_engine(obj, engine, args.repeat) for engine in ENGINES}
+        size = timings["json"][1]
+        speedup = timings["json"][0] / timings["orjson"][0]
+        results[name] = {"bytes": size, **{f"{e}_ms": round(t * 1000, 3) for e, (t, _) in timings.items()},
+                         "speedup": round(speedup, 2)}
+        print(f"{name:45} {size:10d} " + " ".join(f"{t * 1000:11.3f}" for t, _ in timings.values())
+              + f" {speedup:8.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"params": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
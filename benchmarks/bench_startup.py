@@ -0,0 +1,141 @@
+"""
+Measure cold start: module import cost and time to the first served request.
+
+    python -m benchmarks.bench_startup --listings 10000 --output startup.json
+    python -m benchmarks.bench_startup --compare startup.json
+
+Each run starts fresh interpreters against the stub backend and reports:
+
+* ``import_seconds``: ``import app.main`` (no I/O happens on import);
+* ``imports``: the slowest modules from ``python -X importtime``, cumulative;
+* ``first_request_seconds`` per mode: from spawning the server (``python -m
+  app.main`` or gunicorn with ``app.wsgi``) to the first 200 on ``/``, which
+  includes loading the corpus.
+
+Results are written as JSON (with the git commit) so runs can be compared
+between commits.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime, timezone
+
+from .bench_pipeline import git_commit
+from .load_wsgi import MODES
+from .stub_api import start_stub
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_seconds(env, repeat):
+    """Median wall time of ``import app.main`` in a fresh interpreter."""
+    code = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+    samples = [float(subprocess.check_output([sys.executable, "-c", code], cwd=ROOT, env=env, text=True))
+               for _ in range(repeat)]
+    return round(statistics.median(samples), 3)
+
+
+def import_profile(env, top):
+    """The ``top`` slowest imports of ``app.main`` as (module, cumulative ms, self ms)."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"],
+                            cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        # "import time:   self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|", 2)
+        modules.append((name.strip(), int(cumulative) / 1000, int(own) / 1000))
+    modules.sort(key=lambda module: module[1], reverse=True)
+    return [{"module": name, "cumulative_ms": round(cumulative, 1), "self_ms": round(own, 1)}
+            for name, cumulative, own in modules[:top]]
+
+
+def first_request_seconds(mode, env, port, timeout=300):
+    """Seconds from spawning the server in ``mode`` to its first 200 on ``/``."""
+    env = dict(env, PORT=str(port), BIND=f"127.0.0.1:{port}")
+    started = time.perf_counter()
+    proc = subprocess.Popen(MODES[mode], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"{mode} server exited with status {proc.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=timeout) as response:
+                    response.read()
+                return round(time.perf_counter() - started, 3)
+            except OSError:
+                time.sleep(0.05)
+        raise RuntimeError(f"{mode} server did not answer within {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def run(args):
+    server, base_url = start_stub(args.listings, args.latency)
+    env = dict(os.environ, FASTAPI_URL=base_url)
+    try:
+        results = {
+            "import_seconds": import_seconds(env, args.repeat),
+            "first_request_seconds": {mode: first_request_seconds(mode, env, args.port) for mode in args.modes},
+            "imports": import_profile(env, args.top),
+        }
+    finally:
+        server.shutdown()
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "params": {"listings": args.listings, "latency_ms": args.latency},
+        "results": results,
+    }
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    rows = [("import app.main", baseline["import_seconds"], current["results"]["import_seconds"])]
+    for mode, seconds in current["results"]["first_request_seconds"].items():
+        if mode in baseline["first_request_seconds"]:
+            rows.append((f"first request ({mode})", baseline["first_request_seconds"][mode], seconds))
+    print(f"{'measure':30} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for name, before, after in rows:
+        ratio = after / before if before else float("inf")
+        print(f"{name:30} {before:10.3f} {after:10.3f} {ratio:7.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold start of the dashboard.")
+    parser.add_argument("--listings", type=int, default=10000, help="size of the synthetic corpus")
+    parser.add_argument("--latency", type=float, default=0, help="stub latency per request, in ms")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters timed for the import")
+    parser.add_argument("--top", type=int, default=20, help="slowest imports to report")
+    parser.add_argument("--port", type=int, default=8050)
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--compare", help="print ratios against a previous results file")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
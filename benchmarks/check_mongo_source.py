@@ -0,0 +1,104 @@
+"""
+Check that the MongoDB source agrees with the API and store path.
+
+    python -m benchmarks.check_mongo_source --listings 5000
+
+Loads the stub backend's listings into a mongomock collection and compares
+mongo_source.load_statistics and load_analytics (aggregated by the pipelines)
+with the stub's /statistics payload, data_processor.store_statistics and
+data_processor.load_analytics over a store ingested from the same collection.
+Outliers are kept on both sides, as the MongoDB analytics only serve
+``EXCLUDE_PRICE_OUTLIERS=0``. Exits with status 1 on any difference.
+"""
+
+import argparse
+import copy
+import math
+import sys
+
+from .stub_api import compute_statistics, generate_listings
+
+COUNTED = ("governorate_stats", "type_stats", "publisher_stats")
+AVERAGES = ("avg_price_sale", "avg_price_rent")
+
+
+def normalize_statistics(stats):
+    """The /statistics payload without the order of its lists (ties sort either way)."""
+    normalized = {"total_listings": stats.get("total_listings")}
+    for key in COUNTED:
+        normalized[key] = {item["_id"]: item["count"] for item in stats.get(key, [])}
+    normalized["delegation_by_governorate"] = {
+        item["_id"]: {d["delegation"]: d["count"] for d in item["delegations"]}
+        for item in stats.get("delegation_by_governorate", [])
+    }
+    return normalized
+
+
+def compare_statistics(name, expected, actual):
+    differences = []
+    for key in AVERAGES:
+        if not math.isclose(expected.get(key, 0), actual.get(key, 0), rel_tol=1e-9):
+            differences.append(f"{name}: {key} {actual.get(key)} != {expected.get(key)}")
+    expected, actual = normalize_statistics(expected), normalize_statistics(actual)
+    for key, value in expected.items():
+        if actual[key] != value:
+            differences.append(f"{name}: {key} differs")
+    return differences
+
+
+def compare_frames(name, expected, actual):
+    from pandas.testing import assert_frame_equal
+
+    def normalize(frame):
+        frame = frame.sort_values(list(frame.columns[:2])).reset_index(drop=True)
+        return frame[sorted(frame.columns, key=str)].rename_axis(columns=None)
+
+    try:
+        assert_frame_equal(normalize(expected), normalize(actual), check_dtype=False)
+    except AssertionError as e:
+        return [f"{name}: {e}"]
+    return []
+
+
+def run(listings_count, seed):
+    import mongomock
+
+    from app import data_processor, mongo_source
+    from app.store import ListingStore
+
+    listings = generate_listings(listings_count, seed=seed)
+    collection = mongomock.MongoClient().db.annonces
+    collection.insert_many(copy.deepcopy(listings))
+    mongo_source.set_collection(collection)
+
+    store = ListingStore()
+    mongo_source.ingest_listings(store)
+    statistics = mongo_source.load_statistics()
+    average, distribution = mongo_source.load_analytics()
+    store_average, store_distribution = data_processor.load_analytics(store)
+
+    differences = []
+    if average.empty or distribution.empty:
+        differences.append("mongo: load_analytics returned empty frames")
+    differences += compare_statistics("api /statistics", compute_statistics(listings), statistics)
+    differences += compare_statistics("store_statistics", data_processor.store_statistics(store), statistics)
+    differences += compare_frames("average prices", store_average, average)
+    differences += compare_frames("monthly distribution", store_distribution, distribution)
+    return differences
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the MongoDB source with the API and store path.")
+    parser.add_argument("--listings", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    differences = run(args.listings, args.seed)
+    for difference in differences:
+        print(difference, file=sys.stderr)
+    print(f"{len(differences)} differences over {args.listings} listings")
+    sys.exit(1 if differences else 0)
+
+
+if __name__ == "__main__":
+    main()
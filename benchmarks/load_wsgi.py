@@ -0,0 +1,159 @@
+"""
+Compare the Dash dev server with the gunicorn deployment.
+
+Starts the app in each mode, drives it with concurrent clients for a fixed
+duration and reports throughput and memory (RSS and PSS) per process:
+
+    python -m benchmarks.load_wsgi --duration 30 --clients 16
+
+FASTAPI_URL must point at a running backend.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODES = {
+    "dev": [sys.executable, "-m", "app.main"],
+    "gunicorn": [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.wsgi:server"],
+}
+
+
+def page_payload(pathname):
+    """Body of the Dash callback request that renders ``pathname``."""
+    return json.dumps({
+        "output": "page-content.children",
+        "outputs": {"id": "page-content", "property": "children"},
+        "inputs": [{"id": "url", "property": "pathname", "value": pathname}],
+        "changedPropIds": ["url.pathname"],
+    }).encode()
+
+
+def request(base_url, pathname):
+    if pathname is None:
+        req = urllib.request.Request(base_url + "/")
+    else:
+        req = urllib.request.Request(
+            base_url + "/_dash-update-component",
+            data=page_payload(pathname),
+            headers={"Content-Type": "application/json"},
+        )
+    with urllib.request.urlopen(req, timeout=30) as response:
+        response.read()
+
+
+def wait_until_ready(base_url, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            request(base_url, None)
+            return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError(f"Server at {base_url} did not start within {timeout}s")
+
+
+def process_tree(pid):
+    pids = [pid]
+    for child in _children(pid):
+        pids.extend(process_tree(child))
+    return pids
+
+
+def _children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def memory_kb(pid):
+    """Return (rss, pss) in kB; PSS splits shared copy-on-write pages fairly."""
+    rss = pss = 0
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Rss:"):
+                    rss = int(line.split()[1])
+                elif line.startswith("Pss:"):
+                    pss = int(line.split()[1])
+    except OSError:
+        pass
+    return rss, pss
+
+
+def run_load(base_url, paths, clients, duration):
+    counts = {"ok": 0, "errors": 0}
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client(offset):
+        i = offset
+        while time.monotonic() < stop_at:
+            try:
+                request(base_url, paths[i % len(paths)])
+                key = "ok"
+            except Exception:
+                key = "errors"
+            with lock:
+                counts[key] += 1
+            i += 1
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return counts
+
+
+def bench_mode(mode, args):
+    # Dash's dev server reads PORT, gunicorn.conf.py reads BIND.
+    env = dict(os.environ, PORT=str(args.port), BIND=f"127.0.0.1:{args.port}")
+    proc = subprocess.Popen(MODES[mode], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        wait_until_ready(base_url)
+        paths = [None, "/", "/new-listings", "/all-listings"]
+        counts = run_load(base_url, paths, args.clients, args.duration)
+        processes = {pid: memory_kb(pid) for pid in process_tree(proc.pid)}
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    workers = [m for pid, m in processes.items() if pid != proc.pid] or list(processes.values())
+    return {
+        "mode": mode,
+        "requests": counts["ok"],
+        "errors": counts["errors"],
+        "throughput_rps": round(counts["ok"] / args.duration, 1),
+        "processes": len(processes),
+        "rss_kb_per_worker": round(sum(r for r, _ in workers) / len(workers)),
+        "pss_kb_per_worker": round(sum(p for _, p in workers) / len(workers)),
+        "pss_kb_total": sum(p for _, p in processes.values()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--port", type=int, default=8050)
+    args = parser.parse_args()
+
+    results = [bench_mode(mode, args) for mode in args.modes]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,588 @@
+"""
+Replay user sessions against the dashboard at a given concurrency.
+
+    python -m benchmarks.loadtest synthesize --sessions 500 --output sessions.jsonl
+    python -m benchmarks.loadtest record --target http://127.0.0.1:8050 --port 8051 --output sessions.jsonl
+    python -m benchmarks.loadtest replay --sessions-file sessions.jsonl --concurrency 32 --duration 60
+
+A session is the list of HTTP requests one user makes, with their offsets from
+the start of the session, stored one session per line (JSON). They are either
+
+* synthesized: random walks over the routes rendered by ``display_page``, with
+  typing into the price inputs (one callback per value entered), date searches,
+  keyword searches and clicks through to listing details, against the listings
+  of the stub backend (``stub_api.generate_listings``, same seed); or
+* recorded: by a proxy in front of a running app, which keeps the page loads
+  and callback requests of each browser (client address and user agent) and
+  starts a new session after ``--idle`` seconds without requests.
+
+``replay`` starts the stub backend and the app (dev server or gunicorn, see
+load_wsgi.MODES), or uses ``--target``. ``--concurrency`` virtual users each
+replay one session after another for ``--duration`` seconds, keeping the
+recorded pauses between requests (scaled by ``--speed``; 0 sends them back to
+back). Each replayed session sends its own X-Forwarded-For address and the app
+is started with ``TRUSTED_PROXIES=1``, so admission control rate limits every
+session on its own, as it would real browsers (start a ``--target`` app the
+same way). The report holds the throughput, error rate and requests shed by
+admission control per route and callback, latency percentiles of the requests
+that were not shed, and the RSS of the app's processes sampled every
+``--sample-interval`` seconds.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .bench_pipeline import git_commit
+from .load_wsgi import MODES, ROOT, memory_kb, process_tree, wait_until_ready
+from .stub_api import ADJECTIVES, GOVERNORATES, HISTORY_DAYS, PROPERTY_KINDS, start_stub
+
+DASH_UPDATE = "/_dash-update-component"
+# Pages rendered by display_page and how often a synthetic user goes to each
+PAGES = {
+    "/": 0.25,
+    "/new-listings": 0.15,
+    "/price-filter": 0.2,
+    "/date-filter": 0.15,
+    "/all-listings": 0.1,
+    "/map": 0.05,
+    "/search": 0.1,
+}
+PRICE_TARGETS = [(500, 5000), (1000, 3000), (100000, 500000), (250000, 1000000), (50000, 150000)]
+# Requests a browser caches or keeps open, left out of recordings
+SKIPPED_PREFIXES = ("/assets/", "/_dash-component-suites/", "/_favicon", "/_reload-hash", "/events/")
+HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "host", "content-length", "proxy-connection"}
+PERCENTILES = (50, 90, 99)
+
+
+def callback_body(output, inputs, state=(), changed=()):
+    """Body of a Dash callback request; ``inputs`` and ``state`` are (id, property, value)."""
+    component, prop = output.rsplit(".", 1)
+    return {
+        "output": output,
+        "outputs": {"id": component, "property": prop},
+        "inputs": [{"id": i, "property": p, "value": v} for i, p, v in inputs],
+        "state": [{"id": i, "property": p, "value": v} for i, p, v in state],
+        "changedPropIds": list(changed),
+    }
+
+
+def page_body(pathname):
+    return callback_body("page-content.children", [("url", "pathname", pathname)], changed=["url.pathname"])
+
+
+def route_label(pathname):
+    """Bounded label for a pathname, as main.route_label."""
+    if pathname in PAGES:
+        return pathname
+    if pathname and pathname.startswith("/listings/"):
+        return "/listings/:id"
+    return "404"
+
+
+def request_label(path, body):
+    """Report label of a request: the page, the callback outputs or the path."""
+    if isinstance(body, dict) and path.endswith(DASH_UPDATE):
+        output = body.get("output") or ""
+        if output == "page-content.children":
+            return f"page {route_label(body['inputs'][0].get('value'))}"
+        components = [target.rsplit(".", 1)[0] for target in output.strip(".").split("...")]
+        return "callback " + "+".join(dict.fromkeys(components))
+    path = path.split("?")[0]
+    return "GET /listings/:id" if path.startswith("/listings/") else f"GET {path}"
+
+
+# --------------------------------------------------------------------------- synthesis
+
+class SessionBuilder:
+    def __init__(self, rng):
+        self.rng = rng
+        self.at = 0.0
+        self.steps = []
+
+    def think(self, low, high):
+        self.at += self.rng.uniform(low, high)
+
+    def get(self, path):
+        self.steps.append({"at": round(self.at, 3), "method": "GET", "path": path, "body": None})
+
+    def post(self, body):
+        self.steps.append({"at": round(self.at, 3), "method": "POST", "path": DASH_UPDATE, "body": body})
+
+
+def _visit(session, pathname, listings, rng):
+    """Navigate to ``pathname`` and interact with the page as a user would."""
+    session.post(page_body(pathname))
+    session.think(2, 8)
+    if pathname == "/price-filter":
+        _type_prices(session, rng)
+        _click_detail(session, listings, rng)
+    elif pathname == "/date-filter":
+        for clicks in range(1, rng.randint(1, 3) + 1):
+            _search_dates(session, clicks, rng)
+            session.think(3, 10)
+        _click_detail(session, listings, rng)
+    elif pathname == "/new-listings":
+        _click_detail(session, listings, rng, probability=0.6, newest=True)
+    elif pathname == "/search":
+        _search_keywords(session, rng)
+        _click_detail(session, listings, rng)
+
+
+def _type_prices(session, rng):
+    # The price inputs are debounced: the callback runs once per field, when
+    # the user leaves it (or presses Enter) after typing the whole value
+    minimum, maximum = 100, 1000000
+    producttype = None
+    # Initial call when the page renders
+    session.post(_price_body(minimum, maximum, producttype, None))
+    low, high = rng.choice(PRICE_TARGETS)
+    for field, target in (("min-price-input", low), ("max-price-input", high)):
+        session.think(0.1 * len(str(target)), 0.3 * len(str(target)))
+        minimum, maximum = (target, maximum) if field == "min-price-input" else (minimum, target)
+        session.post(_price_body(minimum, maximum, producttype, field))
+        session.think(1, 3)
+    if rng.random() < 0.5:
+        producttype = rng.choice([0, 1])
+        session.post(_price_body(minimum, maximum, producttype, "product-type-selector"))
+        session.think(2, 6)
+
+
+def _price_body(minimum, maximum, producttype, changed):
+    return callback_body("price-filter-results.children", [
+        ("min-price-input", "value", minimum),
+        ("max-price-input", "value", maximum),
+        ("product-type-selector", "value", producttype),
+    ], changed=[f"{changed}.value"] if changed else [])
+
+
+def _random_location(rng):
+    governorate = rng.choice(list(GOVERNORATES))
+    return f"{governorate}|{rng.choice(GOVERNORATES[governorate])}"
+
+
+def _search_dates(session, clicks, rng):
+    end = datetime(2025, 1, 1, tzinfo=timezone.utc) - timedelta(days=rng.randint(0, HISTORY_DAYS - 90))
+    start = end - timedelta(days=rng.choice([7, 14, 30, 90]))
+    location = _random_location(rng) if rng.random() < 0.3 else None
+    session.post(callback_body("date-filter-results.children",
+                               [("date-filter-button", "n_clicks", clicks)],
+                               state=[("date-range", "start_date", start.strftime("%Y-%m-%d")),
+                                      ("date-range", "end_date", end.strftime("%Y-%m-%d")),
+                                      ("location-selector", "value", location),
+                                      ("date-product-type-selector", "value", rng.choice([0, 1, None]))],
+                               changed=["date-filter-button.n_clicks"]))
+
+
+def _search_keywords(session, rng):
+    # The query input is debounced: one callback per submitted query
+    for _ in range(rng.randint(1, 3)):
+        words = [rng.choice(PROPERTY_KINDS).lower()] + rng.sample(ADJECTIVES, rng.randint(0, 2))
+        session.post(callback_body("search-results.children", [
+            ("search-query", "value", " ".join(words)),
+            ("search-min-price", "value", None),
+            ("search-max-price", "value", None),
+            ("search-date-range", "start_date", None),
+            ("search-date-range", "end_date", None),
+            ("search-location", "value", None),
+            ("search-product-type", "value", None),
+        ], changed=["search-query.value"]))
+        session.think(3, 10)
+
+
+def _click_detail(session, listings, rng, probability=0.4, newest=False):
+    if rng.random() >= probability:
+        return
+    # Listing ids of the stub backend, newest first
+    index = int(rng.expovariate(1 / 50)) if newest else rng.randrange(listings)
+    session.post(page_body(f"/listings/{min(index, listings - 1):08x}"))
+    session.think(5, 20)
+
+
+def synthesize_sessions(count, listings, seed=42):
+    """``count`` synthetic sessions over a stub backend serving ``listings`` listings."""
+    rng = random.Random(seed)
+    pages, weights = list(PAGES), list(PAGES.values())
+    sessions = []
+    for _ in range(count):
+        session = SessionBuilder(rng)
+        # Landing: the index page, then the page callback for its route
+        landing = rng.choices(pages, weights)[0]
+        session.get("/")
+        _visit(session, landing, listings, rng)
+        for _ in range(rng.randint(2, 8)):
+            session.think(1, 5)
+            _visit(session, rng.choices(pages, weights)[0], listings, rng)
+        sessions.append(session.steps)
+    return sessions
+
+
+def write_sessions(sessions, path):
+    with open(path, "w") as f:
+        for steps in sessions:
+            f.write(json.dumps({"steps": steps}) + "\n")
+
+
+def read_sessions(path):
+    with open(path) as f:
+        return [json.loads(line)["steps"] for line in f if line.strip()]
+
+
+# --------------------------------------------------------------------------- recording
+
+class SessionRecorder:
+    """Requests grouped into sessions per client, split after ``idle`` seconds of silence."""
+
+    def __init__(self, idle):
+        self.idle = idle
+        self._lock = threading.Lock()
+        self._open = {}  # client -> (started_at, last_at, steps)
+        self.sessions = []
+
+    def add(self, client, method, path, body):
+        now = time.monotonic()
+        with self._lock:
+            started_at, last_at, steps = self._open.get(client, (now, now, []))
+            if now - last_at > self.idle and steps:
+                self.sessions.append(steps)
+                started_at, steps = now, []
+            steps.append({"at": round(now - started_at, 3), "method": method, "path": path, "body": body})
+            self._open[client] = (started_at, now, steps)
+
+    def close(self):
+        with self._lock:
+            self.sessions.extend(steps for _, _, steps in self._open.values() if steps)
+            self._open.clear()
+            return self.sessions
+
+
+def make_proxy_handler(target, recorder):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _forward(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            data = self.rfile.read(length) if length else None
+            if not self.path.startswith(SKIPPED_PREFIXES):
+                try:
+                    body = json.loads(data) if data else None
+                except ValueError:
+                    body = None
+                client = (self.client_address[0], self.headers.get("User-Agent", ""))
+                recorder.add(client, self.command, self.path, body)
+
+            headers = {k: v for k, v in self.headers.items() if k.lower() not in HOP_HEADERS}
+            req = urllib.request.Request(target + self.path, data=data, headers=headers, method=self.command)
+            try:
+                response = urllib.request.urlopen(req, timeout=300)
+            except urllib.error.HTTPError as e:
+                response = e
+            with response:
+                self.send_response(response.status)
+                for key, value in response.headers.items():
+                    if key.lower() not in HOP_HEADERS:
+                        self.send_header(key, value)
+                length = response.headers.get("Content-Length")
+                if length is not None:
+                    self.send_header("Content-Length", length)
+                else:
+                    # Streamed (e.g. Server-Sent Events): relay until the app closes it
+                    self.send_header("Connection", "close")
+                    self.close_connection = True
+                self.end_headers()
+                while True:
+                    chunk = response.read1(65536)
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+                    self.wfile.flush()
+
+        do_GET = do_POST = _forward
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def record(args):
+    recorder = SessionRecorder(args.idle)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_proxy_handler(args.target.rstrip("/"), recorder))
+    server.daemon_threads = True
+    print(f"Recording sessions on http://127.0.0.1:{args.port} (proxying {args.target}); "
+          f"Ctrl-C to stop", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+    sessions = recorder.close()
+    write_sessions(sessions, args.output)
+    print(f"Wrote {len(sessions)} sessions to {args.output}", file=sys.stderr)
+
+
+# --------------------------------------------------------------------------- replay
+
+def session_address(n):
+    """Address of the ``n``th replayed session, sent as X-Forwarded-For."""
+    return f"10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}"
+
+
+def send(base_url, step, address):
+    """Send one session step; returns the response's X-Admission header (None if admitted)."""
+    data = json.dumps(step["body"]).encode() if step["body"] is not None else None
+    headers = {"X-Forwarded-For": address}
+    if data is not None:
+        headers["Content-Type"] = "application/json"
+    req = urllib.request.Request(base_url + step["path"], data=data, headers=headers, method=step["method"])
+    with urllib.request.urlopen(req, timeout=60) as response:
+        response.read()
+        return response.headers.get("X-Admission")
+
+
+class Results:
+    """Latencies of the admitted requests, and error and shed counts, per label.
+
+    Shed requests are answered at once (a cached or "busy" response), so they
+    are counted but left out of the latency percentiles.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.requests = {}
+        self.errors = {}
+        self.shed = {}
+
+    def add(self, label, seconds, error, shed):
+        with self._lock:
+            self.requests[label] = self.requests.get(label, 0) + 1
+            self.errors[label] = self.errors.get(label, 0) + error
+            self.shed[label] = self.shed.get(label, 0) + shed
+            if not shed:
+                self.latencies.setdefault(label, []).append(seconds)
+
+    def summary(self, duration):
+        routes = {}
+        for label, count in sorted(self.requests.items()):
+            samples = sorted(self.latencies.get(label, []))
+            errors = self.errors[label]
+            route = {
+                "requests": count,
+                "errors": errors,
+                "error_rate": round(errors / count, 4),
+                "shed": self.shed[label],
+                "shed_rate": round(self.shed[label] / count, 4),
+                "throughput_rps": round(count / duration, 2),
+            }
+            for p in PERCENTILES:
+                route[f"p{p}_ms"] = (round(samples[min(int(p / 100 * len(samples)), len(samples) - 1)] * 1000, 1)
+                                     if samples else None)
+            route["max_ms"] = round(samples[-1] * 1000, 1) if samples else None
+            routes[label] = route
+        requests = sum(route["requests"] for route in routes.values())
+        errors = sum(route["errors"] for route in routes.values())
+        shed = sum(route["shed"] for route in routes.values())
+        return {
+            "requests": requests,
+            "errors": errors,
+            "error_rate": round(errors / requests, 4) if requests else None,
+            "shed": shed,
+            "shed_rate": round(shed / requests, 4) if requests else None,
+            "throughput_rps": round(requests / duration, 1),
+            "routes": routes,
+        }
+
+
+def replay(base_url, sessions, concurrency, duration, speed):
+    """Replay ``sessions`` with ``concurrency`` users for ``duration`` seconds."""
+    results = Results()
+    next_session = itertools.count()
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def user():
+        while time.monotonic() < stop_at:
+            with lock:
+                n = next(next_session)
+            steps, address = sessions[n % len(sessions)], session_address(n)
+            started = time.monotonic()
+            for step in steps:
+                if speed:
+                    time.sleep(max(0.0, min(started + step["at"] / speed, stop_at) - time.monotonic()))
+                if time.monotonic() >= stop_at:
+                    return
+                label = request_label(step["path"], step["body"])
+                sent = time.perf_counter()
+                try:
+                    admission = send(base_url, step, address)
+                    error = False
+                except urllib.error.HTTPError as e:
+                    admission = e.headers.get("X-Admission") or ("rejected" if e.code in (429, 503) else None)
+                    error = True
+                except OSError:
+                    admission, error = None, True
+                results.add(label, time.perf_counter() - sent, error, admission is not None)
+
+    threads = [threading.Thread(target=user, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results.summary(duration)
+
+
+class RssSampler(threading.Thread):
+    """RSS (kB) of ``pid`` and its children every ``interval`` seconds."""
+
+    def __init__(self, pid, interval):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._done = threading.Event()
+
+    def run(self):
+        started = time.monotonic()
+        while not self._done.is_set():
+            rss = sum(memory_kb(pid)[0] for pid in process_tree(self.pid))
+            self.samples.append([round(time.monotonic() - started, 1), rss])
+            self._done.wait(self.interval)
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+def start_app(mode, port, env):
+    # Dash's dev server reads PORT, gunicorn.conf.py reads BIND. Trusting one
+    # proxy makes the app rate limit each session by its X-Forwarded-For
+    # address instead of all of them as 127.0.0.1.
+    env = dict(env, PORT=str(port), BIND=f"127.0.0.1:{port}", TRUSTED_PROXIES="1")
+    return subprocess.Popen(MODES[mode], cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def run(args):
+    if args.sessions_file:
+        sessions = read_sessions(args.sessions_file)
+    else:
+        sessions = synthesize_sessions(args.sessions, args.listings, args.seed)
+
+    stub = proc = None
+    try:
+        if args.target:
+            base_url, pid = args.target.rstrip("/"), args.pid
+        else:
+            stub, stub_url = start_stub(args.listings, args.latency, seed=args.seed)
+            proc = start_app(args.mode, args.port, dict(os.environ, FASTAPI_URL=stub_url))
+            base_url, pid = f"http://127.0.0.1:{args.port}", proc.pid
+            wait_until_ready(base_url, timeout=300)
+
+        sampler = RssSampler(pid, args.sample_interval) if pid else None
+        if sampler:
+            sampler.start()
+        try:
+            results = replay(base_url, sessions, args.concurrency, args.duration, args.speed)
+        finally:
+            if sampler:
+                sampler.stop()
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+        if stub:
+            stub.shutdown()
+
+    results["rss_kb"] = sampler.samples if sampler else []
+    results["rss_kb_peak"] = max((rss for _, rss in results["rss_kb"]), default=None)
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "params": {
+            "mode": None if args.target else args.mode,
+            "sessions": args.sessions_file or args.sessions,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "speed": args.speed,
+            "listings": args.listings,
+            "latency_ms": args.latency,
+        },
+        "results": results,
+    }
+
+
+def _ms(value):
+    return f"{value:8.1f}" if value is not None else f"{'-':>8}"
+
+
+def print_table(results):
+    print(f"{'route':40} {'req':>7} {'err%':>6} {'shed':>6} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8}",
+          file=sys.stderr)
+    for label, route in results["routes"].items():
+        print(f"{label:40} {route['requests']:7} {route['error_rate'] * 100:6.2f} {route['shed']:6} "
+              f"{_ms(route['p50_ms'])} {_ms(route['p90_ms'])} {_ms(route['p99_ms'])}", file=sys.stderr)
+    print(f"{results['throughput_rps']} req/s, {results['shed']} shed, peak RSS {results['rss_kb_peak']} kB",
+          file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record, synthesize and replay dashboard sessions.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    synthesize = commands.add_parser("synthesize", help="write synthetic sessions")
+    synthesize.add_argument("--sessions", type=int, default=500)
+    synthesize.add_argument("--listings", type=int, default=10000, help="size of the stub corpus")
+    synthesize.add_argument("--seed", type=int, default=42)
+    synthesize.add_argument("--output", required=True)
+
+    recording = commands.add_parser("record", help="record sessions through a proxy")
+    recording.add_argument("--target", default="http://127.0.0.1:8050", help="running app to proxy")
+    recording.add_argument("--port", type=int, default=8051)
+    recording.add_argument("--idle", type=float, default=300, help="seconds of silence that end a session")
+    recording.add_argument("--output", required=True)
+
+    replaying = commands.add_parser("replay", help="replay sessions and report")
+    replaying.add_argument("--sessions-file", help="recorded or synthesized sessions (default: synthesize)")
+    replaying.add_argument("--sessions", type=int, default=500, help="sessions to synthesize")
+    replaying.add_argument("--concurrency", type=int, default=16, help="concurrent virtual users")
+    replaying.add_argument("--duration", type=float, default=60)
+    replaying.add_argument("--speed", type=float, default=1.0,
+                           help="pause scale between requests (2 halves them, 0 removes them)")
+    replaying.add_argument("--mode", default="gunicorn", choices=list(MODES))
+    replaying.add_argument("--target", help="replay against a running app instead")
+    replaying.add_argument("--pid", type=int, help="app process to sample RSS from with --target")
+    replaying.add_argument("--listings", type=int, default=10000, help="size of the stub corpus")
+    replaying.add_argument("--latency", type=float, default=0, help="stub latency per request, in ms")
+    replaying.add_argument("--seed", type=int, default=42)
+    replaying.add_argument("--port", type=int, default=8050)
+    replaying.add_argument("--sample-interval", type=float, default=1.0)
+    replaying.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    if args.command == "synthesize":
+        write_sessions(synthesize_sessions(args.sessions, args.listings, args.seed), args.output)
+    elif args.command == "record":
+        record(args)
+    else:
+        results = run(args)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+        print_table(results["results"])
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Local stand-in for the FastAPI backend, serving synthetic Tunisian listings.
+
+    python -m benchmarks.stub_api --listings 20000 --latency 20 --port 8000
+
+Implements the endpoints the dashboard uses: /annonces, /annonces/price,
+/annonces/date, /annonces/new, /annonces/{id}, /statistics and
+/governorates-with-delegations. Listings are generated from a fixed seed so
+runs are reproducible.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+GOVERNORATES = {
+    "Tunis": ["La Marsa", "Carthage", "Le Bardo", "El Menzah", "La Goulette"],
+    "Ariana": ["Ariana Ville", "La Soukra", "Raoued", "Ettadhamen"],
+    "Ben Arous": ["Ezzahra", "Hammam Lif", "Mourouj", "Rades"],
+    "Manouba": ["Manouba", "Den Den", "Oued Ellil"],
+    "Nabeul": ["Hammamet", "Nabeul", "Kelibia", "Korba"],
+    "Bizerte": ["Bizerte Nord", "Menzel Bourguiba", "Ras Jebel"],
+    "Sousse": ["Sousse Ville", "Hammam Sousse", "Akouda", "Msaken"],
+    "Monastir": ["Monastir", "Ksar Hellal", "Jemmal"],
+    "Mahdia": ["Mahdia", "El Jem", "Chebba"],
+    "Sfax": ["Sfax Ville", "Sakiet Ezzit", "Thyna", "Sakiet Eddaier"],
+    "Gabes": ["Gabes Ville", "Mareth", "El Hamma"],
+    "Medenine": ["Djerba Houmt Souk", "Djerba Midoun", "Zarzis"],
+    "Kairouan": ["Kairouan Nord", "Kairouan Sud", "Haffouz"],
+    "Beja": ["Beja Nord", "Medjez El Bab"],
+    "Jendouba": ["Jendouba", "Tabarka", "Ain Draham"],
+    "Kef": ["Le Kef Est", "Dahmani"],
+    "Siliana": ["Siliana Nord", "Makthar"],
+    "Zaghouan": ["Zaghouan", "El Fahs"],
+    "Kasserine": ["Kasserine Nord", "Sbeitla"],
+    "Sidi Bouzid": ["Sidi Bouzid Ouest", "Regueb"],
+    "Gafsa": ["Gafsa Sud", "Metlaoui"],
+    "Tozeur": ["Tozeur", "Nefta"],
+    "Kebili": ["Kebili Nord", "Douz"],
+    "Tataouine": ["Tataouine Nord", "Ghomrassen"],
+}
+
+PROPERTY_KINDS = ["Appartement S+1", "Appartement S+2", "Appartement S+3", "Villa", "Studio",
+                  "Maison", "Terrain", "Bureau", "Duplex", "شقة", "فيلا", "أرض"]
+ADJECTIVES = ["haut standing", "vue mer", "meublé", "neuf", "avec jardin", "proche plage",
+              "centre ville", "calme", "lumineux", "جديد", "قرب البحر"]
+
+NEW_LISTINGS_WINDOW = timedelta(days=7)
+HISTORY_DAYS = 730
+
+
+def generate_listings(count, seed=42, now=None):
+    """Return ``count`` listings shaped like the scraper's documents, newest first."""
+    rng = random.Random(seed)
+    now = now or datetime(2025, 1, 1, tzinfo=timezone.utc)
+    governorates = list(GOVERNORATES)
+    listings = []
+    for i in range(count):
+        governorate = rng.choice(governorates)
+        delegation = rng.choice(GOVERNORATES[governorate])
+        producttype = 1 if rng.random() < 0.55 else 0
+        kind = rng.choice(PROPERTY_KINDS)
+        price = (rng.lognormvariate(12.5, 0.6) if producttype == 1 else rng.lognormvariate(6.9, 0.4))
+        is_shop = rng.random() < 0.35
+        published = now - timedelta(days=HISTORY_DAYS * i / count, minutes=rng.randint(0, 59))
+        words = rng.sample(ADJECTIVES, 3)
+        listings.append({
+            "id": f"{i:08x}",
+            "title": f"{kind} {words[0]} à {delegation}",
+            "description": (
+                f"{kind} {' '.join(words)} situé à {delegation}, {governorate}. "
+                f"Surface {rng.randint(40, 400)} m², {rng.randint(1, 5)} chambres. "
+                f"Contact {rng.randint(20, 99)} {rng.randint(100, 999)} {rng.randint(100, 999)}."
+            ),
+            "price": round(price, -1 if producttype == 0 else -3),
+            "producttype": producttype,
+            "location": {"governorate": governorate, "delegation": delegation},
+            "images": [f"https://picsum.photos/seed/{i}-{n}/800/500" for n in range(rng.randint(0, 3))],
+            "metadata": {
+                "publishedOn": published.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+                "producttype": producttype,
+                "status": "Original" if rng.random() < 0.9 else "Modified",
+                "publisher": {
+                    "name": f"Agence {delegation}" if is_shop else f"Particulier {i % 997}",
+                    "type": "Shop" if is_shop else "Individual",
+                    "isShop": is_shop,
+                },
+            },
+        })
+    return listings
+
+
+def compute_statistics(listings):
+    governorates = Counter(a["location"]["governorate"] for a in listings)
+    types = Counter(a["metadata"]["producttype"] for a in listings)
+    publishers = Counter(a["metadata"]["publisher"]["isShop"] for a in listings)
+    delegations = defaultdict(Counter)
+    prices = defaultdict(list)
+    for a in listings:
+        delegations[a["location"]["governorate"]][a["location"]["delegation"]] += 1
+        prices[a["metadata"]["producttype"]].append(a["price"])
+
+    def mean(values):
+        return sum(values) / len(values) if values else 0
+
+    return {
+        "total_listings": len(listings),
+        "governorate_stats": [{"_id": k, "count": v} for k, v in governorates.most_common()],
+        "type_stats": [{"_id": k, "count": v} for k, v in types.most_common()],
+        "avg_price_sale": mean(prices[1]),
+        "avg_price_rent": mean(prices[0]),
+        "publisher_stats": [{"_id": k, "count": v} for k, v in publishers.most_common()],
+        "delegation_by_governorate": [
+            {"_id": gov, "delegations": [{"delegation": d, "count": c} for d, c in counts.most_common()]}
+            for gov, counts in delegations.items()
+        ],
+    }
+
+
+class StubBackend:
+    def __init__(self, listings, latency=0.0):
+        self.listings = listings
+        self.by_id = {a["id"]: a for a in listings}
+        self.latency = latency
+        self.statistics = compute_statistics(listings)
+        newest = max((a["metadata"]["publishedOn"] for a in listings), default=None)
+        cutoff = (_parse_date(newest) - NEW_LISTINGS_WINDOW) if newest else None
+        self.new_listings = [a for a in listings if cutoff and _parse_date(a["metadata"]["publishedOn"]) >= cutoff]
+
+    def handle(self, path, query):
+        if self.latency:
+            time.sleep(self.latency)
+        skip = int(query.get("skip", 0))
+        limit = int(query.get("limit", 100))
+
+        if path == "/annonces":
+            return self._page(self.listings, skip, limit)
+        if path == "/annonces/price":
+            min_price = float(query.get("min_price") or 0)
+            max_price = float(query.get("max_price") or float("inf"))
+            producttype = query.get("producttype")
+            matches = [a for a in self.listings
+                       if min_price <= a["price"] <= max_price
+                       and (producttype in (None, "") or a["producttype"] == int(producttype))]
+            return self._page(matches, skip, limit)
+        if path == "/annonces/date":
+            start = _parse_date(query["start_date"])
+            end = _parse_date(query["end_date"]) + timedelta(days=1)
+            producttype = query.get("producttype")
+            matches = [a for a in self.listings
+                       if start <= _parse_date(a["metadata"]["publishedOn"]) < end
+                       and (producttype in (None, "") or a["producttype"] == int(producttype))]
+            return self._page(matches, skip, limit)
+        if path == "/annonces/new":
+            return {"count": len(self.new_listings), "new_annonces": self.new_listings}
+        if path == "/statistics":
+            return self.statistics
+        if path == "/governorates-with-delegations":
+            return {"governorates_with_delegations": [
+                {"governorate": gov, "delegations": delegations} for gov, delegations in GOVERNORATES.items()
+            ]}
+        if path.startswith("/annonces/"):
+            listing = self.by_id.get(path.rsplit("/", 1)[-1])
+            return {"listing": listing} if listing else None
+        return None
+
+    @staticmethod
+    def _page(matches, skip, limit):
+        return {"annonces": matches[skip:skip + limit], "total": len(matches)}
+
+
+def _parse_date(value):
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def make_handler(backend):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            body = backend.handle(url.path, query)
+            payload = json.dumps(body if body is not None else {"detail": "Not Found"}).encode()
+            self.send_response(200 if body is not None else 404)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_stub(listings=10000, latency_ms=0, port=0, seed=42):
+    """Serve a stub backend from a daemon thread; returns (server, base_url)."""
+    backend = StubBackend(generate_listings(listings, seed=seed), latency=latency_ms / 1000)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(backend))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve synthetic listings on the backend API.")
+    parser.add_argument("--listings", type=int, default=10000)
+    parser.add_argument("--latency", type=float, default=0, help="added latency per request, in ms")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    server, base_url = start_stub(args.listings, args.latency, args.port, args.seed)
+    print(f"Serving {args.listings} listings on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Gunicorn configuration for the dashboard.
+
+    gunicorn -c gunicorn.conf.py app.wsgi:server
+
+All settings can be overridden from the environment.
+"""
+
+import gc
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8050")
+
+# One process per core by default; each worker serves requests on a small
+# thread pool so slow backend calls do not block the whole process.
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = os.getenv("WORKER_CLASS", "gthread")
+threads = int(os.getenv("WORKER_THREADS", 4))
+
+timeout = int(os.getenv("WORKER_TIMEOUT", 60))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then; they are re-forked from the preloaded master,
+# so a restart does not reload the corpus.
+max_requests = int(os.getenv("MAX_REQUESTS", 5000))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", 500))
+
+# Import the app (and load the corpus) once in the master before forking.
+preload_app = True
+
+accesslog = os.getenv("ACCESS_LOG", "-")
+errorlog = "-"
+# The app logs to stderr too (read before the app is preloaded), so the
+# process manager collects and rotates one stream for all workers. Setting
+# LOG_FILE gives each worker its own rotating file instead.
+os.environ.setdefault("LOG_FILE", "-")
+
+
+def when_ready(server):
+    # Move everything allocated during preload to the permanent generation so
+    # the workers' garbage collector does not touch (and copy) those pages.
+    gc.freeze()
+    server.log.info("Preloaded app, froze %d objects", gc.get_freeze_count())